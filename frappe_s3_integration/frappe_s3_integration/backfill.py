@@ -1,15 +1,25 @@
 # Copyright (c) 2026, sakthi123msd@gmail.com and contributors
 # For license information, please see license.txt
-"""One-time, resumable, non-destructive content-type backfill for objects already
-on S3 that were written before ContentType was set (stored as octet-stream).
+"""One-time, resumable, non-destructive metadata backfills for objects already on S3:
 
-Public files have no read-time MIME self-heal (they 302-redirect to the raw S3
-object), so this is the ONLY remediation for old public objects (N14)."""
+- backfill_content_types: objects written before ContentType was set (stored as
+  octet-stream). Public files have no read-time MIME self-heal (they 302-redirect to
+  the raw S3 object), so this is the ONLY remediation for old public objects (N14).
+- backfill_cache_control: objects written before their bucket had a Cache-Control
+  policy (AWS S3 Settings > bucket row).
+
+Each object's HEAD + copy runs on the bulk engine (s3_core.bulk), many in flight at once.
+Objects come from the bucket's S3 Inventory report when the bucket row names one
+(S3Connection.iter_objects); keys deleted since the report are skipped."""
+
+from functools import partial
 
 import frappe
+from botocore.exceptions import ClientError
 from frappe.utils import sbool
 
-from frappe_s3_integration.s3_core import getS3Connection, _guess_content_type
+from frappe_s3_integration.s3_core import getS3Connection, _guess_content_type, _replace_metadata, _s3_error_code
+from frappe_s3_integration.s3_core.bulk import BulkS3
 
 OCTET = ("binary/octet-stream", "application/octet-stream", "", None)
 MAX_SINGLE_COPY = 5 * 1024 ** 3  # S3 single-operation copy limit (M6)
@@ -28,12 +38,44 @@ def backfill_content_types(dry_run=True):
 	if conn.s3_settings.disable_s3_operations:
 		frappe.throw("S3 operations are disabled")
 
+	def _retag(bucket_name, is_public, key):
+		"""HEAD + copy for one object, run on the bulk engine. True when it was (or, on a
+		dry run, would be) re-tagged."""
+		head = _head(conn, bucket_name, key)
+		if head is None or head.get("ContentType") not in OCTET:
+			return False
+		new_ct = _guess_content_type(key)
+		if new_ct == "application/octet-stream":
+			return False  # nothing better to set
+		if dry_run:
+			return True
+		params = {
+			"Bucket": bucket_name,
+			"Key": key,
+			"CopySource": {"Bucket": bucket_name, "Key": key},
+			# REPLACE drops unspecified metadata — carry user metadata and the
+			# Cache-Control policy forward
+			**_replace_metadata(head, head.get("CacheControl"), content_type=new_ct),
+		}
+		if is_public:
+			params["ACL"] = "public-read"
+		conn.connection.copy_object(**params)
+		return True
+
+	engine = BulkS3(conn)
 	out = {"dry_run": bool(dry_run)}
 	for bucket_name, is_public in [(conn.public_bucket, True), (conn.private_bucket, False)]:
 		if not bucket_name:
 			continue
 		scanned = fixed = errors = 0
-		for obj in conn.list_objects(bucket_name):
+
+		def _plan(obj):
+			if obj.get("ContentType") and obj["ContentType"] not in OCTET:
+				return None  # the inventory row already says it's typed: no HEAD
+			if obj.get("Size", 0) <= MAX_SINGLE_COPY:
+				return partial(_retag, bucket_name, is_public, obj["Key"])
+
+		for obj, retagged in engine.prefetch(conn.iter_objects(bucket_name), _plan):
 			key = obj["Key"]
 			scanned += 1
 			try:
@@ -41,29 +83,81 @@ def backfill_content_types(dry_run=True):
 					frappe.log_error(f"Skip >5GB object: {bucket_name}/{key}", "S3 Backfill")
 					errors += 1
 					continue
-				head = conn.connection.head_object(Bucket=bucket_name, Key=key)
-				if head.get("ContentType") not in OCTET:
-					continue
-				new_ct = _guess_content_type(key)
-				if new_ct == "application/octet-stream":
-					continue  # nothing better to set
-				fixed += 1
-				if dry_run:
+				if retagged():
+					fixed += 1
+			except Exception:
+				errors += 1
+				frappe.log_error(frappe.get_traceback(), f"S3 Backfill failed: {bucket_name}/{key}")
+		out[bucket_name] = {"scanned": scanned, "fixed": fixed, "errors": errors}
+	return out
+
+
+@frappe.whitelist()
+def backfill_cache_control(dry_run=True):
+	"""Apply each bucket row's Cache-Control policy to objects uploaded before it was set,
+	via the same in-place server-side copy as backfill_content_types (type and user
+	metadata preserved). Re-runnable — objects already carrying the policy, or whose
+	extension the policy doesn't cover, are skipped."""
+	if not frappe.has_permission("AWS S3 Settings", "write"):
+		frappe.throw("Not permitted", frappe.PermissionError)
+	dry_run = sbool(dry_run)
+	conn = getS3Connection()
+	if conn.s3_settings.disable_s3_operations:
+		frappe.throw("S3 operations are disabled")
+
+	def _apply(bucket_name, is_public, key, policy):
+		head = _head(conn, bucket_name, key)
+		if head is None or head.get("CacheControl") == policy:
+			return False
+		if dry_run:
+			return True
+		params = {
+			"Bucket": bucket_name,
+			"Key": key,
+			"CopySource": {"Bucket": bucket_name, "Key": key},
+			**_replace_metadata(head, policy),
+		}
+		if is_public:
+			params["ACL"] = "public-read"
+		conn.connection.copy_object(**params)
+		return True
+
+	engine = BulkS3(conn)
+	out = {"dry_run": bool(dry_run)}
+	for row in conn.s3_settings.s3_bucket_details:
+		bucket_name = row.get("bucket_name")
+		if not bucket_name or not (row.get("cache_control") or "").strip():
+			continue
+		scanned = fixed = errors = 0
+
+		def _plan(obj):
+			policy = conn.cache_control_for(bucket_name, obj["Key"])
+			if policy and obj.get("Size", 0) <= MAX_SINGLE_COPY:
+				return partial(_apply, bucket_name, row.get("default_public_bucket"), obj["Key"], policy)
+
+		for obj, applied in engine.prefetch(conn.iter_objects(bucket_name), _plan):
+			key = obj["Key"]
+			scanned += 1
+			try:
+				if obj.get("Size", 0) > MAX_SINGLE_COPY:
+					if conn.cache_control_for(bucket_name, key):
+						frappe.log_error(f"Skip >5GB object: {bucket_name}/{key}", "S3 Backfill")
+						errors += 1
 					continue
-				params = {
-					"Bucket": bucket_name,
-					"Key": key,
-					"CopySource": {"Bucket": bucket_name, "Key": key},
-					"ContentType": new_ct,
-					"MetadataDirective": "REPLACE",
-				}
-				if head.get("Metadata"):  # REPLACE drops unspecified metadata — carry user metadata forward
-					params["Metadata"] = head["Metadata"]
-				if is_public:
-					params["ACL"] = "public-read"
-				conn.connection.copy_object(**params)
+				if applied():
+					fixed += 1
 			except Exception:
 				errors += 1
 				frappe.log_error(frappe.get_traceback(), f"S3 Backfill failed: {bucket_name}/{key}")
 		out[bucket_name] = {"scanned": scanned, "fixed": fixed, "errors": errors}
 	return out
+
+
+def _head(conn, bucket_name, key):
+	"""head_object, or None for a key deleted since the inventory report listed it."""
+	try:
+		return conn.connection.head_object(Bucket=bucket_name, Key=key)
+	except ClientError as e:
+		if _s3_error_code(e) in ("404", "NoSuchKey", "NotFound"):
+			return None
+		raise
@@ -1,6 +1,6 @@
 # Copyright (c) 2026, sakthi123msd@gmail.com and contributors
 # For license information, please see license.txt
-"""Nightly dual backup: snapshot both S3 buckets into one compressed .tar.gz each, keeping
+"""Nightly dual backup: snapshot both S3 buckets into one compressed tar each, keeping
 only the newest N. Read-only on S3 (invariant 5) — never mutates the source buckets.
 
 Target is chosen by AWS S3 Settings:
@@ -8,17 +8,40 @@ Target is chosen by AWS S3 Settings:
     (username + password + directory), using ~0 local disk here. This is the second copy,
     off both S3 and this server.
   • SSH Host blank -> write to a local directory (default private/s3_bucket_backups).
-Restore is a manual step (untar the snapshot on the other machine)."""
+Restore is a manual step (untar the snapshot on the other machine).
 
+Backup Mode "Incremental" archives only what changed: each archive gets a manifest beside
+it (every object's key, size, ETag and last-modified at that run), and the next run puts
+just the objects that are new or differ from it into a `.delta.tar.gz` (or .tar.zst/.tar). A chain is a full
+snapshot plus the deltas taken after it; a new full starts once a chain holds Full
+Snapshot Every archives, and retention counts whole chains (docs/RESTORE.md).
+
+Backup Compression picks the codec: gzip (.tar.gz, the default), zstd (.tar.zst, needs
+the optional `zstandard` package), pigz (a parallel gzip, .tar.gz, needs the `pigz`
+binary) or none (.tar). Objects whose extension is listed in Store Without Compression
+(JPEG, PDF, XLSX... already compressed) skip the compressor's work (_ArchiveWriter)."""
+
+import gzip
+import json
 import os
 import posixpath
+import re
 import shutil
+import subprocess
 import tarfile
+import tempfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, nullcontext
 
 import frappe
-from frappe.utils import get_site_path, now
+from botocore.exceptions import ClientError
+from frappe.utils import cint, get_site_path, now
 
-from frappe_s3_integration.s3_core import getS3Connection
+from frappe_s3_integration.s3_core import _s3_error_code, getS3Connection
+from frappe_s3_integration.s3_core.bulk import bulk_concurrency
 
 
 def _backup_dir(settings):
@@ -53,15 +76,86 @@ def _safe_rel_key(key):
 	return rel
 
 
-def _prune_old_archives(directory, prefix, keep):
-	"""Keep the newest `keep` archives for a bucket (date-stamped names sort lexically)."""
-	archives = sorted(f for f in os.listdir(directory)
-	                  if f.startswith(prefix) and f.endswith(".tar.gz"))
+ARCHIVE_EXTS = (".tar.gz", ".tar.zst", ".tar")
+DELTA = ".delta"
+MANIFEST_EXT = ".manifest.jsonl.gz"
+
+
+def _archive_name(bucket_name, stamp, delta=False, ext=".tar.gz"):
+	return f"{bucket_name}-{stamp}{DELTA if delta else ''}{ext}"
+
+
+def _archive_stem(name):
+	"""`name` without its archive extension, or None if it isn't an archive."""
+	for ext in ARCHIVE_EXTS:
+		if name.endswith(ext):
+			return name[:-len(ext)]
+	return None
+
+
+def _is_delta(archive):
+	return _archive_stem(archive).endswith(DELTA)
+
+
+def _manifest_name(archive):
+	"""The manifest written beside `archive` (a full snapshot or a delta, any codec)."""
+	stem = _archive_stem(archive)
+	return (stem[:-len(DELTA)] if stem.endswith(DELTA) else stem) + MANIFEST_EXT
+
+
+def _is_part(name):
+	"""A .part left by an unfinished archive or manifest write."""
+	return name.endswith(".part") and (
+		_archive_stem(name[:-5]) is not None or name[:-5].endswith(MANIFEST_EXT))
+
+
+# _stamp(): "2026-10-18_01-00-00.123456". "_" can't occur in a bucket name, so a name
+# matched against "<bucket>-<STAMP>" never belongs to another bucket that merely starts
+# with the same prefix ("erp" vs "erp-pub").
+STAMP = r"\d{4}-\d{2}-\d{2}(?:_\d{2}-\d{2}-\d{2}(?:\.\d+)?)?"
+
+
+def _stamped(bucket_name, suffix):
+	"""Pattern for `<bucket>-<stamp><suffix>`; `suffix` is a regex."""
+	return re.compile(rf"{re.escape(bucket_name)}-{STAMP}{suffix}$")
+
+
+def _archives(names, bucket_name):
+	"""A bucket's finished archives, oldest first (date-stamped names sort lexically)."""
+	pattern = _stamped(bucket_name, rf"(?:{re.escape(DELTA)})?(?:{'|'.join(map(re.escape, ARCHIVE_EXTS))})")
+	return sorted(n for n in names if pattern.match(n))
+
+
+def _chains(archives):
+	"""Group archives (oldest first) into chains: a full snapshot and the deltas taken
+	after it. Deltas older than every full snapshot form a leading chain of their own."""
+	chains = []
+	for n in archives:
+		if _is_delta(n) and chains:
+			chains[-1].append(n)
+		else:
+			chains.append([n])
+	return chains
+
+
+def _expired(archives, keep):
+	"""Archives outside the newest `keep` chains. A delta only restores on top of the
+	archives before it, so chains are dropped whole, never split."""
+	chains = _chains(archives)
+	return [n for chain in (chains[:-keep] if keep > 0 else chains) for n in chain]
+
+
+def _prune_old_archives(directory, bucket_name, keep):
+	"""Keep the newest `keep` chains for a bucket, each archive with its manifest. Without
+	incremental backups every chain is a single snapshot."""
+	names = os.listdir(directory)
 	removed = []
-	for f in (archives[:-keep] if keep > 0 else archives):
+	for f in _expired(_archives(names, bucket_name), keep):
 		try:
 			os.remove(os.path.join(directory, f))
 			removed.append(f)
+			if _manifest_name(f) in names:
+				os.remove(os.path.join(directory, _manifest_name(f)))
 		except Exception:
 			frappe.log_error(f"Failed to prune backup: {f}", "S3 Backup")
 	return removed
@@ -91,17 +185,139 @@ def _buckets(conn):
 	return seen
 
 
+def _listing(conn, bucket_name):
+	"""Objects to archive. A bucket row with both an Inventory Source and Inventory For
+	Backup is read from its S3 Inventory report instead of being listed; objects written
+	after that report are then picked up by a later backup."""
+	for row in conn.s3_settings.get("s3_bucket_details") or []:
+		if row.get("bucket_name") == bucket_name and row.get("inventory_for_backup"):
+			return conn.iter_objects(bucket_name)
+	return conn.list_objects(bucket_name)
+
+
+def _vanished(e):
+	"""The object was deleted after it was listed (an inventory report lags by up to a
+	week): nothing to archive, and not a failed download."""
+	return isinstance(e, ClientError) and _s3_error_code(e) in ("404", "NoSuchKey", "NotFound")
+
+
+# ---- incremental mode: manifests and chains ---------------------------------------------
+
+def _etag(obj):
+	return (obj.get("ETag") or "").strip('"')
+
+
+def _modified(obj):
+	value = obj.get("LastModified")
+	if hasattr(value, "isoformat"):
+		return value.isoformat()
+	return str(value or "")
+
+
+class _Chain:
+	"""One bucket's place in its incremental chain for this run. `previous` is the newest
+	archive's manifest ({key: [size, etag, last_modified]}), or None when this run starts a
+	new chain with a full snapshot."""
+
+	def __init__(self, previous=None):
+		self.previous = previous
+
+	@property
+	def delta(self):
+		return self.previous is not None
+
+	def changed(self, obj):
+		"""True when `obj` must go into this run's archive: always for a full snapshot,
+		otherwise when it is new or its size or ETag differ from the previous manifest (the
+		last-modified time stands in when either side has no ETag)."""
+		if self.previous is None:
+			return True
+		before = self.previous.get(obj["Key"])
+		if before is None:
+			return True
+		size, etag, modified = before[:3]
+		if obj.get("Size") != size:
+			return True
+		if etag and _etag(obj):
+			return etag != _etag(obj)
+		return modified != _modified(obj)
+
+
+class _ManifestWriter:
+	"""Write a manifest into `fileobj`: gzipped JSON lines, a header line and then one
+	[key, size, etag, last_modified] per object the bucket held at this run. Unchanged
+	objects are listed too, so the newest manifest is the bucket's whole state and a
+	restore can tell which keys were deleted since the full snapshot."""
+
+	def __init__(self, fileobj, header):
+		self._gz = gzip.GzipFile(fileobj=fileobj, mode="wb")
+		self._write(header)
+
+	def _write(self, row):
+		self._gz.write((json.dumps(row) + "\n").encode())
+
+	def add(self, obj, *extra):
+		self._write([obj["Key"], obj.get("Size"), _etag(obj), _modified(obj), *extra])
+
+	def close(self):
+		self._gz.close()
+
+
+def _read_manifest(fileobj):
+	"""{key: [size, etag, last_modified]} from a manifest file object (header skipped)."""
+	with gzip.GzipFile(fileobj=fileobj, mode="rb") as f:
+		next(f)
+		return {row[0]: row[1:] for row in map(json.loads, f)}
+
+
+def _manifest_header(bucket_name, archive, chain):
+	return {"bucket": bucket_name, "archive": archive, "kind": "delta" if chain.delta else "full"}
+
+
+def _next_chain(names, bucket_name, full_every, open_file):
+	"""The _Chain for this run of `bucket_name`, given the names in its backup directory:
+	a delta on top of the newest archive, or a new full snapshot when there is no chain yet,
+	the current one already holds `full_every` archives, or its newest manifest is missing
+	or unreadable. `open_file(name)` opens a file of that directory for reading."""
+	chains = _chains(_archives(names, bucket_name))
+	if not chains or _is_delta(chains[-1][0]) or len(chains[-1]) >= full_every:
+		return _Chain()
+	manifest = _manifest_name(chains[-1][-1])
+	if manifest not in names:
+		return _Chain()
+	try:
+		with open_file(manifest) as f:
+			return _Chain(_read_manifest(f))
+	except Exception:
+		frappe.log_error(frappe.get_traceback(),
+		                 f"S3 Backup: manifest {manifest} unreadable — taking a full snapshot")
+		return _Chain()
+
+
+STORE_MODE = "Content-Addressed Store"
+
+
+def _full_every(settings):
+	"""Archives per chain in Incremental mode, or None in the other modes (no manifests)."""
+	if settings.get("backup_mode") != "Incremental":
+		return None
+	return max(int(settings.get("backup_full_every") or 7), 1)
+
+
 def run_backup_s3_buckets():
 	conn = getS3Connection()
 	settings = conn.s3_settings
 	if settings.disable_s3_operations or not settings.get("enable_bucket_backup"):
 		return
 	keep = int(settings.get("backup_retention_count") or 7)
+	full_every = _full_every(settings)
+	codec = _codec(settings)
+	store = settings.get("backup_mode") == STORE_MODE
 	ssh = _ssh_settings(settings)
 	if ssh:
-		_run_remote_backup(conn, ssh, keep)      # push snapshots to another computer
+		_run_remote_backup(conn, ssh, keep, full_every=full_every, codec=codec, store=store)      # push snapshots to another computer
 	else:
-		_run_local_backup(conn, settings, keep)  # keep snapshots on local disk
+		_run_local_backup(conn, settings, keep, full_every=full_every, codec=codec, store=store)  # keep snapshots on local disk
 
 
 def _stamp():
@@ -168,69 +384,381 @@ class _CountingWriter:
 			f()
 
 
-def _stream_bucket_to_remote(conn, bucket_name, sftp, remote_dir, stamp):
+# ---- archive codecs ------------------------------------------------------------------------
+
+CODECS = {  # Backup Compression -> (codec, archive extension)
+	"Gzip": ("gzip", ".tar.gz"),
+	"Zstandard": ("zstd", ".tar.zst"),
+	"Parallel Gzip (pigz)": ("pigz", ".tar.gz"),
+	"None": ("none", ".tar"),
+}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3, "pigz": 6}
+LEVEL_RANGES = {"gzip": (1, 9), "zstd": (1, 22), "pigz": (1, 9)}
+DEFAULT_STORE_EXTENSIONS = ("jpg jpeg png gif webp heic pdf zip gz tgz bz2 xz zst 7z rar "
+                            "xlsx docx pptx odt ods mp3 mp4 mov webm")
+
+
+class _Codec:
+	"""The compression a run writes its archives with. Chosen once per run (_codec), so
+	a whole archive and its name always agree."""
+
+	def __init__(self, name="gzip", ext=".tar.gz", level=None, store=()):
+		self.name = name
+		self.ext = ext
+		low, high = LEVEL_RANGES.get(name, (0, 0))
+		self.level = min(max(int(level or DEFAULT_LEVELS.get(name, 0)), low), high)
+		self.store = frozenset(store)
+
+	def stored(self, key):
+		"""True when `key`'s extension is archived without compression."""
+		return posixpath.splitext(key)[1].lstrip(".").lower() in self.store
+
+	def open(self, out):
+		if self.name == "zstd":
+			return _ZstdWriter(out, self.level)
+		if self.name == "pigz":
+			return _PigzWriter(out, self.level)
+		if self.name == "none":
+			return _ArchiveWriter(out)
+		return _GzipWriter(out, self.level)
+
+
+def _codec(settings):
+	"""The _Codec for this run from AWS S3 Settings. A codec whose dependency is missing
+	here (the zstandard package, the pigz binary) falls back to gzip with an Error Log, so
+	the night's backup is still taken."""
+	choice = settings.get("backup_compression") or "Gzip"
+	name, ext = CODECS.get(choice, CODECS["Gzip"])
+	if name == "zstd" and not _zstandard():
+		frappe.log_error("S3 Backup: Zstandard selected but the `zstandard` package is not installed "
+		                 "(`pip install zstandard` in the bench env) — writing gzip archives.", "S3 Backup")
+		name, ext = CODECS["Gzip"]
+	elif name == "pigz" and not shutil.which("pigz"):
+		frappe.log_error("S3 Backup: Parallel Gzip selected but `pigz` is not on PATH — writing gzip archives.",
+		                 "S3 Backup")
+		name, ext = CODECS["Gzip"]
+	store = settings.get("backup_store_extensions")
+	store = (DEFAULT_STORE_EXTENSIONS if store is None else store).replace(",", " ").lower().split()
+	return _Codec(name, ext, settings.get("backup_compression_level"), [e.lstrip(".") for e in store])
+
+
+def _zstandard():
+	try:
+		import zstandard
+	except ImportError:
+		return None
+	return zstandard
+
+
+class _ArchiveWriter:
+	"""File object tarfile ("w|") writes the plain tar stream to; subclasses compress it
+	into `out`. Before each member _write_archive calls store(True) for objects archived
+	without compression, which the gzip and zstd writers honour by starting a new gzip
+	member / zstd frame at level 0 / 1: concatenated members and frames decompress to the
+	same stream, so `tar xzf` and `zstd -d` read the archive as usual. tarfile buffers a
+	record (10 KB), which may land in the neighbouring member — harmless. Use as a context
+	manager: leaving on an exception abandons the stream instead of finishing it."""
+
+	def __init__(self, out):
+		self.out = out
+
+	def store(self, stored):
+		pass
+
+	def write(self, data):
+		self.out.write(data)
+		return len(data)
+
+	def close(self):
+		pass
+
+	def abort(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, *exc):
+		if exc_type:
+			self.abort()
+		else:
+			self.close()
+
+
+class _FramedWriter(_ArchiveWriter):
+	"""Compress into consecutive members/frames, a new one whenever store() flips."""
+
+	def __init__(self, out, level):
+		super().__init__(out)
+		self.level = level
+		self._stored = False
+		self._c = None
+
+	def store(self, stored):
+		if stored != self._stored:
+			self._end()
+			self._stored = stored
+
+	def write(self, data):
+		if self._c is None:
+			self._c = self._compressor(self._stored)
+		self.out.write(self._c.compress(data))
+		return len(data)
+
+	def _end(self):
+		if self._c is not None:
+			self.out.write(self._c.flush())
+			self._c = None
+
+	def close(self):
+		self._end()
+
+
+class _GzipWriter(_FramedWriter):
+	def _compressor(self, stored):
+		return zlib.compressobj(0 if stored else self.level, zlib.DEFLATED, 31)  # 31: gzip member
+
+
+class _ZstdWriter(_FramedWriter):
+	"""zstd on every core; a stored object gets the fastest level, at which zstd keeps
+	incompressible blocks raw."""
+
+	def __init__(self, out, level):
+		super().__init__(out, level)
+		zstandard = _zstandard()
+		self._cctx = {stored: zstandard.ZstdCompressor(level=1 if stored else level, threads=-1)
+		              for stored in (False, True)}
+
+	def _compressor(self, stored):
+		return self._cctx[stored].compressobj()
+
+
+class _PigzWriter(_ArchiveWriter):
+	"""Pipe the tar through `pigz` (gzip on every core). A pump thread copies its output
+	into `out`; on a write error it records the error and keeps draining, so pigz never
+	blocks, and close() raises it. Store Without Compression doesn't apply: one process
+	compresses the whole stream."""
+
+	def __init__(self, out, level):
+		super().__init__(out)
+		self.proc = subprocess.Popen([shutil.which("pigz"), f"-{level}", "-c"],
+		                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+		self.error = None
+		self.pump = threading.Thread(target=self._pump, name="s3-backup-pigz", daemon=True)
+		self.pump.start()
+
+	def _pump(self):
+		for chunk in iter(lambda: self.proc.stdout.read(_COPY_CHUNK), b""):
+			if self.error is None:
+				try:
+					self.out.write(chunk)
+				except Exception as e:
+					self.error = e
+
+	def write(self, data):
+		self.proc.stdin.write(data)
+		return len(data)
+
+	def close(self):
+		self.proc.stdin.close()
+		self.pump.join()
+		code = self.proc.wait()
+		if self.error is not None:
+			raise self.error
+		if code:
+			raise IOError(f"pigz exited with status {code}")
+
+	def abort(self):
+		self.proc.kill()
+		self.proc.wait()
+		self.pump.join()
+
+
+# ---- prefetching writer -------------------------------------------------------------------
+
+PREFETCH_MEMORY_MB = 256  # bodies held in memory across all prefetching downloads
+PREFETCH_WORKERS = 8      # downloads in flight ahead of the archive writer
+_COPY_CHUNK = 1024 * 1024
+
+
+def _prefetch_workers(settings):
+	"""Downloads a backup keeps in flight: site_config s3_backup_prefetch_workers, default
+	PREFETCH_WORKERS, never more than the bulk concurrency the connection pool is sized
+	for. Kept small because the prefetch memory budget is split across them; one archive
+	is written sequentially, so more downloads only shrink each one's share."""
+	workers = cint(frappe.conf.get("s3_backup_prefetch_workers")) or PREFETCH_WORKERS
+	return max(1, min(workers, bulk_concurrency(settings)))
+
+
+def _prefetch_spool_max(workers):
+	"""Per-download in-memory limit: the prefetch budget (site_config s3_backup_prefetch_mb)
+	split across the downloads in flight plus the one being written. Larger bodies spill
+	to a temp file."""
+	budget = int(frappe.conf.get("s3_backup_prefetch_mb") or PREFETCH_MEMORY_MB) * 1024 * 1024
+	return max(budget // (workers + 1), _COPY_CHUNK)
+
+
+def _download(conn, bucket_name, key, spool_max):
+	"""GET one object into a SpooledTemporaryFile, rewound. Runs on a prefetch thread,
+	without frappe context. A body shorter than its ContentLength raises rather than being
+	archived short."""
+	resp = conn.get_file_from_bucket(key, bucket_name)
+	body = resp["Body"]
+	spool = tempfile.SpooledTemporaryFile(max_size=spool_max)
+	try:
+		shutil.copyfileobj(body, spool, _COPY_CHUNK)
+		size = spool.tell()
+		if "ContentLength" in resp and size != int(resp["ContentLength"]):
+			raise IOError(f"{bucket_name}/{key}: got {size} of {resp['ContentLength']} bytes")
+		spool.seek(0)
+	except BaseException:
+		spool.close()
+		raise
+	finally:
+		try:
+			body.close()
+		except Exception:
+			pass
+	return size, spool
+
+
+def _prefetch(conn, bucket_name, objects, workers, spool_max):
+	"""Yield (obj, future) in the order of `objects`, keeping up to `workers` downloads in
+	flight ahead of the consumer. future.result() is _download's (size, spool) or raises
+	its error; the consumer closes each spool. Objects are pulled from `objects` lazily, so
+	a bucket listing is never buffered; spools left unread when the consumer stops early
+	are closed here."""
+	window = deque()
+	pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-backup")
+	try:
+		for obj in objects:
+			window.append((obj, pool.submit(_download, conn, bucket_name, obj["Key"], spool_max)))
+			if len(window) > workers:
+				yield window.popleft()
+		while window:
+			yield window.popleft()
+	finally:
+		pool.shutdown(wait=True, cancel_futures=True)
+		for _, future in window:
+			if not future.cancelled() and future.exception() is None:
+				future.result()[1].close()
+
+
+def _write_archive(conn, bucket_name, out, chain=None, manifest=None, workers=1, codec=None):
+	"""Stream `bucket_name` as a tar compressed with `codec` (gzip by default) into the file
+	object `out`, object by object in listing order, with up to `workers` downloads
+	prefetched (_prefetch). With a `chain`
+	only its changed objects are archived, and every object goes to `manifest`. A failed
+	GET raises (a vanished object is skipped). Returns (expected, archived) counts."""
+	expected = archived = 0
+
+	def wanted():  # objects for this archive; unchanged ones only go to the manifest
+		for obj in _listing(conn, bucket_name):
+			if not _safe_rel_key(obj["Key"]):
+				continue
+			if chain and not chain.changed(obj):
+				manifest.add(obj)
+				continue
+			yield obj
+
+	codec = codec or _Codec()
+	fetches = _prefetch(conn, bucket_name, wanted(), workers, _prefetch_spool_max(workers))
+	with closing(fetches), codec.open(out) as z, tarfile.open(fileobj=z, mode="w|") as tar:
+		for obj, fetched in fetches:
+			try:
+				size, spool = fetched.result()
+			except ClientError as e:
+				if _vanished(e):
+					continue
+				raise
+			expected += 1
+			with spool:
+				info = tarfile.TarInfo(name=f"{bucket_name}/{_safe_rel_key(obj['Key'])}")
+				# the bytes actually fetched: an inventory row's size may predate an overwrite
+				info.size = size
+				z.store(codec.stored(obj["Key"]))
+				tar.addfile(info, fileobj=spool)
+				archived += 1
+			if manifest:
+				manifest.add(obj)
+	return expected, archived
+
+
+def _stream_bucket_to_remote(conn, bucket_name, sftp, remote_dir, stamp, chain=None, workers=1,
+                             codec=None):
 	"""Stream one bucket into `<dir>/<bucket>-<stamp>.tar.gz` on the remote, object by object,
 	with NO local staging. Writes to a .part file and renames on full success; on any failure
 	the partial file is removed and previous snapshots are kept (never erode the second copy).
 	Returns True only when every object was archived AND the remote file is the exact size we
-	streamed (so a silently-truncated upload can never be renamed to a good snapshot)."""
-	remote_final = posixpath.join(remote_dir, f"{bucket_name}-{stamp}.tar.gz")
+	streamed (so a silently-truncated upload can never be renamed to a good snapshot).
+
+	Up to `workers` objects are downloaded ahead of the tar writer (_write_archive), so the
+	SFTP link isn't idle while each GET is in flight.
+
+	With a `chain` (Incremental mode) only the objects it reports changed are archived, into
+	a .delta.tar.gz when it continues a chain, and the manifest is streamed beside the archive
+	under the same rules: it is renamed into place after the archive, so a run that dies in
+	between leaves an archive without a manifest and the next run starts a new chain."""
+	codec = codec or _Codec()
+	archive = _archive_name(bucket_name, stamp, delta=bool(chain and chain.delta), ext=codec.ext)
+	remote_final = posixpath.join(remote_dir, archive)
 	remote_part = remote_final + ".part"
+	parts = [(remote_part, remote_final)]
 	expected = archived = 0
 	ok = False
 	rf = sftp.open(remote_part, "wb")
-	counter = _CountingWriter(rf)
+	files = [(rf, _CountingWriter(rf))]
+	manifest = None
 	try:
 		rf.set_pipelined(True)
-		with tarfile.open(fileobj=counter, mode="w|gz") as tar:
-			for obj in conn.list_objects(bucket_name):
-				rel = _safe_rel_key(obj["Key"])
-				if not rel:
-					continue
-				expected += 1
-				body = conn.get_file_from_bucket(obj["Key"], bucket_name)["Body"]
-				try:
-					info = tarfile.TarInfo(name=f"{bucket_name}/{rel}")
-					info.size = int(obj.get("Size") or 0)
-					tar.addfile(info, fileobj=body)
-					archived += 1
-				finally:
-					try:
-						body.close()
-					except Exception:
-						pass
-		rf.close()  # flush pending pipelined writes to the server before we trust the size
+		if chain:
+			manifest_final = posixpath.join(remote_dir, _manifest_name(archive))
+			parts.append((manifest_final + ".part", manifest_final))
+			mf = sftp.open(manifest_final + ".part", "wb")
+			files.append((mf, _CountingWriter(mf)))
+			mf.set_pipelined(True)
+			manifest = _ManifestWriter(files[1][1], _manifest_header(bucket_name, archive, chain))
+		expected, archived = _write_archive(conn, bucket_name, files[0][1], chain, manifest, workers, codec)
+		if manifest:
+			manifest.close()
+		for f, _ in files:
+			f.close()  # flush pending pipelined writes to the server before we trust the size
 		if expected == archived:
-			remote_size = sftp.stat(remote_part).st_size
-			if remote_size == counter.count:
-				ok = True
-			else:
-				frappe.log_error(
-					f"S3 Backup: {bucket_name} snapshot truncated on remote "
-					f"({remote_size} of {counter.count} bytes) — discarded, previous snapshots kept.",
-					"S3 Backup")
+			ok = True
+			for (part, _), (_, counter) in zip(parts, files):
+				remote_size = sftp.stat(part).st_size
+				if remote_size != counter.count:
+					ok = False
+					frappe.log_error(
+						f"S3 Backup: {bucket_name} snapshot truncated on remote "
+						f"({remote_size} of {counter.count} bytes) — discarded, previous snapshots kept.",
+						"S3 Backup")
+					break
 	except Exception:
 		frappe.log_error(frappe.get_traceback(), f"S3 Backup: streaming {bucket_name} to remote failed")
 	finally:
-		try:
-			rf.close()
-		except Exception:
-			pass
-	if ok:
-		try:
+		for f, _ in files:
 			try:
-				sftp.remove(remote_final)   # replace any leftover with the same name
-			except IOError:
+				f.close()
+			except Exception:
 				pass
-			sftp.rename(remote_part, remote_final)
+	if ok:
+		try:
+			for part, final in parts:  # the archive first: a manifest never outruns its archive
+				try:
+					sftp.remove(final)   # replace any leftover with the same name
+				except IOError:
+					pass
+				sftp.rename(part, final)
 			return True
 		except Exception:
 			frappe.log_error(frappe.get_traceback(), f"S3 Backup: finalising {bucket_name} snapshot failed")
-	# failed / incomplete -> drop the partial, keep history
-	try:
-		sftp.remove(remote_part)
-	except Exception:
-		pass  # dead connection etc. — reaped by the next run's stale-.part sweep
+	# failed / incomplete -> drop the partials, keep history
+	for part, _ in parts:
+		try:
+			sftp.remove(part)
+		except Exception:
+			pass  # dead connection etc. — reaped by the next run's stale-.part sweep
 	if not ok and archived != expected:
 		frappe.log_error(
 			f"S3 Backup incomplete for {bucket_name}: {archived}/{expected} objects — "
@@ -239,11 +767,11 @@ def _stream_bucket_to_remote(conn, bucket_name, sftp, remote_dir, stamp):
 
 
 def _reap_stale_parts(sftp, remote_dir):
-	"""Remove leftover *.tar.gz.part from earlier failed/killed runs. The backup job is
-	deduplicated (never concurrent), so any .part present at the start of a run is stale —
+	"""Remove leftover archive and manifest .part files from earlier failed/killed runs. The
+	backup job is deduplicated (never concurrent), so any .part present at the start of a run is stale —
 	otherwise a broken link would leak partial archives onto the remote disk unbounded."""
 	try:
-		stale = [n for n in sftp.listdir(remote_dir) if n.endswith(".tar.gz.part")]
+		stale = [n for n in sftp.listdir(remote_dir) if _is_part(n)]
 	except Exception:
 		return
 	for n in stale:
@@ -254,17 +782,19 @@ def _reap_stale_parts(sftp, remote_dir):
 
 
 def _prune_remote(sftp, remote_dir, bucket_name, keep):
-	"""Keep only the newest `keep` snapshots for a bucket on the remote (date-stamped names
-	sort chronologically). Only removes finished .tar.gz files, never .part."""
+	"""Keep only the newest `keep` chains for a bucket on the remote (see _expired; without
+	incremental backups, the newest `keep` snapshots). Only removes finished archives
+	and their manifests, never .part."""
 	try:
-		names = sorted(n for n in sftp.listdir(remote_dir)
-		               if n.startswith(f"{bucket_name}-") and n.endswith(".tar.gz"))
+		names = sftp.listdir(remote_dir)
 	except Exception:
 		frappe.log_error(frappe.get_traceback(), f"S3 Backup: listing remote for prune failed ({bucket_name})")
 		return
-	for n in (names[:-keep] if keep > 0 else names):
+	for n in _expired(_archives(names, bucket_name), keep):
 		try:
 			sftp.remove(posixpath.join(remote_dir, n))
+			if _manifest_name(n) in names:
+				sftp.remove(posixpath.join(remote_dir, _manifest_name(n)))
 		except Exception:
 			frappe.log_error(f"Failed to prune remote snapshot: {n}", "S3 Backup")
 
@@ -287,7 +817,13 @@ def _ensure_remote_dir(sftp, directory):
 				pass  # already created concurrently, or a parent perms issue surfaced below
 
 
-def _run_remote_backup(conn, ssh, keep):
+def _remote_chain(sftp, remote_dir, bucket_name, full_every):
+	names = sftp.listdir(remote_dir)
+	return _next_chain(names, bucket_name, full_every,
+	                   lambda n: sftp.open(posixpath.join(remote_dir, n), "rb"))
+
+
+def _run_remote_backup(conn, ssh, keep, full_every=None, codec=None, store=False):
 	if not (ssh["user"] and ssh["password"] and ssh["directory"]):
 		frappe.log_error("S3 Backup: SSH host set but user/password/directory missing — skipped", "S3 Backup")
 		return
@@ -304,12 +840,20 @@ def _run_remote_backup(conn, ssh, keep):
 			"S3 Backup: SSH connect failed — skipped (check host in known_hosts, user/password, directory)")
 		return
 	stamp = _stamp()
+	workers = _prefetch_workers(conn.s3_settings)
 	try:
 		_ensure_remote_dir(sftp, ssh["directory"])   # per-site directory, created on demand
 		_reap_stale_parts(sftp, ssh["directory"])    # reclaim partials from earlier failed runs
+		if store:
+			from frappe_s3_integration.frappe_s3_integration import backup_store
+
+			backup_store.run_store_backup(conn, backup_store.SFTPTarget(sftp, ssh["directory"]), stamp, keep, workers)
+			return
 		for bucket_name in _buckets(conn):
 			try:
-				if _stream_bucket_to_remote(conn, bucket_name, sftp, ssh["directory"], stamp):
+				chain = _remote_chain(sftp, ssh["directory"], bucket_name, full_every) if full_every else None
+				if _stream_bucket_to_remote(conn, bucket_name, sftp, ssh["directory"], stamp,
+				                            chain=chain, workers=workers, codec=codec):
 					_prune_remote(sftp, ssh["directory"], bucket_name, keep)
 			except Exception:
 				# one bucket erroring must not abort the other bucket or crash the job
@@ -324,7 +868,65 @@ def _run_remote_backup(conn, ssh, keep):
 
 # ---- local target (fallback when no SSH host is configured) -----------------------------
 
-def _run_local_backup(conn, settings, keep):
+def _reap_local_parts(base):
+	"""Remove .part files and staging directories (from before archives were streamed)
+	left by earlier failed/killed runs; the job never runs concurrently (see
+	_reap_stale_parts)."""
+	for n in os.listdir(base):
+		path = os.path.join(base, n)
+		try:
+			if n.startswith(".staging-"):
+				shutil.rmtree(path)
+			elif _is_part(n):
+				os.remove(path)
+		except Exception:
+			pass
+
+
+def _write_local(conn, bucket_name, base, stamp, chain=None, workers=1, codec=None):
+	"""Stream one bucket straight into `<base>/<archive>.part`, no staging directory, so a
+	run needs only archive-sized free space and writes every byte once. Same rules as
+	_stream_bucket_to_remote: the .part files are fsynced and renamed (archive first, then
+	its manifest) only when every object was archived; otherwise they are removed and the
+	previous archives are kept. Returns True on success."""
+	codec = codec or _Codec()
+	archive = _archive_name(bucket_name, stamp, delta=bool(chain and chain.delta), ext=codec.ext)
+	parts = [os.path.join(base, archive)]
+	if chain:
+		parts.append(os.path.join(base, _manifest_name(archive)))
+	expected = archived = 0
+	ok = False
+	try:
+		with open(parts[0] + ".part", "wb") as out, \
+		     open(parts[-1] + ".part", "wb") if chain else nullcontext() as mf:
+			manifest = chain and _ManifestWriter(mf, _manifest_header(bucket_name, archive, chain))
+			expected, archived = _write_archive(conn, bucket_name, out, chain, manifest, workers, codec)
+			if manifest:
+				manifest.close()
+			for f in (out, mf) if chain else (out,):
+				f.flush()
+				os.fsync(f.fileno())
+		ok = expected == archived
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), f"S3 Backup: archiving {bucket_name} failed")
+	if ok:
+		try:
+			for final in parts:  # the archive first: a manifest never outruns its archive
+				os.replace(final + ".part", final)
+			return True
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), f"S3 Backup: finalising {bucket_name} archive failed")
+	else:
+		frappe.log_error(
+			f"S3 Backup incomplete for {bucket_name}: {archived}/{expected} objects archived. "
+			f"Partial archive discarded, previous archives kept; skipping prune this run.", "S3 Backup")
+	for final in parts:
+		if os.path.exists(final + ".part"):
+			os.remove(final + ".part")
+	return False
+
+
+def _run_local_backup(conn, settings, keep, full_every=None, codec=None, store=False):
 	# Keep this server's disk minimal: if backup_directory is a mount and site_config sets
 	# {"s3_backup_require_mount": 1}, refuse to run when it isn't mounted (no local fallback).
 	configured = (settings.get("backup_directory") or "").strip()
@@ -335,35 +937,18 @@ def _run_local_backup(conn, settings, keep):
 		return
 	base = _backup_dir(settings)
 	stamp = _stamp()
+	workers = _prefetch_workers(settings)
+	_reap_local_parts(base)
+	if store:
+		from frappe_s3_integration.frappe_s3_integration import backup_store
+
+		backup_store.run_store_backup(conn, backup_store.LocalTarget(base), stamp, keep, workers)
+		return
 	for bucket_name in _buckets(conn):
-		staging = os.path.join(base, f".staging-{bucket_name}")
-		shutil.rmtree(staging, ignore_errors=True)
-		os.makedirs(staging, exist_ok=True)
-		expected = downloaded = 0
-		try:
-			for obj in conn.list_objects(bucket_name):
-				rel = _safe_rel_key(obj["Key"])
-				if not rel:
-					continue
-				expected += 1
-				dest = os.path.join(staging, rel)
-				try:
-					os.makedirs(os.path.dirname(dest), exist_ok=True)
-					conn.download_object(bucket_name, obj["Key"], dest)
-					downloaded += 1
-				except Exception:
-					frappe.log_error(frappe.get_traceback(), f"S3 Backup download failed: {bucket_name}/{obj['Key']}")
-			if downloaded != expected:
-				# Degraded run: do NOT write a partial archive and do NOT prune good history.
-				frappe.log_error(
-					f"S3 Backup incomplete for {bucket_name}: {downloaded}/{expected} objects downloaded. "
-					f"Keeping previous archives; skipping archive + prune this run.",
-					"S3 Backup",
-				)
-				continue
-			archive = os.path.join(base, f"{bucket_name}-{stamp}.tar.gz")
-			with tarfile.open(archive, "w:gz") as tar:
-				tar.add(staging, arcname=bucket_name)
-		finally:
-			shutil.rmtree(staging, ignore_errors=True)  # staging never lingers permanently
-		_prune_old_archives(base, f"{bucket_name}-", keep)
+		chain = None
+		if full_every:
+			chain = _next_chain(os.listdir(base), bucket_name, full_every,
+			                    lambda n: open(os.path.join(base, n), "rb"))
+		# Degraded run: no partial archive is written and good history is not pruned.
+		if _write_local(conn, bucket_name, base, stamp, chain=chain, workers=workers, codec=codec):
+			_prune_old_archives(base, bucket_name, keep)
@@ -0,0 +1,324 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and contributors
+# For license information, please see license.txt
+"""Backup Mode "Content-Addressed Store": deduplicated bucket snapshots.
+
+Full tarballs repeat the same bytes in every retained snapshot: most objects never
+change, and the app's content_hash dedup means many Files share one object anyway. In
+this mode the backup directory (local or over SFTP, same targets as the archives) holds
+
+  objects/<h[:2]>/<h>                     one blob per distinct content, h = sha256
+  <bucket>-<stamp>.snapshot.jsonl.gz      a manifest per run: header, then one
+                                          [key, size, etag, last_modified, h] per object
+
+so a snapshot costs only its new bytes. Objects whose size and ETag match the bucket's
+previous snapshot reuse its hash and aren't even downloaded; the others are fetched
+(prefetched as in backup._write_archive), hashed, and written only when no blob has that
+hash yet. Blobs and snapshots are written to .part and renamed, and the snapshot last,
+so a snapshot only ever references blobs that exist.
+
+Retention keeps the newest `keep` snapshots per bucket, then garbage-collects: blobs no
+remaining snapshot references are removed. GC is skipped whenever a snapshot can't be
+read, since it could no longer prove a blob unused. Restore: docs/RESTORE.md.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+from contextlib import closing
+
+import frappe
+from botocore.exceptions import ClientError
+
+from frappe_s3_integration.frappe_s3_integration.backup import (
+	_COPY_CHUNK,
+	_buckets,
+	_Chain,
+	_CountingWriter,
+	_ensure_remote_dir,
+	_listing,
+	_ManifestWriter,
+	_prefetch,
+	_prefetch_spool_max,
+	_read_manifest,
+	_safe_rel_key,
+	_stamped,
+	_vanished,
+)
+
+SNAPSHOT_EXT = ".snapshot.jsonl.gz"
+OBJECTS_DIR = "objects"
+
+
+def _blob_path(digest):
+	return f"{OBJECTS_DIR}/{digest[:2]}/{digest}"
+
+
+class LocalTarget:
+	"""The store in a local directory. Paths are relative, "/"-separated."""
+
+	def __init__(self, base):
+		self.base = base
+
+	def _path(self, rel):
+		return os.path.join(self.base, *rel.split("/")) if rel else self.base
+
+	def listdir(self, rel=""):
+		try:
+			return os.listdir(self._path(rel))
+		except FileNotFoundError:
+			return []
+
+	def exists(self, rel):
+		return os.path.exists(self._path(rel))
+
+	def open(self, rel):
+		return open(self._path(rel), "rb")
+
+	def open_part(self, rel):
+		path = self._path(rel) + ".part"
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		return open(path, "wb")
+
+	def finish(self, rel, f, size):
+		"""fsync and close the .part written through `f`, then rename it into place if it
+		holds exactly `size` bytes."""
+		f.flush()
+		os.fsync(f.fileno())
+		f.close()
+		actual = os.path.getsize(self._path(rel) + ".part")
+		if actual != size:
+			raise IOError(f"{rel}: {actual} of {size} bytes written")
+		os.replace(self._path(rel) + ".part", self._path(rel))
+
+	def discard(self, rel):
+		try:
+			os.remove(self._path(rel) + ".part")
+		except FileNotFoundError:
+			pass
+
+	def remove(self, rel):
+		os.remove(self._path(rel))
+
+
+class SFTPTarget:
+	"""The store in a directory on the backup box, over an open SFTP session."""
+
+	def __init__(self, sftp, directory):
+		self.sftp = sftp
+		self.directory = directory
+		self.dirs = set()  # blob directories known to exist
+
+	def _path(self, rel):
+		return posixpath.join(self.directory, rel) if rel else self.directory
+
+	def listdir(self, rel=""):
+		try:
+			return self.sftp.listdir(self._path(rel))
+		except IOError:
+			return []
+
+	def exists(self, rel):
+		try:
+			self.sftp.stat(self._path(rel))
+			return True
+		except IOError:
+			return False
+
+	def open(self, rel):
+		return self.sftp.open(self._path(rel), "rb")
+
+	def open_part(self, rel):
+		parent = posixpath.dirname(self._path(rel))
+		if parent not in self.dirs:
+			_ensure_remote_dir(self.sftp, parent)
+			self.dirs.add(parent)
+		f = self.sftp.open(self._path(rel) + ".part", "wb")
+		f.set_pipelined(True)
+		return f
+
+	def finish(self, rel, f, size):
+		"""Close the .part (flushing pipelined writes) and rename it into place only if the
+		remote file is exactly `size` bytes — same truncation check as the archives."""
+		f.close()
+		actual = self.sftp.stat(self._path(rel) + ".part").st_size
+		if actual != size:
+			raise IOError(f"{rel}: {actual} of {size} bytes on the remote")
+		try:
+			self.sftp.remove(self._path(rel))  # replace any leftover with the same name
+		except IOError:
+			pass
+		self.sftp.rename(self._path(rel) + ".part", self._path(rel))
+
+	def discard(self, rel):
+		try:
+			self.sftp.remove(self._path(rel) + ".part")
+		except Exception:
+			pass  # reaped by the next garbage collection
+
+	def remove(self, rel):
+		self.sftp.remove(self._path(rel))
+
+
+def run_store_backup(conn, target, stamp, keep, workers=1):
+	"""Snapshot every configured bucket into the store, then prune and collect garbage.
+	A bucket that fails keeps its previous snapshots; retention never runs for it."""
+	done = []
+	for bucket_name in _buckets(conn):
+		try:
+			if _snapshot_bucket(conn, target, bucket_name, stamp, workers):
+				done.append(bucket_name)
+		except Exception:
+			# one bucket erroring must not abort the other bucket or crash the job
+			frappe.log_error(frappe.get_traceback(), f"S3 Backup: bucket {bucket_name} failed")
+	if done:
+		_prune_snapshots(target, done, keep)
+		_collect_garbage(target)
+
+
+def _snapshots(names, bucket_name=None):
+	"""Snapshots in `names`, oldest first: one bucket's (matched as <bucket>-<stamp>, so
+	"erp" never claims "erp-pub"'s), or every bucket's when `bucket_name` is None."""
+	if bucket_name is None:
+		return sorted(n for n in names if n.endswith(SNAPSHOT_EXT))
+	pattern = _stamped(bucket_name, re.escape(SNAPSHOT_EXT))
+	return sorted(n for n in names if pattern.match(n))
+
+
+def _previous(target, bucket_name):
+	"""The bucket's newest snapshot as {key: [size, etag, last_modified, hash]}; {} when
+	there is none or it can't be read (every object is then fetched and hashed again)."""
+	snaps = _snapshots(target.listdir(), bucket_name)
+	if not snaps:
+		return {}
+	try:
+		with target.open(snaps[-1]) as f:
+			return _read_manifest(f)
+	except Exception:
+		frappe.log_error(frappe.get_traceback(),
+		                 f"S3 Backup: snapshot {snaps[-1]} unreadable — hashing {bucket_name} again")
+		return {}
+
+
+def _hash(spool):
+	"""sha256 of a rewound spool, left rewound."""
+	digest = hashlib.sha256()
+	for chunk in iter(lambda: spool.read(_COPY_CHUNK), b""):
+		digest.update(chunk)
+	spool.seek(0)
+	return digest.hexdigest()
+
+
+def _put_blob(target, digest, spool, size):
+	"""Write one blob unless the store already has it. Returns True if it was written."""
+	rel = _blob_path(digest)
+	if target.exists(rel):
+		return False
+	f = target.open_part(rel)
+	try:
+		shutil.copyfileobj(spool, f, _COPY_CHUNK)
+		target.finish(rel, f, size)
+	except BaseException:
+		try:
+			f.close()
+		except Exception:
+			pass
+		target.discard(rel)
+		raise
+	return True
+
+
+def _snapshot_bucket(conn, target, bucket_name, stamp, workers):
+	"""Write `<bucket>-<stamp>.snapshot.jsonl.gz` and any blobs it needs. Returns True when
+	every listed object is in the snapshot; on any failure the snapshot is discarded (blobs
+	already written are left for the next run or GC) and previous snapshots are kept."""
+	name = f"{bucket_name}-{stamp}{SNAPSHOT_EXT}"
+	previous = _previous(target, bucket_name)
+	chain = _Chain(previous)
+	known = {row[3] for row in previous.values()}  # blobs present for the retained snapshot
+	f = target.open_part(name)
+	counter = _CountingWriter(f)
+	new = new_bytes = 0
+	try:
+		manifest = _ManifestWriter(counter, {"bucket": bucket_name, "snapshot": name})
+
+		def wanted():  # unchanged objects reuse the previous snapshot's hash, unfetched
+			for obj in _listing(conn, bucket_name):
+				if not _safe_rel_key(obj["Key"]):
+					continue
+				if not chain.changed(obj):
+					manifest.add(obj, previous[obj["Key"]][3])
+					continue
+				yield obj
+
+		fetches = _prefetch(conn, bucket_name, wanted(), workers, _prefetch_spool_max(workers))
+		with closing(fetches):
+			for obj, fetched in fetches:
+				try:
+					size, spool = fetched.result()
+				except ClientError as e:
+					if _vanished(e):
+						continue
+					raise
+				with spool:
+					digest = _hash(spool)
+					if digest not in known:
+						if _put_blob(target, digest, spool, size):
+							new += 1
+							new_bytes += size
+						known.add(digest)
+				manifest.add(obj, digest)
+		manifest.close()
+		target.finish(name, f, counter.count)
+	except Exception:
+		try:
+			f.close()
+		except Exception:
+			pass
+		target.discard(name)
+		frappe.log_error(
+			frappe.get_traceback(),
+			f"S3 Backup: snapshot of {bucket_name} failed — discarded, previous snapshots kept")
+		return False
+	frappe.logger("s3").info(
+		f"S3 Backup: {name} written, {new} new blobs ({new_bytes} bytes)")
+	return True
+
+
+def _prune_snapshots(target, buckets, keep):
+	"""Keep the newest `keep` snapshots of each bucket that was just snapshotted."""
+	names = target.listdir()
+	for bucket_name in buckets:
+		snaps = _snapshots(names, bucket_name)
+		for n in (snaps[:-keep] if keep > 0 else snaps):
+			try:
+				target.remove(n)
+			except Exception:
+				frappe.log_error(f"Failed to prune backup snapshot: {n}", "S3 Backup")
+
+
+def _collect_garbage(target):
+	"""Remove blobs no snapshot references, and .part files of unfinished writes (the job
+	never runs concurrently, so any .part is stale). Every snapshot in the directory counts,
+	including buckets no longer configured; one unreadable snapshot skips the whole GC."""
+	names = target.listdir()
+	live = set()
+	for n in _snapshots(names):
+		try:
+			with target.open(n) as f:
+				live.update(row[3] for row in _read_manifest(f).values())
+		except Exception:
+			frappe.log_error(frappe.get_traceback(),
+			                 f"S3 Backup: snapshot {n} unreadable — garbage collection skipped")
+			return
+	stale = [n for n in names if n.endswith(SNAPSHOT_EXT + ".part")]
+	for sub in target.listdir(OBJECTS_DIR):
+		for blob in target.listdir(f"{OBJECTS_DIR}/{sub}"):
+			if blob.endswith(".part") or blob not in live:
+				stale.append(f"{OBJECTS_DIR}/{sub}/{blob}")
+	for rel in stale:
+		try:
+			target.remove(rel)
+		except Exception:
+			frappe.log_error(f"Failed to remove unreferenced backup blob: {rel}", "S3 Backup")
@@ -1,7 +1,7 @@
 # Copyright (c) 2025, sakthi123msd@gmail.com and contributors
 # For license information, please see license.txt
 
-from frappe_s3_integration.s3_core import invalidate_s3_connection
+from frappe_s3_integration.s3_core import clear_all_file_meta, invalidate_s3_connection
 import frappe
 from frappe.model.document import Document
 
@@ -36,4 +36,5 @@ class AWSS3Settings(Document):
 			frappe.throw("The following problems were found:<br>" + "<br>".join(exceptions))
 
 	def on_update(self):
-		invalidate_s3_connection()
\ No newline at end of file
+		invalidate_s3_connection()
+		clear_all_file_meta()
\ No newline at end of file
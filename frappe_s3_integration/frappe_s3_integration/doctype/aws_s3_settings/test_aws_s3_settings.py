@@ -75,6 +75,53 @@ class TestS3Engine(FrappeTestCase):
 		res = c.upload_file_to_bucket(file, bucket_name="b", allow_public=False, key="private/files/x.pdf")
 		self.assertEqual(res["key"], "private/files/x.pdf")
 
+	def test_client_config_from_settings(self):
+		c = s3_core.S3Connection.__new__(s3_core.S3Connection)
+		c.s3_settings = frappe._dict(max_pool_connections=20, retry_mode="Adaptive", max_attempts=7,
+		                             connect_timeout=3, read_timeout=30, tcp_keepalive=1, sweep_workers=8)
+		with patch.object(s3_core.frappe, "get_conf", return_value={}):
+			cfg = c.client_config()
+		self.assertEqual(cfg.max_pool_connections, 8 * c.multipart_concurrency)  # raised for the sweep
+		self.assertEqual(cfg.retries, {"mode": "adaptive", "max_attempts": 7})
+		self.assertEqual((cfg.connect_timeout, cfg.read_timeout), (3, 30))
+		self.assertTrue(cfg.tcp_keepalive)
+
+	def test_one_boto_session_per_process(self):
+		self.assertIs(s3_core._boto_session(), s3_core._boto_session())
+
+	def test_clients_are_created_one_at_a_time(self):
+		# Session.client() mutates the shared session's caches: never from two threads at once.
+		import threading
+		import time
+
+		active, overlaps = [], []
+
+		def client(**kw):
+			active.append(1)
+			overlaps.append(len(active) > 1)
+			time.sleep(0.01)
+			active.pop()
+			return kw["service_name"]
+
+		session = MagicMock()
+		session.client.side_effect = client
+		with patch.object(s3_core, "_session", session):
+			threads = [threading.Thread(target=s3_core._boto_client, kwargs={"service_name": "s3"})
+			           for _ in range(8)]
+			for t in threads:
+				t.start()
+			for t in threads:
+				t.join()
+		self.assertEqual(session.client.call_count, 8)
+		self.assertFalse(any(overlaps))
+
+	def test_hooked_modules_import_without_boto3(self):
+		# Every process imports these through hooks.py; boto3 loads on the first client only.
+		from frappe_s3_integration.frappe_s3_integration import startup_benchmark
+
+		for module in startup_benchmark.TARGETS:
+			self.assertFalse(startup_benchmark.measure(module)["boto3_loaded"], module)
+
 	def test_copy_object_moves_between_frappe_folders(self):
 		# Visibility flip mirrors Frappe: files/<name> <-> private/files/<name>, name kept.
 		c = self._conn()
@@ -324,10 +371,31 @@ class TestVisibilityToggle(FrappeTestCase):
 class TestServeResilience(FrappeTestCase):
 	"""serve_file / _stream_from_s3 must not 500 on the kill switch or a missing object."""
 
+	def setUp(self):
+		s3_core.clear_all_file_meta()  # metadata cached by another test must not leak in
+
+	def test_metadata_is_cached_until_cleared(self):
+		fdoc = frappe._dict(name="FM1", file_name="x.png", is_private=0, custom_s3_key="files/x.png",
+		                    custom_s3_bucket_name="pub", custom_is_s3_uploaded=1)
+		conn = MagicMock()
+		conn.s3_settings.region = "ap-south-1"
+		conn.cdn_base_url_for.return_value = None
+		with patch.object(s3_core.frappe.db, "get_value", return_value=fdoc) as gv, \
+		     patch.object(s3_core, "getS3Connection", return_value=conn) as gc:
+			first = s3_core.serve_file(file_id="FM1")
+			second = s3_core.serve_file(file_id="FM1")
+			self.assertEqual(gv.call_count, 1)                  # second hit: no DB query...
+			self.assertEqual(gc.call_count, 1)                  # ...and no connection lookup
+			self.assertEqual(first.headers["Location"], second.headers["Location"])
+			s3_core.invalidate_file_meta(frappe._dict(name="FM1"))
+			s3_core.serve_file(file_id="FM1")
+			self.assertEqual(gv.call_count, 2)                  # re-read after the hook cleared it
+
 	def test_public_serve_works_when_disabled(self):
 		conn = MagicMock()
 		conn.s3_settings.disable_s3_operations = 1
 		conn.s3_settings.region = "ap-south-1"
+		conn.cdn_base_url_for.return_value = None
 		conn.connection = None  # disabled -> no client; must NOT be dereferenced
 		fdoc = frappe._dict(name="F1", file_name="x.png", is_private=0,
 		                    custom_s3_key="uploads/x.png", custom_s3_bucket_name="pub",
@@ -338,8 +406,102 @@ class TestServeResilience(FrappeTestCase):
 		self.assertEqual(resp.status_code, 302)
 		loc = resp.headers["Location"]
 		self.assertIn("s3.ap-south-1.amazonaws.com/pub/uploads/x.png", loc)  # path-style
+		self.assertEqual(resp.headers["Cache-Control"], f"public, max-age={s3_core.PUBLIC_REDIRECT_MAX_AGE}")
 		self.assertNotIn("pub.s3", loc)  # bucket NOT in the hostname (dotted-bucket safe)
 
+	def _private(self, mode, file_size=5000, url="https://signed/x"):
+		conn = MagicMock()
+		conn.s3_settings.disable_s3_operations = 0
+		conn.s3_settings.get.side_effect = {}.get                         # defaults
+		conn.private_serve_mode.return_value = mode
+		conn.generate_temporary_url.return_value = url
+		fdoc = frappe._dict(name="F1", file_name="Ölplan 1.pdf", file_size=file_size, is_private=1,
+		                    custom_s3_key="private/files/x.pdf", custom_s3_bucket_name="prv",
+		                    custom_is_s3_uploaded=1)
+		with patch.object(s3_core.frappe.db, "get_value", return_value=fdoc), \
+		     patch.object(s3_core.frappe, "get_doc") as get_doc, \
+		     patch.object(s3_core.frappe, "session", frappe._dict(user="u@x.com")), \
+		     patch("frappe.core.doctype.file.file.has_permission", return_value=True), \
+		     patch.object(s3_core, "getS3Connection", return_value=conn), \
+		     patch.object(s3_core, "_stream_from_s3", return_value="streamed") as stream:
+			resp = s3_core.serve_file(file_id="F1")
+		get_doc.assert_not_called()  # permission decided from the light metadata row
+		return resp, conn, stream
+
+	def test_private_redirect_mode_sends_presigned_url(self):
+		resp, conn, stream = self._private("Presigned Redirect")
+		self.assertEqual(resp.status_code, 302)
+		self.assertEqual(resp.headers["Location"], "https://signed/x")
+		self.assertIn("no-store", resp.headers["Cache-Control"])
+		kw = conn.generate_temporary_url.call_args.kwargs
+		self.assertEqual(kw["filename"], "Ölplan 1.pdf")
+		self.assertEqual(kw["content_type"], "application/pdf")
+		conn.private_serve_mode.assert_called_once_with("prv", 5000)
+		stream.assert_not_called()
+
+	def test_private_accel_mode_hands_transfer_to_nginx(self):
+		resp, conn, stream = self._private("Nginx Accel Redirect")
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.get_data(), b"")
+		self.assertEqual(resp.headers["X-Accel-Redirect"], "/_s3_proxy")
+		self.assertEqual(resp.headers["X-S3-Url"], "https://signed/x")
+		stream.assert_not_called()
+
+	def test_private_accel_mode_passes_encoded_key_verbatim(self):
+		# nginx decodes an X-Accel-Redirect path, which would break the signature of a key
+		# with a space; the url must reach nginx exactly as signed, outside that path.
+		url = ("https://s3.ap-south-1.amazonaws.com/prv/private/files/Q3%20report%2Bv2.pdf"
+		       "?X-Amz-Signature=abc")
+		resp, conn, stream = self._private("Nginx Accel Redirect", url=url)
+		self.assertEqual(resp.headers["X-S3-Url"], url)
+		self.assertNotIn("%20", resp.headers["X-Accel-Redirect"])
+
+	def test_private_stream_mode_is_unchanged(self):
+		resp, conn, stream = self._private("Stream")
+		self.assertEqual(resp, "streamed")
+		conn.generate_temporary_url.assert_not_called()
+
+	def test_serve_mode_bucket_override_and_size_threshold(self):
+		c = s3_core.S3Connection.__new__(s3_core.S3Connection)
+		c.s3_settings = frappe._dict(private_serve_mode="Presigned Redirect", redirect_min_size=100,
+		                             s3_bucket_details=[frappe._dict(bucket_name="vid", private_serve_mode="Stream")])
+		self.assertEqual(c.private_serve_mode("prv", 500 * 1024), "Presigned Redirect")
+		self.assertEqual(c.private_serve_mode("prv", 10 * 1024), "Stream")       # small: stream
+		self.assertEqual(c.private_serve_mode("vid", 500 * 1024), "Stream")      # bucket override
+
+	def test_content_disposition_keeps_non_ascii_names(self):
+		h = s3_core._content_disposition('Ölplan "v2".pdf')
+		self.assertTrue(h.startswith('inline; filename="Olplan v2.pdf"'))
+		self.assertIn("filename*=UTF-8''%C3%96lplan%20%22v2%22.pdf", h)
+		h.encode("latin-1")  # header-safe
+
+	def test_public_redirect_goes_through_bucket_cdn(self):
+		conn = MagicMock()
+		conn.s3_settings.region = "ap-south-1"
+		conn.cdn_base_url_for.return_value = "https://cdn.example.com/"
+		fdoc = frappe._dict(name="FC1", file_name="x y.png", is_private=0, custom_s3_key="files/x y.png",
+		                    custom_s3_bucket_name="pub", custom_is_s3_uploaded=1)
+		with patch.object(s3_core.frappe.db, "get_value", return_value=fdoc), \
+		     patch.object(s3_core, "getS3Connection", return_value=conn):
+			resp = s3_core.serve_file(file_id="FC1")
+		self.assertEqual(resp.headers["Location"], "https://cdn.example.com/files/x%20y.png")
+		conn.cdn_base_url_for.assert_called_once_with("pub")
+
+	def test_private_url_is_cdn_signed_when_key_pair_configured(self):
+		c = s3_core.S3Connection.__new__(s3_core.S3Connection)
+		c.connection = MagicMock()
+		c.s3_settings = frappe._dict(disable_s3_operations=0, aws_key="AKIA1", cdn_key_pair_id="K1",
+		                             s3_bucket_details=[frappe._dict(bucket_name="prv", cdn_base_url="https://cdn.example.com")])
+		signer = MagicMock()
+		signer.generate_presigned_url.return_value = "https://cdn.example.com/private/files/a.pdf?Signature=s"
+		c._cdn_signer = signer
+		with patch.object(s3_core.frappe, "cache") as cache:
+			cache.return_value.get_value.return_value = None
+			url = c.generate_temporary_url("prv", "private/files/a.pdf", expires_in=600)
+		self.assertEqual(url, "https://cdn.example.com/private/files/a.pdf?Signature=s")
+		self.assertEqual(signer.generate_presigned_url.call_args.args[0], "https://cdn.example.com/private/files/a.pdf")
+		c.connection.generate_presigned_url.assert_not_called()
+
 	def test_public_url_is_path_style_for_dotted_bucket(self):
 		# Dotted bucket names (hr.essdee.fit.public) MUST use path-style — a virtual-hosted
 		# url (<bucket>.s3...) breaks HTTPS and redirects/crashes in the browser.
@@ -366,6 +528,118 @@ class TestServeResilience(FrappeTestCase):
 				s3_core._stream_from_s3(fdoc)
 
 
+class TestStreamRangeAndValidators(FrappeTestCase):
+	"""_stream_from_s3 forwards Range / validators to S3 and answers 206 / 304."""
+
+	FDOC = frappe._dict(custom_s3_key="k", custom_s3_bucket_name="prv", file_name="v.mp4")
+
+	def _stream(self, headers, obj=None, error=None, settings=None):
+		from werkzeug.test import EnvironBuilder
+		conn = MagicMock()
+		conn.s3_settings.disable_s3_operations = 0
+		conn.s3_settings.get.side_effect = (settings or {}).get
+		if error:
+			conn.get_file_from_bucket.side_effect = error
+		else:
+			conn.get_file_from_bucket.return_value = obj
+		request = EnvironBuilder(headers=headers).get_request()
+		with patch.object(s3_core, "getS3Connection", return_value=conn), \
+		     patch.object(s3_core.frappe, "local", frappe._dict(request=request)):
+			return s3_core._stream_from_s3(self.FDOC), conn
+
+	def test_range_is_forwarded_and_answered_206(self):
+		import datetime
+		obj = {"Body": io.BytesIO(b"0123"), "ContentType": "video/mp4", "ContentLength": 4,
+		       "ContentRange": "bytes 10-13/100", "ETag": '"abc"',
+		       "LastModified": datetime.datetime(2026, 1, 2, tzinfo=datetime.timezone.utc)}
+		resp, conn = self._stream({"Range": "bytes=10-13"}, obj)
+		self.assertEqual(conn.get_file_from_bucket.call_args.kwargs, {"Range": "bytes=10-13"})
+		self.assertEqual(resp.status_code, 206)
+		self.assertEqual(resp.headers["Content-Range"], "bytes 10-13/100")
+		self.assertEqual(resp.headers["Content-Length"], "4")
+		self.assertEqual(resp.headers["ETag"], '"abc"')
+		self.assertEqual(resp.headers["Last-Modified"], "Fri, 02 Jan 2026 00:00:00 GMT")
+		self.assertEqual(resp.headers["Accept-Ranges"], "bytes")
+
+	def test_matching_etag_answers_304(self):
+		err = ClientError({"Error": {"Code": "304"}, "ResponseMetadata": {
+			"HTTPHeaders": {"etag": '"abc"'}}}, "GetObject")
+		resp, conn = self._stream({"If-None-Match": '"abc"', "If-Modified-Since": "Fri, 02 Jan 2026 00:00:00 GMT"}, error=err)
+		self.assertEqual(conn.get_file_from_bucket.call_args.kwargs, {"IfNoneMatch": '"abc"'})  # INM wins
+		self.assertEqual(resp.status_code, 304)
+		self.assertEqual(resp.headers["ETag"], '"abc"')
+
+	def test_stream_reads_grow_to_the_max_chunk(self):
+		body = MagicMock()
+		body.read.side_effect = [b"x"] * 6 + [b""]
+		resp, conn = self._stream({}, {"Body": body, "ContentType": "video/mp4"},
+		                          settings={"stream_chunk_size": 64, "stream_max_chunk_size": 256})
+		b"".join(resp.response)
+		sizes = [c.args[0] for c in body.read.call_args_list]
+		self.assertEqual(sizes[:4], [64 * 1024, 128 * 1024, 256 * 1024, 256 * 1024])
+		body.close.assert_called_once()
+
+	def test_stale_if_range_gets_the_full_object(self):
+		obj = {"Body": io.BytesIO(b"new"), "ContentType": "video/mp4", "ContentLength": 3}
+		conn_calls = [ClientError({"Error": {"Code": "PreconditionFailed"}}, "GetObject"), obj]
+		resp, conn = self._stream({"Range": "bytes=10-", "If-Range": '"old"'}, error=conn_calls)
+		first, second = conn.get_file_from_bucket.call_args_list
+		self.assertEqual(first.kwargs, {"Range": "bytes=10-", "IfMatch": '"old"'})
+		self.assertEqual(second.kwargs, {})
+		self.assertEqual(resp.status_code, 200)
+
+
+class TestPresignedUrlCache(FrappeTestCase):
+	"""Signed urls are shared through redis and handed out well before they expire."""
+
+	def _conn(self):
+		c = s3_core.S3Connection.__new__(s3_core.S3Connection)
+		c.connection = MagicMock()
+		c.connection.generate_presigned_url.side_effect = lambda **kw: f"https://signed/{uuid.uuid4().hex}"
+		c.s3_settings = frappe._dict(disable_s3_operations=0, aws_key="AKIA1")
+		return c
+
+	def setUp(self):
+		self.cache = {}      # key -> (value, ttl)
+		cache = MagicMock()
+		cache.get_value.side_effect = lambda k: self.cache.get(k, (None,))[0]
+		cache.set_value.side_effect = lambda k, v, expires_in_sec=None: self.cache.__setitem__(k, (v, expires_in_sec))
+		patcher = patch.object(s3_core.frappe, "cache", return_value=cache)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_repeat_requests_reuse_one_signature(self):
+		c = self._conn()
+		first = c.generate_temporary_url("prv", "private/files/a.pdf")
+		self.assertEqual(c.generate_temporary_url("prv", "private/files/a.pdf"), first)
+		c.connection.generate_presigned_url.assert_called_once()
+		(_url, ttl), = self.cache.values()
+		self.assertEqual(ttl, 3600 - s3_core.PRESIGN_CACHE_MARGIN)     # never near expiry
+
+	def test_cache_is_keyed_on_disposition_type_and_credentials(self):
+		c = self._conn()
+		a = c.generate_temporary_url("prv", "k")
+		self.assertNotEqual(c.generate_temporary_url("prv", "k", inline=False), a)
+		self.assertNotEqual(c.generate_temporary_url("prv", "k", content_type="image/png"), a)
+		c.s3_settings.aws_key = "AKIA2"                                  # rotated credentials
+		self.assertNotEqual(c.generate_temporary_url("prv", "k"), a)
+
+	def test_batch_checks_permission_once_per_scope(self):
+		c = self._conn()
+		rows = [frappe._dict(name=f"F{i}", owner="u", is_private=1, attached_to_doctype="Item",
+		                     attached_to_name="I1", custom_s3_key=f"private/files/{i}.png",
+		                     custom_s3_bucket_name="prv", custom_is_s3_uploaded=1) for i in range(3)]
+		rows.append(frappe._dict(name="LOCAL", custom_s3_key=None, custom_is_s3_uploaded=0))
+		with patch.object(s3_core.frappe, "get_all", return_value=rows) as ga, \
+		     patch("frappe.core.doctype.file.file.has_permission", return_value=True) as perm:
+			urls = c.get_pre_signed_urls(["F0", "F1", "F2", "LOCAL", "MISSING"])
+		ga.assert_called_once()
+		perm.assert_called_once()
+		self.assertTrue(all(urls[f"F{i}"] for i in range(3)))
+		self.assertIsNone(urls["LOCAL"])
+		self.assertIsNone(urls["MISSING"])
+
+
 class TestS3FileOverride(FrappeTestCase):
 	"""File controller override: S3-backed files (serve_file proxy url) skip on-disk validation."""
 
@@ -1,14 +1,17 @@
 import hashlib
 import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import frappe
-from frappe.utils import get_site_path
+from frappe.utils import cint, get_site_path, now
 from rq.timeouts import JobTimeoutException
 from werkzeug.datastructures import FileStorage
 
 from frappe_s3_integration.s3_core import (
-	getS3Connection, get_proxy_url, _guess_content_type, _s3_key_from_file_url, child_attach_repoint,
+	clear_file_meta, getS3Connection, get_proxy_url, _guess_content_type, _s3_key_from_file_url, child_attach_repoint,
 )
+from frappe_s3_integration.s3_core.paging import iter_files
 
 
 def _hash_local_file(path):
@@ -65,15 +68,47 @@ def _migrated_sibling(file):
 
 def _point_doc_at_s3(file, key, bucket):
 	"""Repoint a File doc at an S3 object. Preserve (never clobber) Frappe's
-	content_hash — dedup and both delete guards depend on it."""
-	frappe.db.set_value("File", file.name, {
+	content_hash — dedup and both delete guards depend on it — and store the one
+	_prepare_migration backfilled, which is only written with the pointer."""
+	values = {
 		"file_url": get_proxy_url(file.name, file.file_name),
 		"custom_s3_key": key,
 		"custom_s3_bucket_name": bucket,
-	})
-
-
-def _repoint_attached(file):
+	}
+	if file.content_hash:
+		values["content_hash"] = file.content_hash
+	frappe.db.set_value("File", file.name, values)
+	clear_file_meta(file.name)
+
+
+POINTER_FIELDS = ("file_url", "custom_s3_key", "custom_s3_bucket_name", "content_hash")
+
+
+def _point_docs_at_s3(entries):
+	"""_point_doc_at_s3 for a whole group-commit batch of (plan, s3_resp): one multi-row
+	UPDATE instead of a set_value per File. content_hash is written too — a hash that
+	_prepare_migration backfilled is only ever stored with its pointer."""
+	rows = [(plan.file.name, {
+		"file_url": get_proxy_url(plan.file.name, plan.file.file_name),
+		"custom_s3_key": s3_resp["key"],
+		"custom_s3_bucket_name": s3_resp["bucket_name"],
+		"content_hash": plan.file.content_hash,
+	}) for plan, s3_resp in entries]
+	sets, params = [], []
+	for field in POINTER_FIELDS:
+		sets.append(f"`{field}` = CASE `name` {' '.join(['WHEN %s THEN %s'] * len(rows))} END")
+		for name, values in rows:
+			params += [name, values[field]]
+	params += [now(), frappe.session.user]
+	params += [name for name, _values in rows]
+	frappe.db.sql(
+		f"UPDATE `tabFile` SET {', '.join(sets)}, `modified` = %s, `modified_by` = %s "
+		f"WHERE `name` IN ({', '.join(['%s'] * len(rows))})", params)
+	for name, _values in rows:
+		clear_file_meta(name)
+
+
+def _repoint_attached(file, commit=True):
 	"""Invariant 2: point the attached doc's Attach field at this file's S3 proxy url, so
 	the parent record (Website Settings.app_logo, Employee.image, ...) no longer serves a
 	now-deleted /files/<x> path. Called from EVERY migration path — the dedup shortcuts and
@@ -88,9 +123,12 @@ def _repoint_attached(file):
 
 	Singles-aware: a Single doctype (e.g. Website Settings) stores values in tabSingles, so
 	repoint via set_single_value rather than the deprecated single-through-set_value route.
-	Best-effort + isolated commit — must never raise and roll back the durable S3 pointer (N2)."""
+	Best-effort + isolated commit — must never raise and roll back the durable S3 pointer (N2).
+	A group-commit batch passes commit=False and commits all its repoints at once. Returns
+	True when the field is settled (repointed, or nothing of this file's to repoint) and
+	False only when the repoint failed (the field may still hold the local url)."""
 	if not (file.attached_to_doctype and file.attached_to_field):
-		return
+		return True  # nothing attached: nothing to repoint
 	try:
 		meta = frappe.get_meta(file.attached_to_doctype)
 		proxy = get_proxy_url(file.name, file.file_name)
@@ -99,9 +137,9 @@ def _repoint_attached(file):
 			# .advance_image lives on child 'Essdee Bulk Payment Entry'). file.file_url is still
 			# this file's local url here, so it's the identity to match child rows against.
 			if child_attach_repoint(file.attached_to_doctype, file.attached_to_name,
-			                        file.attached_to_field, file.file_url, proxy):
+			                        file.attached_to_field, file.file_url, proxy) and commit:
 				frappe.db.commit()
-			return
+			return True
 		single = meta.issingle
 		if single:
 			current = frappe.db.get_single_value(file.attached_to_doctype, file.attached_to_field)
@@ -109,18 +147,21 @@ def _repoint_attached(file):
 			current = frappe.db.get_value(file.attached_to_doctype, file.attached_to_name,
 			                              file.attached_to_field)
 		else:
-			return
+			return True  # parent row gone
 		if current != file.file_url:
-			return  # field moved on (external / cleared / newer file) — never clobber it
+			return True  # field moved on (external / cleared / newer file) — never clobber it
 		if single:
 			frappe.db.set_single_value(file.attached_to_doctype, file.attached_to_field,
 			                           proxy, update_modified=False)
 		else:
 			frappe.db.set_value(file.attached_to_doctype, file.attached_to_name,
 			                    file.attached_to_field, proxy, update_modified=False)
-		frappe.db.commit()
+		if commit:
+			frappe.db.commit()
 	except Exception:
 		frappe.log_error(frappe.get_traceback(), f"S3 attached-doc repoint failed for {file.name}")
+		return False
+	return True
 
 
 SWEEP_TIMEOUT_FLOOR = 3 * 60 * 60             # never below the previous fixed budget
@@ -129,17 +170,36 @@ S3_THROUGHPUT_MBPS = 0.5                        # effective MB/s (~500 KB/s: con
 PER_FILE_OVERHEAD_S = 1.0                      # per-file fixed cost (get_doc + dedup + head + commit + rm)
 SWEEP_SAFETY_BUFFER = 2.0                      # slack for variance / retries / queue contention
 DEFAULT_UNKNOWN_FILE_SIZE = 10 * 1024 * 1024   # assumed bytes when size unknown and blob unstat-able
-
-
-def _pending_migration_stats():
-	"""(total_bytes, count) for local Files flagged for S3 but not yet migrated.
+SWEEP_WORKERS_CAP = 32                         # upper bound on concurrent uploads per sweep job
+SWEEP_SHARDS_CAP = 64                          # upper bound on independently enqueued sweep jobs
+SWEEP_COMMIT_BATCH_CAP = 1000                  # upper bound on File pointers per group commit
+KEY_INDEX_SEED_MIN = 500                       # backlog size from which a sweep pre-lists existing keys
+SWEEP_JOB_ID = "frappe_s3_integration::migrate_sweep"
+SWEEP_PROGRESS_KEY = "s3_migrate_sweep_shards"  # redis hash: shard index -> progress dict
+PENDING_FILTERS = [
+	["custom_is_s3_uploaded", "=", 1],
+	["custom_s3_key", "in", ["", None]],
+]
+
+
+def _shard_of(file, shards):
+	"""Stable shard for a File row (content_hash, file_url). Keyed on content_hash, NOT
+	name: every File holding the same bytes — whatever its url — lands in one shard, so
+	sibling dedup (_migrated_sibling) never races another shard into uploading the blob
+	twice. A hashless File falls back to its url, which Files sharing one local blob also
+	share (Frappe dedup); the hash the sweep backfills is only stored with the pointer, so
+	such a File keeps its url shard until it has left the pending set. A url-derived key claimed from two shards is still safe: uploads
+	never overwrite (_unique_key). crc32 (not hash()) is identical on every node."""
+	if shards <= 1:
+		return 0
+	return zlib.crc32((file.content_hash or file.file_url or "").encode()) % shards
+
+
+def _pending_stats_by_shard(shards=1):
+	"""[(total_bytes, count)] per shard for local Files flagged for S3 but not yet migrated.
 	Trust file_size when >0; else stat the on-disk blob; else a realistic default."""
-	rows = frappe.get_all("File", filters=[
-		["custom_is_s3_uploaded", "=", 1],
-		["custom_s3_key", "in", ["", None]],
-	], fields=["file_url", "file_size"])
-	total = 0
-	for r in rows:
+	stats = [[0, 0] for _ in range(shards)]
+	for r in iter_files(PENDING_FILTERS, fields=["file_url", "file_size", "content_hash"]):
 		size = r.file_size or 0
 		if size <= 0:
 			path = _local_path(frappe._dict(file_url=r.file_url))
@@ -147,22 +207,69 @@ def _pending_migration_stats():
 				size = os.path.getsize(path) if path and os.path.exists(path) else DEFAULT_UNKNOWN_FILE_SIZE
 			except OSError:
 				size = DEFAULT_UNKNOWN_FILE_SIZE
-		total += size
-	return total, len(rows)
+		shard = stats[_shard_of(r, shards)]
+		shard[0] += size
+		shard[1] += 1
+	return [tuple(s) for s in stats]
+
+
+def _pending_migration_stats():
+	"""(total_bytes, count) for the whole pending backlog."""
+	return _pending_stats_by_shard(1)[0]
+
+
+def _sweep_workers(conf=None):
+	"""Upload pool width for the sweep: site_config `s3_sweep_workers`, else AWS S3 Settings
+	'Migration Sweep Workers', clamped to [1, SWEEP_WORKERS_CAP]. 1 = the serial sweep."""
+	if conf is None:
+		conf = frappe.get_conf()
+	width = cint(conf.get("s3_sweep_workers")) or cint(
+		frappe.db.get_single_value("AWS S3 Settings", "sweep_workers"))
+	return min(SWEEP_WORKERS_CAP, max(1, width))
+
+
+def _sweep_shards(conf=None):
+	"""Number of independent sweep jobs: site_config `s3_sweep_shards`, else AWS S3 Settings
+	'Migration Sweep Shards', clamped to [1, SWEEP_SHARDS_CAP]. 1 = the single sweep job."""
+	if conf is None:
+		conf = frappe.get_conf()
+	shards = cint(conf.get("s3_sweep_shards")) or cint(
+		frappe.db.get_single_value("AWS S3 Settings", "sweep_shards"))
+	return min(SWEEP_SHARDS_CAP, max(1, shards))
+
+
+def _sweep_commit_batch(conf=None):
+	"""File pointers written per commit by the sweep: site_config `s3_sweep_commit_batch`,
+	else AWS S3 Settings 'Migration Sweep Commit Batch', clamped to [1,
+	SWEEP_COMMIT_BATCH_CAP]. 1 = a commit per file (no _PointerBatch)."""
+	if conf is None:
+		conf = frappe.get_conf()
+	size = cint(conf.get("s3_sweep_commit_batch")) or cint(
+		frappe.db.get_single_value("AWS S3 Settings", "sweep_commit_batch"))
+	return min(SWEEP_COMMIT_BATCH_CAP, max(1, size))
+
 
+def _sweep_job_id(shard, shards):
+	if shards <= 1:
+		return SWEEP_JOB_ID
+	return f"{SWEEP_JOB_ID}::shard-{shard}-of-{shards}"
 
-def _sweep_timeout():
+
+def _sweep_timeout(stats=None):
 	"""Enqueue timeout sized to the actual backlog: MAX of byte vs per-file bottleneck,
-	times a safety buffer, clamped to [floor, cap]. All knobs overridable via site_config."""
+	times a safety buffer, clamped to [floor, cap]. All knobs overridable via site_config.
+	`stats` is one shard's (total_bytes, count); default is the whole backlog."""
 	conf = frappe.get_conf()
 	throughput = float(conf.get("s3_sweep_throughput_mbps") or S3_THROUGHPUT_MBPS)
 	per_file = float(conf.get("s3_sweep_per_file_overhead_s") or PER_FILE_OVERHEAD_S)
 	buffer_ = float(conf.get("s3_sweep_safety_buffer") or SWEEP_SAFETY_BUFFER)
 	floor_ = int(conf.get("s3_sweep_timeout_floor") or SWEEP_TIMEOUT_FLOOR)
 	cap_ = int(conf.get("s3_sweep_timeout_cap") or SWEEP_TIMEOUT_CAP)
-	total_bytes, count = _pending_migration_stats()
+	total_bytes, count = stats if stats is not None else _pending_migration_stats()
 	byte_seconds = total_bytes / (throughput * 1024 * 1024)
-	count_seconds = count * per_file
+	# The upload pool overlaps per-file round trips, so the count bound shrinks with its
+	# width; the byte bound does not — throughput is the shared bench->S3 uplink.
+	count_seconds = count * per_file / _sweep_workers(conf)
 	raw = max(byte_seconds, count_seconds) * buffer_
 	return int(min(cap_, max(floor_, raw)))
 
@@ -172,51 +279,280 @@ def process_unuploaded_documents():
 	"""Scheduler entry (cron). Offload the migration sweep to the long queue with a
 	timeout sized to the pending backlog (see _sweep_timeout) so a large migrate+remove
 	backlog isn't killed by the default short timeout. Deduplicated so a slow run can't
-	overlap the next night's run."""
+	overlap the next night's run.
+
+	With N sweep shards configured, enqueues N jobs instead — each owns the Files whose
+	_shard_of(file) is its index and is deduplicated on its own job_id — so several
+	long-queue workers (on any bench node) drain the backlog concurrently."""
 	if not frappe.has_permission("AWS S3 Settings", "read"):
 		frappe.throw("Not permitted", frappe.PermissionError)
-	frappe.enqueue(
-		run_unuploaded_documents_sweep,
-		queue="long",
-		timeout=_sweep_timeout(),
-		job_id="frappe_s3_integration::migrate_sweep",
-		deduplicate=True,
-	)
+	shards = _sweep_shards()
+	if not _claim_sweep_layout(shards):
+		return
+	stats = _pending_stats_by_shard(shards) if shards > 1 else [None]
+	for shard in range(shards):
+		job_id = _sweep_job_id(shard, shards)
+		job = frappe.enqueue(
+			run_unuploaded_documents_sweep,
+			queue="long",
+			timeout=_sweep_timeout(stats[shard]) if shards > 1 else _sweep_timeout(),
+			job_id=job_id,
+			deduplicate=True,
+			shard=shard,
+			shards=shards,
+		)
+		if job:
+			_SweepProgress(shard, shards, job_id).save(status="queued")
+
+
+def _claim_sweep_layout(shards):
+	"""Refuse to enqueue while jobs of a DIFFERENT shard layout are still queued/running:
+	shard membership depends on the shard count, so yesterday's 4-way job and today's 8-way
+	job could both pick the same File. Otherwise reset the record for the new layout."""
+	from frappe.utils.background_jobs import is_job_enqueued
+
+	progress = _read_sweep_progress()
+	others = [p for p in progress.values() if cint(p.get("shards")) != shards]
+	busy = [p["job_id"] for p in others if p.get("job_id") and is_job_enqueued(p["job_id"])]
+	if busy:
+		frappe.log_error(
+			f"Migration sweep not enqueued: {len(busy)} job(s) of the previous "
+			f"{others[0].get('shards')}-shard layout still queued/running ({', '.join(busy)}). "
+			f"Shard count changes take effect once they finish.", "S3 Migration")
+		return False
+	if others:
+		frappe.cache().delete_value(SWEEP_PROGRESS_KEY)
+	return True
+
+
+@frappe.whitelist()
+def get_sweep_progress():
+	"""The coordinating record of the migration sweep: shard index -> {status, total,
+	migrated, failed, job_id, queued/started/finished timestamps}."""
+	if not frappe.has_permission("AWS S3 Settings", "read"):
+		frappe.throw("Not permitted", frappe.PermissionError)
+	return _read_sweep_progress()
+
 
+def _read_sweep_progress():
+	"""{shard index (str): progress}. RedisWrapper.hgetall unpickles the values but leaves
+	the field names as bytes, which the whitelisted response can't serialize."""
+	progress = frappe.cache().hgetall(SWEEP_PROGRESS_KEY) or {}
+	return {(k.decode() if isinstance(k, bytes) else k): v for k, v in progress.items()}
+
+
+class _SweepProgress:
+	"""Progress of one sweep job (one shard) in the shared redis hash SWEEP_PROGRESS_KEY,
+	so every worker and bench node sees all shards. Best-effort: a redis hiccup must never
+	fail the sweep itself, so writes are batched and errors swallowed."""
+
+	SAVE_EVERY = 100
+
+	def __init__(self, shard, shards, job_id, total=None):
+		self.field = str(shard)
+		self.state = {"shard": shard, "shards": shards, "job_id": job_id, "total": total,
+		              "migrated": 0, "failed": 0}
+		self._unsaved = 0
+
+	def ok(self, n=1):
+		self.state["migrated"] += n
+		self._tick(n)
+
+	def failed(self, n=1):
+		self.state["failed"] += n
+		self._tick(n)
+
+	def _tick(self, n=1):
+		self._unsaved += n
+		if self._unsaved >= self.SAVE_EVERY:
+			self.save()
+
+	def save(self, status=None):
+		if status:
+			self.state["status"] = status
+			stamp = {"queued": "queued_at", "running": "started_at"}.get(status, "finished_at")
+			self.state[stamp] = now()
+		self._unsaved = 0
+		try:
+			frappe.cache().hset(SWEEP_PROGRESS_KEY, self.field, self.state)
+		except Exception:
+			pass
 
-def run_unuploaded_documents_sweep():
+
+def run_unuploaded_documents_sweep(shard=0, shards=1):
 	"""Migrate every flagged local File to S3 and delete the local copy. Runs on the
 	long queue (see process_unuploaded_documents); each file is committed + deleted
-	independently so a 3-hour budget covers a large backlog."""
+	independently so a 3-hour budget covers a large backlog. With more than one sweep
+	worker configured, uploads run on a bounded thread pool (_sweep_concurrently).
+	A sharded job only touches the Files of its own shard (see _shard_of). With a commit
+	batch above 1, verified pointers are group-committed (see _PointerBatch)."""
 	conn = getS3Connection()
 	if conn.s3_settings.disable_s3_operations:
 		return
-	files = frappe.get_all("File", filters=[
-		["custom_is_s3_uploaded", "=", 1],
-		["custom_s3_key", "in", ["", None]],
-	], fields=["name"])
-	for f in files:
-		try:
-			migrate_file_to_s3(f.name, conn)
-		except JobTimeoutException:
-			# Deadline reached: stop cleanly instead of swallowing it and running
-			# unbounded. Remaining files resume next night (idempotent + dedup'd).
-			frappe.db.rollback()
-			raise
-		except Exception:
-			frappe.db.rollback()
-			frappe.log_error(frappe.get_traceback(), f"S3 upload failed for File {f.name}")
-	if files:
+	shard, shards = cint(shard), max(1, cint(shards))
+	# Streamed a page at a time: a migrated File leaves the filter, which the keyset
+	# cursor tolerates (see s3_core.paging).
+	files = iter_files(PENDING_FILTERS, fields=["name", "file_url", "content_hash"])
+	if shards > 1:
+		files = (f for f in files if _shard_of(f, shards) == shard)
+		total = _pending_stats_by_shard(shards)[shard][1]
+	else:
+		total = cint(frappe.db.count("File", PENDING_FILTERS))
+	if total >= KEY_INDEX_SEED_MIN:
+		# One listing per folder instead of a collision probe per upload (see _KeyIndex).
+		for bucket, prefix in ((conn.private_bucket, "private/files/"), (conn.public_bucket, "files/")):
+			if bucket:
+				conn.seed_key_index(bucket, prefix)
+	progress = _SweepProgress(shard, shards, _sweep_job_id(shard, shards), total=total)
+	progress.save(status="running")
+	workers = _sweep_workers()
+	commit_batch = _sweep_commit_batch()
+	batch = _PointerBatch(commit_batch, progress) if commit_batch > 1 else None
+	try:
+		if workers > 1:
+			_sweep_concurrently((f.name for f in files), conn, workers, progress, batch)
+		else:
+			for f in files:
+				try:
+					if not migrate_file_to_s3(f.name, conn, batch):
+						progress.ok()  # a queued file is counted when its batch commits
+				except JobTimeoutException:
+					# Deadline reached: stop cleanly instead of swallowing it and running
+					# unbounded. Remaining files resume next night (idempotent + dedup'd).
+					frappe.db.rollback()
+					raise
+				except Exception:
+					frappe.db.rollback()
+					frappe.log_error(frappe.get_traceback(), f"S3 upload failed for File {f.name}")
+					progress.failed()
+		if batch:
+			batch.flush()
+	except JobTimeoutException:
+		if batch:
+			batch.flush()  # uploads already verified: keep them rather than re-upload next run
+		progress.save(status="timed out")
+		raise
+	progress.save(status="done")
+	if total:
 		# A repointed Single (e.g. Website Settings.app_logo) is written straight to
 		# tabSingles, bypassing its on_update website-cache rebuild — refresh once so the
 		# new proxy url is served without a manual `bench clear-cache`.
 		frappe.clear_cache()
 
 
-def migrate_file_to_s3(file_name, conn):
+def _blob_claims(plan):
+	"""What an in-flight upload holds exclusively: its blob (content_hash + visibility,
+	the dedup identity) and its target key (the collision-guard identity)."""
+	file = plan.file
+	return {("hash", file.content_hash, cint(file.is_private)), ("key", plan.bucket, plan.s3_key)}
+
+
+def _sweep_concurrently(names, conn, workers, progress=None, batch=None):
+	"""Pooled sweep: only the network half (_upload_planned: upload + HEAD-verify) runs on
+	`workers` threads. Everything touching the DB — prepare, then commit pointer -> repoint
+	-> delete local — stays on this thread, one file at a time, in the serial order.
+
+	A file whose blob or key is already in flight is held back until that upload finishes,
+	then re-prepared: it then dedups onto the freshly migrated sibling instead of uploading
+	the same bytes twice, and two uploads can never race for one key's collision guard.
+	With a group-commit `batch`, finished uploads are queued on it instead; a file whose
+	blob or key sits in the uncommitted batch flushes it first, then is re-prepared."""
+	source = iter(names)             # streamed: only held files are buffered
+	queue = []                       # files to (re-)prepare first; pop() from the end
+	held = []
+	in_flight = {}                   # future -> plan
+	claimed = set()
+	pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-sweep")
+	try:
+		while True:
+			while len(in_flight) < workers:
+				name = queue.pop() if queue else next(source, None)
+				if name is None:
+					break
+				try:
+					plan = _prepare_migration(name, conn)
+				except JobTimeoutException:
+					frappe.db.rollback()
+					raise
+				except Exception:
+					frappe.db.rollback()
+					frappe.log_error(frappe.get_traceback(), f"S3 upload failed for File {name}")
+					if progress:
+						progress.failed()
+					continue
+				if not plan:
+					if progress:
+						progress.ok()
+					continue  # settled without an upload (migrated / deduped / skipped)
+				if batch and batch.holds(plan):
+					batch.flush()
+					queue.append(name)  # re-prepare now that its sibling is committed
+					continue
+				claims = _blob_claims(plan)
+				if claims & claimed:
+					held.append(name)
+					continue
+				# Commit prepare's own writes (content_hash backfill) before bytes move, so a
+				# rollback for another file can never discard them.
+				frappe.db.commit()
+				claimed |= claims
+				in_flight[pool.submit(_upload_planned, conn, plan, True)] = plan
+			if not in_flight:
+				break
+			done, _pending = wait(in_flight, return_when=FIRST_COMPLETED)
+			for fut in done:
+				plan = in_flight.pop(fut)
+				claimed -= _blob_claims(plan)
+				try:
+					if batch:
+						batch.add(plan, fut.result())
+						continue  # counted when its batch commits
+					_finish_migration(plan, fut.result())
+					if progress:
+						progress.ok()
+				except JobTimeoutException:
+					frappe.db.rollback()
+					raise
+				except Exception:
+					frappe.db.rollback()
+					frappe.log_error(frappe.get_traceback(), f"S3 upload failed for File {plan.file.name}")
+					if progress:
+						progress.failed()
+			if held:
+				queue.extend(reversed(held))  # retry held files next, in their original order
+				held = []
+	finally:
+		# On a deadline don't wait for in-flight uploads: their pointers are never
+		# committed, so the next run simply re-uploads them (idempotent).
+		pool.shutdown(wait=False, cancel_futures=True)
+
+
+def migrate_file_to_s3(file_name, conn, batch=None):
+	"""Migrate one File. With a group-commit `batch`, the verified upload is queued on it
+	rather than committed here; returns True when it was."""
+	plan = _prepare_migration(file_name, conn)
+	if plan and batch and batch.holds(plan):
+		# Its blob or key belongs to a queued, uncommitted upload: commit that first, so
+		# this File dedups onto it instead of uploading the same bytes again.
+		batch.flush()
+		plan = _prepare_migration(file_name, conn)
+	if not plan:
+		return False
+	s3_resp = _upload_planned(conn, plan)
+	if batch:
+		batch.add(plan, s3_resp)
+		return True
+	_finish_migration(plan, s3_resp)
+	return False
+
+
+def _prepare_migration(file_name, conn):
+	"""Main-thread half of a migration: every DB read/write that happens BEFORE bytes move.
+	Returns a plan for the upload, or None when the File was settled without one (already
+	migrated, healed/deduped from a sibling, or skipped + logged)."""
 	file = frappe.get_doc("File", file_name)
 	if file.custom_s3_key:
-		return  # already migrated — idempotent (invariant 2)
+		return None  # already migrated — idempotent (invariant 2)
 
 	local_path = _local_path(file)
 
@@ -229,20 +565,21 @@ def migrate_file_to_s3(file_name, conn):
 			_point_doc_at_s3(file, sib.custom_s3_key, sib.custom_s3_bucket_name)
 			frappe.db.commit()
 			_repoint_attached(file)  # invariant 2: this doc's attach field too
-			return
+			return None
 		frappe.log_error(f"Local file missing & no recoverable sibling: {file.name} ({local_path})", "S3 Migration")
-		return
+		return None
 
 	local_size = os.path.getsize(local_path)
 	if local_size == 0:
 		frappe.log_error(f"Local file is empty: {local_path}", "S3 Migration")
-		return
+		return None
 
 	# Ensure the blob's content_hash is stored — dedup (_migrated_sibling) and both
 	# delete guards depend on it; backfill from local bytes if Frappe never set one.
+	# Held on the doc and stored with the pointer, not now: _shard_of keys a hashless File
+	# on its url, and a hash committed mid-upload would hand it to a second shard's job.
 	if not file.content_hash:
 		file.content_hash = _hash_local_file(local_path)
-		frappe.db.set_value("File", file.name, "content_hash", file.content_hash, update_modified=False)
 
 	# A sibling already migrated this exact blob -> reuse its object, no re-upload (M1).
 	# Verify the sibling's object still exists before trusting it & deleting local bytes.
@@ -252,33 +589,112 @@ def migrate_file_to_s3(file_name, conn):
 		frappe.db.commit()
 		_repoint_attached(file)  # invariant 2: dedup'd sibling still owns its own attach field
 		_maybe_remove_local(file, local_path)
-		return
+		return None
 
-	content_type = _guess_content_type(file.file_name)
-	# Mirror Frappe's own layout as the S3 key: files/<name> or private/files/<name>.
-	s3_key = _s3_key_from_file_url(file.file_url)
-	with open(local_path, "rb") as f:
-		file_obj = FileStorage(stream=f, filename=file.file_name, content_type=content_type)
-		if file.is_private:
-			s3_resp = conn.upload_file_to_private_bucket(file_obj, key=s3_key)
+	return frappe._dict(
+		file=file,
+		local_path=local_path,
+		local_size=local_size,
+		# Mirror Frappe's own layout as the S3 key: files/<name> or private/files/<name>.
+		s3_key=_s3_key_from_file_url(file.file_url),
+		bucket=conn.private_bucket if file.is_private else conn.public_bucket,
+		content_type=_guess_content_type(file.file_name),
+	)
+
+
+def _upload_planned(conn, plan, threaded=False):
+	"""Network half of a migration: upload the local blob and confirm it landed (invariant 1).
+	With `threaded`, runs on an upload-pool thread that has no site context, so it calls the
+	raising put_file (never frappe.db / log_error) and errors propagate to the main thread."""
+	file = plan.file
+	with open(plan.local_path, "rb") as f:
+		file_obj = FileStorage(stream=f, filename=file.file_name, content_type=plan.content_type)
+		if threaded:
+			s3_resp = conn.put_file(file_obj, plan.bucket, allow_public=not file.is_private,
+			                        key=plan.s3_key, resume=True)
+		elif file.is_private:
+			s3_resp = conn.upload_file_to_private_bucket(file_obj, key=plan.s3_key, resume=True)
 		else:
-			s3_resp = conn.upload_file_to_public_bucket(file_obj, key=s3_key)
+			s3_resp = conn.upload_file_to_public_bucket(file_obj, key=plan.s3_key, resume=True)
 
 	if not s3_resp or not s3_resp.get("content_hash"):
 		raise Exception("S3 upload failed or returned no content hash")  # M8
 
 	# Invariant 1: confirm the object is really there before touching DB / local file.
-	if not conn.verify_object(s3_resp["bucket_name"], s3_resp["key"], expected_size=local_size):
+	if not conn.verify_object(s3_resp["bucket_name"], s3_resp["key"], expected_size=plan.local_size):
 		raise Exception(f"S3 object verification failed for {file.name}")
+	return s3_resp
+
 
+def _finish_migration(plan, s3_resp):
+	"""Main-thread tail of a migration, strictly in durability order: the verified object is
+	committed as the File's pointer, then the attach field is repointed, then local bytes go."""
 	# Persist the durable S3 pointer FIRST, in its own commit (invariant 1 + N2).
-	_point_doc_at_s3(file, s3_resp["key"], s3_resp["bucket_name"])
+	_point_doc_at_s3(plan.file, s3_resp["key"], s3_resp["bucket_name"])
 	frappe.db.commit()
 
 	# Invariant 2: repoint the attached doc's field (singles-aware, isolated non-fatal commit).
-	_repoint_attached(file)
+	_repoint_attached(plan.file)
+
+	_maybe_remove_local(plan.file, plan.local_path)
+
+
+class _PointerBatch:
+	"""Group commit for the sweep (AWS S3 Settings > Migration Sweep Commit Batch).
+
+	Verified uploads queue here instead of costing two commits each. flush() writes every
+	queued pointer with one multi-row UPDATE and commits, then repoints the attach fields
+	under one more commit, each behind its own savepoint, and only then removes the local
+	copies — a local file is never deleted before its pointer and its attach field are
+	durable. A repoint that fails is rolled back to its savepoint and keeps its local file;
+	a failed UPDATE rolls the whole batch back and leaves its local files in place; a job
+	killed before a flush leaves verified objects without pointers, and the next sweep
+	uploads those files again."""
+
+	def __init__(self, size, progress=None):
+		self.size = size
+		self.progress = progress
+		self.pending = []  # [(plan, s3_resp)]
+		self.claims = set()
+
+	def holds(self, plan):
+		return bool(_blob_claims(plan) & self.claims)
+
+	def add(self, plan, s3_resp):
+		self.pending.append((plan, s3_resp))
+		self.claims |= _blob_claims(plan)
+		if len(self.pending) >= self.size:
+			self.flush()
 
-	_maybe_remove_local(file, local_path)
+	def flush(self):
+		entries, self.pending, self.claims = self.pending, [], set()
+		if not entries:
+			return
+		try:
+			_point_docs_at_s3(entries)
+			frappe.db.commit()
+		except JobTimeoutException:
+			frappe.db.rollback()
+			raise
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(),
+			                 f"S3 pointer batch failed for {len(entries)} File(s) — local copies kept")
+			if self.progress:
+				self.progress.failed(len(entries))
+			return
+		repointed = []
+		for plan, _s3_resp in entries:
+			frappe.db.savepoint("s3_repoint")
+			if _repoint_attached(plan.file, commit=False):
+				repointed.append(plan)
+			else:
+				frappe.db.rollback(save_point="s3_repoint")  # the others still commit
+		frappe.db.commit()
+		for plan in repointed:
+			_maybe_remove_local(plan.file, plan.local_path)
+		if self.progress:
+			self.progress.ok(len(entries))
 
 
 def _maybe_remove_local(file, local_path):
@@ -0,0 +1,90 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and contributors
+# For license information, please see license.txt
+"""Import-time benchmark for the modules every web/worker process loads through hooks.py.
+
+hooks.py wires before_request (local_fallback), override_doctype_class (overrides) and
+the File doc_events (s3_core) into every process, so whatever those modules import at
+module level is paid on every cold start. Each target is imported in a fresh interpreter
+with `python -X importtime`, once as-is ("lazy") and once with boto3 imported first
+("eager", the cost the package paid before boto3 loading moved into _boto_session).
+
+	bench execute frappe_s3_integration.frappe_s3_integration.startup_benchmark.run
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+TARGETS = (
+	"frappe_s3_integration.local_fallback",
+	"frappe_s3_integration.overrides",
+	"frappe_s3_integration.s3_core",
+)
+EAGER_PRELUDE = "import boto3, boto3.s3.transfer; "
+HEAVY_MODULES = ("boto3", "botocore.session", "botocore.client")
+
+
+def measure(module, eager=False):
+	"""Import `module` in a fresh interpreter. Returns the total import time in ms (every
+	module the process imported, the interpreter's own startup excluded) and whether any
+	of HEAVY_MODULES ended up in sys.modules."""
+	code = (EAGER_PRELUDE if eager else "") + (
+		f"import {module}, sys; "
+		f"print(any(m in sys.modules for m in {HEAVY_MODULES!r}))"
+	)
+	env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+	proc = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", code],
+		capture_output=True, text=True, env=env, check=True,
+	)
+	return {
+		"ms": _import_time_ms(proc.stderr),
+		"boto3_loaded": proc.stdout.strip().endswith("True"),
+	}
+
+
+def _import_time_ms(stderr):
+	"""Sum the top-level cumulative times from -X importtime output. Nested imports are
+	indented under their parent, so only unindented rows are counted; modules the
+	interpreter imports before running -c (encodings, site, ...) are counted in both the
+	lazy and eager runs and cancel out in the difference."""
+	total = 0
+	for line in stderr.splitlines():
+		if not line.startswith("import time:"):
+			continue
+		parts = line[len("import time:"):].split("|")
+		if len(parts) != 3 or not parts[1].strip().isdigit():
+			continue  # the header row
+		if parts[2][1:].startswith("  "):
+			continue  # nested under a module already counted
+		total += int(parts[1])
+	return total / 1000.0
+
+
+def run(repeat=5):
+	"""Median lazy vs eager import time per target, printed and returned."""
+	repeat = max(1, int(repeat))
+	report = []
+	for module in TARGETS:
+		lazy = [measure(module) for _ in range(repeat)]
+		eager = [measure(module, eager=True) for _ in range(repeat)]
+		lazy_ms = statistics.median(r["ms"] for r in lazy)
+		eager_ms = statistics.median(r["ms"] for r in eager)
+		report.append({
+			"module": module,
+			"lazy_ms": round(lazy_ms, 1),
+			"eager_ms": round(eager_ms, 1),
+			"saved_ms": round(eager_ms - lazy_ms, 1),
+			"boto3_loaded": any(r["boto3_loaded"] for r in lazy),
+		})
+	for row in report:
+		print(
+			f"{row['module']:<40} lazy {row['lazy_ms']:>8.1f} ms  eager {row['eager_ms']:>8.1f} ms"
+			f"  saved {row['saved_ms']:>8.1f} ms  boto3 loaded: {row['boto3_loaded']}"
+		)
+	return report
+
+
+if __name__ == "__main__":
+	run()
@@ -3,6 +3,7 @@
 
 from unittest.mock import MagicMock, patch
 
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
 from frappe_s3_integration.frappe_s3_integration import backfill
@@ -13,10 +14,19 @@ def _conn():
 	conn.public_bucket = "pub"
 	conn.private_bucket = None
 	conn.s3_settings.disable_s3_operations = 0
+	conn.iter_objects.side_effect = lambda bucket, **kw: conn.list_objects(bucket)  # no inventory
 	return conn
 
 
 class TestBackfill(FrappeTestCase):
+	def setUp(self):
+		# MagicMock connections script their S3 replies as ordered side_effect lists, so
+		# run the bulk engine inline here; test_bulk covers its concurrency.
+		for name, value in (("bulk_concurrency", 1), ("bulk_rate_limit", 0)):
+			patcher = patch(f"frappe_s3_integration.s3_core.bulk.{name}", return_value=value)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
 	def test_only_octet_rewritten_and_resilient(self):
 		conn = _conn()
 		conn.list_objects.return_value = [
@@ -59,3 +69,59 @@ class TestBackfill(FrappeTestCase):
 			res = backfill.backfill_content_types(dry_run=False)
 		conn.connection.head_object.assert_not_called()
 		self.assertEqual(res["pub"], {"scanned": 1, "fixed": 0, "errors": 1})
+
+
+class TestBackfillCacheControl(FrappeTestCase):
+	POLICY = "public, max-age=31536000, immutable"
+
+	def setUp(self):
+		# MagicMock connections script their S3 replies as ordered side_effect lists, so
+		# run the bulk engine inline here; test_bulk covers its concurrency.
+		for name, value in (("bulk_concurrency", 1), ("bulk_rate_limit", 0)):
+			patcher = patch(f"frappe_s3_integration.s3_core.bulk.{name}", return_value=value)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def _conn(self):
+		from frappe_s3_integration.s3_core import S3Connection
+		conn = _conn()
+		conn.s3_settings = frappe._dict(disable_s3_operations=0, s3_bucket_details=[frappe._dict(
+			bucket_name="pub", default_public_bucket=1, cache_control=self.POLICY,
+			cache_control_extensions="png, .jpg")])
+		conn.cache_control_for = S3Connection.cache_control_for.__get__(conn)
+		return conn
+
+	def test_policy_applied_only_where_missing_and_covered(self):
+		conn = self._conn()
+		conn.list_objects.return_value = [
+			{"Key": "files/a.png", "Size": 10},
+			{"Key": "files/b.JPG", "Size": 10},
+			{"Key": "files/c.pdf", "Size": 10},
+		]
+		conn.connection.head_object.side_effect = [
+			{"ContentType": "image/png", "Metadata": {"x": "1"}},          # a -> fix
+			{"ContentType": "image/jpeg", "CacheControl": self.POLICY},    # b -> already set
+		]
+		with patch.object(backfill, "getS3Connection", return_value=conn), \
+		     patch.object(backfill.frappe, "has_permission", return_value=True):
+			res = backfill.backfill_cache_control(dry_run=False)
+		conn.connection.copy_object.assert_called_once()
+		kw = conn.connection.copy_object.call_args.kwargs
+		self.assertEqual(kw["Key"], "files/a.png")
+		self.assertEqual(kw["CacheControl"], self.POLICY)
+		self.assertEqual(kw["ContentType"], "image/png")               # type kept
+		self.assertEqual(kw["Metadata"], {"x": "1"})
+		self.assertEqual(kw["MetadataDirective"], "REPLACE")
+		self.assertEqual(kw["ACL"], "public-read")
+		self.assertEqual(conn.connection.head_object.call_count, 2)     # pdf not covered: no HEAD
+		self.assertEqual(res["pub"], {"scanned": 3, "fixed": 1, "errors": 0})
+
+	def test_content_type_backfill_keeps_cache_control(self):
+		conn = _conn()
+		conn.list_objects.return_value = [{"Key": "files/a.png", "Size": 10}]
+		conn.connection.head_object.return_value = {"ContentType": "binary/octet-stream",
+		                                            "CacheControl": self.POLICY}
+		with patch.object(backfill, "getS3Connection", return_value=conn), \
+		     patch.object(backfill.frappe, "has_permission", return_value=True):
+			backfill.backfill_content_types(dry_run=False)
+		self.assertEqual(conn.connection.copy_object.call_args.kwargs["CacheControl"], self.POLICY)
@@ -24,6 +24,9 @@ try:
 except ImportError:  # paramiko is only needed for remote SSH backup
 	HAS_PARAMIKO = False
 
+HAS_ZSTD = backup._zstandard() is not None  # optional: Backup Compression = Zstandard
+HAS_PIGZ = bool(shutil.which("pigz"))
+
 
 class _FakeRemoteFile(io.BytesIO):
 	"""Stand-in for a paramiko SFTPFile: a real buffer we can inspect, plus set_pipelined()."""
@@ -242,7 +245,7 @@ class TestBackup(FrappeTestCase):
 		names = [f"pub-2026-06-{day:02d}.tar.gz" for day in range(1, 11)]  # 10 archives
 		for n in names:
 			open(os.path.join(d, n), "w").close()
-		removed = backup._prune_old_archives(d, "pub-", keep=7)
+		removed = backup._prune_old_archives(d, "pub", keep=7)
 		self.assertEqual(len(removed), 3)
 		self.assertEqual(sorted(f for f in os.listdir(d) if f.startswith("pub-")), sorted(names)[-7:])
 
@@ -250,7 +253,7 @@ class TestBackup(FrappeTestCase):
 		d = tempfile.mkdtemp()
 		for day in range(1, 4):
 			open(os.path.join(d, f"pub-2026-06-0{day}.tar.gz"), "w").close()
-		removed = backup._prune_old_archives(d, "pub-", keep=0)
+		removed = backup._prune_old_archives(d, "pub", keep=0)
 		self.assertEqual(len(removed), 3)
 
 	def test_default_backup_dir_is_outside_frappe_backups(self):
@@ -290,24 +293,21 @@ class TestBackup(FrappeTestCase):
 		conn.private_bucket = "prv"
 		conn.public_bucket = "pub"
 		conn.list_objects.side_effect = lambda b: [{"Key": f"{b}/a.txt", "Size": 3}]
+		conn.get_file_from_bucket.side_effect = lambda key, bucket: {"Body": io.BytesIO(b"abc")}
 		return conn
 
 	def test_backup_archives_have_bytes_and_is_read_only(self):
 		d = tempfile.mkdtemp()
+		os.makedirs(os.path.join(d, ".staging-prv", "old"))  # left by an older version
+		open(os.path.join(d, "prv-killed.tar.gz.part"), "w").close()
 		conn = self._conn(d)
-
-		def fake_download(bucket, key, dest):
-			with open(dest, "w") as f:
-				f.write("abc")
-
-		conn.download_object.side_effect = fake_download
 		with patch.object(backup, "getS3Connection", return_value=conn):
 			backup.run_backup_s3_buckets()
 
 		archives = sorted(f for f in os.listdir(d) if f.endswith(".tar.gz"))
 		self.assertEqual(len(archives), 2)  # one per bucket
-		self.assertEqual(conn.download_object.call_count, 2)  # actually downloaded both objects
-		self.assertFalse(any(f.startswith(".staging") for f in os.listdir(d)))  # staging cleaned
+		self.assertEqual(conn.get_file_from_bucket.call_count, 2)  # actually fetched both objects
+		self.assertEqual(sorted(os.listdir(d)), archives)  # streamed: no staging, no .part left
 
 		# each archive really contains the downloaded bytes (not an empty tar)
 		for arch in archives:
@@ -329,12 +329,14 @@ class TestBackup(FrappeTestCase):
 			open(os.path.join(d, f"prv-2026-06-0{day}.tar.gz"), "w").close()
 			open(os.path.join(d, f"pub-2026-06-0{day}.tar.gz"), "w").close()
 		conn = self._conn(d)
-		conn.download_object.side_effect = Exception("S3 down mid-run")
-		with patch.object(backup, "getS3Connection", return_value=conn):
+		conn.get_file_from_bucket.side_effect = Exception("S3 down mid-run")
+		with patch.object(backup, "getS3Connection", return_value=conn), \
+		     patch.object(backup.frappe, "log_error"):
 			backup.run_backup_s3_buckets()
 		# no new archives written, none pruned -> still exactly the 4 originals
 		archives = sorted(f for f in os.listdir(d) if f.endswith(".tar.gz"))
 		self.assertEqual(len(archives), 4)
+		self.assertFalse([f for f in os.listdir(d) if f.endswith(".part")])  # partials removed
 
 	def test_backup_aborts_when_mount_required_but_target_not_mounted(self):
 		# no-local-space guarantee: a down mount must skip the run, never write locally.
@@ -349,7 +351,6 @@ class TestBackup(FrappeTestCase):
 	def test_backup_runs_when_mount_required_and_target_mounted(self):
 		d = tempfile.mkdtemp()
 		conn = self._conn(d)
-		conn.download_object.side_effect = lambda b, k, dest: open(dest, "w").write("abc")
 		with patch.object(backup.frappe, "conf", {"s3_backup_require_mount": 1}), \
 		     patch.object(backup, "_is_mounted", return_value=True), \
 		     patch.object(backup, "getS3Connection", return_value=conn):
@@ -360,7 +361,6 @@ class TestBackup(FrappeTestCase):
 		# without the opt-in flag, an unmounted/plain dir still backs up (default behaviour).
 		d = tempfile.mkdtemp()
 		conn = self._conn(d)
-		conn.download_object.side_effect = lambda b, k, dest: open(dest, "w").write("abc")
 		with patch.object(backup.frappe, "conf", {}), \
 		     patch.object(backup, "_is_mounted", return_value=False) as im, \
 		     patch.object(backup, "getS3Connection", return_value=conn):
@@ -376,6 +376,177 @@ class TestBackup(FrappeTestCase):
 		     patch.object(backup.os.path, "ismount", return_value=False):
 			self.assertFalse(backup._is_mounted("/mnt/box/erp/2026"))  # nothing mounted
 
+	# ---- incremental mode (full + delta chains) ---------------------------------------------
+	def test_prune_keeps_whole_chains(self):
+		d = tempfile.mkdtemp()
+		names = ["b-2026-06-01.tar.gz", "b-2026-06-02.delta.tar.gz", "b-2026-06-03.delta.tar.gz",
+		         "b-2026-06-04.tar.gz", "b-2026-06-05.delta.tar.gz", "b-2026-06-06.tar.gz"]
+		for n in names:
+			open(os.path.join(d, n), "w").close()
+			open(os.path.join(d, backup._manifest_name(n)), "w").close()
+		removed = backup._prune_old_archives(d, "b", keep=2)
+		self.assertEqual(removed, names[:3])  # the oldest chain goes whole, deltas and all
+		self.assertEqual(sorted(os.listdir(d)), sorted(
+			n for a in names[3:] for n in (a, backup._manifest_name(a))))
+
+	def test_bucket_name_prefix_of_another_bucket(self):
+		# "erp" must never claim "erp-pub"'s archives: not as its delta base, not its chain length,
+		# and not in its prune.
+		d = tempfile.mkdtemp()
+		erp = ["erp-2026-06-01_01-00-00.000001.tar.gz", "erp-2026-06-02_01-00-00.000001.delta.tar.gz"]
+		pub = ["erp-pub-2026-06-03_01-00-00.000001.tar.gz", "erp-pub-2026-06-04_01-00-00.000001.tar.gz"]
+		for n in erp + pub:
+			open(os.path.join(d, n), "w").close()
+			with open(os.path.join(d, backup._manifest_name(n)), "wb") as f:
+				w = backup._ManifestWriter(f, {})
+				w.add({"Key": f"files/{n}", "Size": 1})
+				w.close()
+		self.assertEqual(backup._archives(os.listdir(d), "erp"), erp)
+		chain = backup._next_chain(os.listdir(d), "erp", 7, lambda n: open(os.path.join(d, n), "rb"))
+		self.assertEqual(list(chain.previous), [f"files/{erp[1]}"])  # erp's own newest manifest
+		self.assertEqual(backup._prune_old_archives(d, "erp", keep=1), [])  # erp has one chain
+		self.assertEqual(backup._prune_old_archives(d, "erp-pub", keep=1), pub[:1])
+		self.assertTrue(all(os.path.exists(os.path.join(d, n)) for n in erp))
+
+	def _incremental_conn(self, d, blobs):
+		conn = self._conn(d)
+		conn.s3_settings.get.side_effect = {
+			"enable_bucket_backup": 1, "backup_directory": d, "backup_retention_count": 7,
+			"backup_mode": "Incremental", "backup_full_every": 2,
+		}.get
+		conn.public_bucket = None
+		conn.list_objects.side_effect = lambda b: [
+			{"Key": k, "Size": len(v), "ETag": f'"{v.hex()}"'} for k, v in blobs.items()]
+		conn.get_file_from_bucket.side_effect = lambda k, b: {"Body": io.BytesIO(blobs[k])}
+		return conn
+
+	def test_incremental_local_archives_only_changes(self):
+		d = tempfile.mkdtemp()
+		blobs = {"files/a.txt": b"abc", "files/b.txt": b"hello"}
+		conn = self._incremental_conn(d, blobs)
+		with patch.object(backup, "getS3Connection", return_value=conn), \
+		     patch.object(backup, "_stamp", side_effect=["2026-10-01", "2026-10-02", "2026-10-03"]):
+			backup.run_backup_s3_buckets()
+			blobs["files/b.txt"] = b"changed"
+			blobs["files/c.txt"] = b"new"
+			del blobs["files/a.txt"]
+			backup.run_backup_s3_buckets()
+			backup.run_backup_s3_buckets()  # the chain holds 2 archives: a new full snapshot
+
+		self.assertEqual(sorted(f for f in os.listdir(d) if f.endswith(".tar.gz")),
+		                 ["prv-2026-10-01.tar.gz", "prv-2026-10-02.delta.tar.gz", "prv-2026-10-03.tar.gz"])
+		with tarfile.open(os.path.join(d, "prv-2026-10-02.delta.tar.gz")) as tar:
+			self.assertEqual(sorted(m.name for m in tar.getmembers() if m.isfile()),
+			                 ["prv/files/b.txt", "prv/files/c.txt"])
+		with open(os.path.join(d, "prv-2026-10-02.manifest.jsonl.gz"), "rb") as f:
+			self.assertEqual(sorted(backup._read_manifest(f)), ["files/b.txt", "files/c.txt"])
+		self.assertEqual(conn.get_file_from_bucket.call_count, 2 + 2 + 2)
+		self.assertFalse([f for f in os.listdir(d) if f.endswith(".part")])
+
+	def test_incremental_starts_a_chain_without_a_readable_manifest(self):
+		d = tempfile.mkdtemp()
+		open(os.path.join(d, "prv-2026-10-01.tar.gz"), "w").close()  # archived before manifests existed
+		chain = backup._next_chain(os.listdir(d), "prv", 7, lambda n: open(os.path.join(d, n), "rb"))
+		self.assertFalse(chain.delta)
+		open(os.path.join(d, "prv-2026-10-01.manifest.jsonl.gz"), "w").write("garbage")
+		with patch.object(backup.frappe, "log_error") as le:
+			chain = backup._next_chain(os.listdir(d), "prv", 7, lambda n: open(os.path.join(d, n), "rb"))
+		self.assertFalse(chain.delta)
+		le.assert_called_once()
+
+	def test_stream_bucket_delta_with_manifest(self):
+		conn = self._stream_conn({"files/a.txt": b"abc", "files/b.txt": b"hello"})
+		chain = backup._Chain({"files/a.txt": [3, "", ""], "files/gone.txt": [1, "", ""]})
+		remote = {}
+
+		def sftp_open(path, mode):
+			remote[path] = _FakeRemoteFile()
+			return remote[path]
+		sftp = MagicMock()
+		sftp.open.side_effect = sftp_open
+		sftp.stat.side_effect = lambda p: MagicMock(st_size=len(remote[p].getvalue()))
+		sftp.remove.side_effect = IOError
+		self.assertTrue(backup._stream_bucket_to_remote(conn, "bkt", sftp, "/backup", "S", chain=chain))
+		self.assertEqual([c.args[1] for c in sftp.rename.call_args_list],
+		                 ["/backup/bkt-S.delta.tar.gz", "/backup/bkt-S.manifest.jsonl.gz"])
+		with tarfile.open(fileobj=io.BytesIO(remote["/backup/bkt-S.delta.tar.gz.part"].getvalue()),
+		                  mode="r:gz") as t:
+			self.assertEqual([m.name for m in t.getmembers()], ["bkt/files/b.txt"])  # a unchanged
+		manifest = backup._read_manifest(io.BytesIO(remote["/backup/bkt-S.manifest.jsonl.gz.part"].getvalue()))
+		self.assertEqual(sorted(manifest), ["files/a.txt", "files/b.txt"])  # gone.txt: deleted
+
+	def test_prune_remote_keeps_whole_chains(self):
+		sftp = MagicMock()
+		sftp.listdir.return_value = ["bkt-2026-10-01.tar.gz", "bkt-2026-10-01.manifest.jsonl.gz", "bkt-2026-10-02.delta.tar.gz",
+		                             "bkt-2026-10-02.manifest.jsonl.gz", "bkt-2026-10-03.tar.gz", "bkt-2026-10-04.delta.tar.gz"]
+		backup._prune_remote(sftp, "/backup", "bkt", keep=1)
+		self.assertEqual([c.args[0] for c in sftp.remove.call_args_list], [
+			"/backup/bkt-2026-10-01.tar.gz", "/backup/bkt-2026-10-01.manifest.jsonl.gz",
+			"/backup/bkt-2026-10-02.delta.tar.gz", "/backup/bkt-2026-10-02.manifest.jsonl.gz"])
+
+	# ---- archive codecs -------------------------------------------------------------------
+	def _codec_archive(self, codec, blobs):
+		conn = self._stream_conn(blobs)
+		out = io.BytesIO()
+		backup._write_archive(conn, "bkt", out, codec=codec)
+		return out.getvalue()
+
+	def test_gzip_stores_listed_extensions_uncompressed(self):
+		blobs = {"files/a.txt": b"a" * 50000, "files/b.JPG": b"jpeg" * 5000, "files/c.txt": b"c" * 50000}
+		data = self._codec_archive(backup._Codec("gzip", ".tar.gz", 9, ["jpg"]), blobs)
+		compressed = self._codec_archive(backup._Codec("gzip", ".tar.gz", 9), blobs)
+		self.assertGreater(len(data), len(compressed) + 19000)  # the 20 KB jpg went in as it is
+		self.assertLess(len(data), 25000)                       # the 100 KB of text did not
+		with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as t:  # one tar across members
+			self.assertEqual({m.name: t.extractfile(m).read() for m in t.getmembers()},
+			                 {f"bkt/{k}": v for k, v in blobs.items()})
+
+	def test_none_codec_writes_a_plain_tar(self):
+		codec = backup._Codec("none", ".tar")
+		data = self._codec_archive(codec, {"files/a.txt": b"abc"})
+		with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as t:
+			self.assertEqual(t.extractfile("bkt/files/a.txt").read(), b"abc")
+		self.assertEqual(backup._archive_name("bkt", "S", delta=True, ext=codec.ext), "bkt-S.delta.tar")
+
+	def test_codec_from_settings_and_fallback(self):
+		settings = MagicMock()
+		settings.get.side_effect = {"backup_compression": "Zstandard", "backup_compression_level": 40,
+		                            "backup_store_extensions": ".PDF, jpg"}.get
+		with patch.object(backup, "_zstandard", return_value=MagicMock()):
+			codec = backup._codec(settings)
+		self.assertEqual((codec.name, codec.ext, codec.level), ("zstd", ".tar.zst", 22))  # clamped
+		self.assertTrue(codec.stored("files/x.pdf") and codec.stored("files/y.JPG"))
+		self.assertFalse(codec.stored("files/z.txt"))
+		with patch.object(backup, "_zstandard", return_value=None), \
+		     patch.object(backup.frappe, "log_error") as le:
+			codec = backup._codec(settings)
+		self.assertEqual((codec.name, codec.ext), ("gzip", ".tar.gz"))  # tonight's backup still runs
+		le.assert_called_once()
+		settings.get.side_effect = {}.get
+		self.assertTrue(backup._codec(settings).stored("files/a.pdf"))  # default store list
+
+	def test_chains_and_manifests_across_codecs(self):
+		names = ["b-2026-10-01.tar.zst", "b-2026-10-01.manifest.jsonl.gz", "b-2026-10-02.delta.tar.zst", "b-2026-10-03.tar", "b-2026-10-04.delta.tar.gz",
+		         "b-2026-10-05.tar.zst.part", "other.txt"]
+		self.assertEqual(backup._chains(backup._archives(names, "b")),
+		                 [["b-2026-10-01.tar.zst", "b-2026-10-02.delta.tar.zst"], ["b-2026-10-03.tar", "b-2026-10-04.delta.tar.gz"]])
+		self.assertEqual(backup._manifest_name("b-2026-10-02.delta.tar.zst"), "b-2026-10-02.manifest.jsonl.gz")
+		self.assertEqual([n for n in names if backup._is_part(n)], ["b-2026-10-05.tar.zst.part"])
+
+	@unittest.skipUnless(HAS_ZSTD, "zstandard not installed")
+	def test_zstd_archive_round_trips(self):
+		blobs = {"files/a.txt": b"a" * 50000, "files/b.pdf": b"%PDF" * 5000}
+		data = self._codec_archive(backup._Codec("zstd", ".tar.zst", 3, ["pdf"]), blobs)
+		reader = backup._zstandard().ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+		with tarfile.open(fileobj=reader, mode="r|") as t:
+			self.assertEqual(sorted(m.name for m in t), ["bkt/files/a.txt", "bkt/files/b.pdf"])
+
+	@unittest.skipUnless(HAS_PIGZ, "pigz not installed")
+	def test_pigz_archive_is_gzip(self):
+		data = self._codec_archive(backup._Codec("pigz", ".tar.gz", 6), {"files/a.txt": b"abc"})
+		with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as t:
+			self.assertEqual(t.extractfile("bkt/files/a.txt").read(), b"abc")
+
 	def test_backup_skipped_when_disabled(self):
 		conn = MagicMock()
 		conn.s3_settings.disable_s3_operations = 1
@@ -448,6 +619,62 @@ class TestBackup(FrappeTestCase):
 			                 ["bkt/files/a.txt", "bkt/files/b.txt"])
 			self.assertEqual(t.extractfile("bkt/files/a.txt").read(), b"abc")
 
+	def test_prefetch_keeps_listing_order_with_bounded_downloads(self):
+		blobs = {f"files/{i}.txt": str(i).encode() * (i + 1) for i in range(12)}
+		lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+		def get_file(key, bucket):
+			with lock:
+				state["now"] += 1
+				state["peak"] = max(state["peak"], state["now"])
+			time.sleep(0.01 * (12 - int(key[6:-4])) / 12)  # later keys finish first
+			with lock:
+				state["now"] -= 1
+			return {"Body": io.BytesIO(blobs[key]), "ContentLength": len(blobs[key])}
+		conn = MagicMock()
+		conn.get_file_from_bucket.side_effect = get_file
+		objs = [{"Key": k} for k in blobs]
+		got = []
+		for obj, fetched in backup._prefetch(conn, "bkt", iter(objs), 3, 4):
+			size, spool = fetched.result()
+			with spool:
+				got.append((obj["Key"], spool.read(), spool._rolled))
+		self.assertEqual([g[0] for g in got], list(blobs))
+		self.assertEqual([g[1] for g in got], list(blobs.values()))
+		self.assertEqual([g[2] for g in got], [len(v) > 4 for v in blobs.values()])  # spilled to disk
+		self.assertLessEqual(state["peak"], 3)
+
+	def test_prefetch_width_stays_small_under_a_wide_bulk_pool(self):
+		# the spool budget is split across the downloads in flight: a 50-wide bulk pool
+		# must not leave each download ~5 MB of the 256 MB budget.
+		with patch.object(backup, "bulk_concurrency", return_value=50), \
+		     patch.object(backup.frappe, "conf", {}):
+			self.assertEqual(backup._prefetch_workers({}), backup.PREFETCH_WORKERS)
+		with patch.object(backup, "bulk_concurrency", return_value=50), \
+		     patch.object(backup.frappe, "conf", {"s3_backup_prefetch_workers": 16}):
+			self.assertEqual(backup._prefetch_workers({}), 16)
+		with patch.object(backup, "bulk_concurrency", return_value=2), \
+		     patch.object(backup.frappe, "conf", {}):
+			self.assertEqual(backup._prefetch_workers({}), 2)
+
+	def test_download_refuses_a_short_body(self):
+		conn = MagicMock()
+		conn.get_file_from_bucket.return_value = {"Body": io.BytesIO(b"ab"), "ContentLength": 3}
+		with self.assertRaises(IOError):
+			backup._download(conn, "bkt", "files/a.txt", 1024)
+
+	def test_stream_bucket_with_parallel_fetch(self):
+		blobs = {f"files/{i}.txt": f"body-{i}".encode() for i in range(20)}
+		conn = self._stream_conn(blobs)
+		fake = _FakeRemoteFile()
+		sftp = MagicMock()
+		sftp.open.return_value = fake
+		sftp.stat.side_effect = lambda p: MagicMock(st_size=len(fake.getvalue()))
+		self.assertTrue(backup._stream_bucket_to_remote(conn, "bkt", sftp, "/backup", "S", workers=4))
+		with tarfile.open(fileobj=io.BytesIO(fake.getvalue()), mode="r:gz") as t:
+			self.assertEqual([m.name for m in t.getmembers()], [f"bkt/{k}" for k in blobs])
+			self.assertEqual(t.extractfile("bkt/files/7.txt").read(), b"body-7")
+
 	def test_stream_bucket_incomplete_discards_partial(self):
 		# an object failing mid-stream -> no rename, partial removed, previous snapshots kept.
 		conn = MagicMock()
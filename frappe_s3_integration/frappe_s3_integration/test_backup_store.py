@@ -0,0 +1,135 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and Contributors
+# See license.txt
+"""Tests for the content-addressed backup store (frappe_s3_integration.backup_store)."""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_s3_integration.frappe_s3_integration import backup, backup_store
+
+
+def _sha(data):
+	return hashlib.sha256(data).hexdigest()
+
+
+class TestBackupStore(FrappeTestCase):
+	def setUp(self):
+		self.d = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.d, ignore_errors=True)
+		self.target = backup_store.LocalTarget(self.d)
+
+	def _conn(self, blobs):
+		conn = MagicMock()
+		conn.s3_settings.get.side_effect = {}.get
+		conn.private_bucket, conn.public_bucket = "prv", None
+		conn.list_objects.side_effect = lambda b: [
+			{"Key": k, "Size": len(v), "ETag": f'"{_sha(v)[:8]}"'} for k, v in blobs.items()]
+		conn.get_file_from_bucket.side_effect = lambda key, bucket: {"Body": io.BytesIO(blobs[key])}
+		return conn
+
+	def _blobs(self):
+		return sorted(n for sub in self.target.listdir("objects") for n in self.target.listdir(f"objects/{sub}"))
+
+	def _snapshot(self, name):
+		with gzip.open(os.path.join(self.d, name), "rt") as f:
+			return [json.loads(line) for line in f][1:]
+
+	def test_snapshots_store_each_content_once(self):
+		blobs = {"files/a.jpg": b"same", "files/copy-of-a.jpg": b"same", "files/b.pdf": b"pdf-1"}
+		conn = self._conn(blobs)
+		backup_store.run_store_backup(conn, self.target, "2026-10-01", keep=7)
+		self.assertEqual(self._blobs(), sorted({_sha(b"same"), _sha(b"pdf-1")}))  # shared once
+
+		blobs["files/b.pdf"] = b"pdf-2"
+		blobs["files/c.png"] = b"same"
+		conn.get_file_from_bucket.reset_mock()
+		backup_store.run_store_backup(conn, self.target, "2026-10-02", keep=7)
+		fetched = sorted(c.args[0] for c in conn.get_file_from_bucket.call_args_list)
+		self.assertEqual(fetched, ["files/b.pdf", "files/c.png"])  # unchanged objects not downloaded
+		self.assertEqual(len(self._blobs()), 3)                    # only pdf-2 is new bytes
+
+		rows = {r[0]: r for r in self._snapshot("prv-2026-10-02.snapshot.jsonl.gz")}
+		for key, data in blobs.items():  # every key restores from its blob
+			with open(os.path.join(self.d, "objects", rows[key][4][:2], rows[key][4]), "rb") as f:
+				self.assertEqual(f.read(), data)
+
+	def test_prune_collects_unreferenced_blobs(self):
+		blobs = {"files/a.jpg": b"keep", "files/b.pdf": b"old"}
+		conn = self._conn(blobs)
+		backup_store.run_store_backup(conn, self.target, "2026-10-01", keep=1)
+		blobs["files/b.pdf"] = b"new"
+		os.makedirs(os.path.join(self.d, "objects", "zz"))
+		open(os.path.join(self.d, "objects", "zz", "zzz.part"), "w").close()  # a killed write
+		backup_store.run_store_backup(conn, self.target, "2026-10-02", keep=1)
+		self.assertEqual(sorted(n for n in os.listdir(self.d) if n != "objects"), ["prv-2026-10-02.snapshot.jsonl.gz"])
+		self.assertEqual(self._blobs(), sorted([_sha(b"keep"), _sha(b"new")]))
+
+	def test_bucket_name_prefix_of_another_bucket(self):
+		# "erp" must never prune (and then garbage-collect) "erp-pub"'s snapshots, or its own
+		# because erp-pub's sort after them.
+		blobs = {"erp": {"files/a.jpg": b"erp-a"}, "erp-pub": {"files/b.jpg": b"pub-b"}}
+		conn = MagicMock()
+		conn.s3_settings.get.side_effect = {}.get
+		conn.private_bucket, conn.public_bucket = "erp", "erp-pub"
+		conn.list_objects.side_effect = lambda b: [
+			{"Key": k, "Size": len(v), "ETag": f'"{_sha(v)[:8]}"'} for k, v in blobs[b].items()]
+		conn.get_file_from_bucket.side_effect = lambda key, bucket: {"Body": io.BytesIO(blobs[bucket][key])}
+		for stamp in ("2026-10-01_01-00-00.000001", "2026-10-02_01-00-00.000001", "2026-10-03_01-00-00.000001"):
+			backup_store.run_store_backup(conn, self.target, stamp, keep=2)
+		snaps = sorted(n for n in os.listdir(self.d) if n != "objects")
+		self.assertEqual(snaps, [f"{b}-2026-10-0{d}_01-00-00.000001.snapshot.jsonl.gz"
+		                         for b in ("erp", "erp-pub") for d in (2, 3)])
+		self.assertEqual(self._blobs(), sorted([_sha(b"erp-a"), _sha(b"pub-b")]))
+
+	def test_unreadable_snapshot_skips_garbage_collection(self):
+		conn = self._conn({"files/a.jpg": b"a"})
+		backup_store.run_store_backup(conn, self.target, "2026-10-01", keep=7)
+		with open(os.path.join(self.d, "pub-2026-10-00.snapshot.jsonl.gz"), "w") as f:
+			f.write("not gzip")
+		os.makedirs(os.path.join(self.d, "objects", "ff"))
+		open(os.path.join(self.d, "objects", "ff", "f" * 64), "w").close()  # unreferenced
+		with patch.object(backup_store.frappe, "log_error") as le:
+			backup_store.run_store_backup(conn, self.target, "2026-10-02", keep=7)
+		self.assertIn("f" * 64, self._blobs())  # can't prove it unused: kept
+		le.assert_called_once()
+
+	def test_failed_fetch_discards_the_snapshot(self):
+		conn = self._conn({"files/a.jpg": b"a"})
+		backup_store.run_store_backup(conn, self.target, "2026-10-01", keep=1)
+		conn.list_objects.side_effect = lambda b: [{"Key": "files/b.jpg", "Size": 1, "ETag": '"x"'}]
+		conn.get_file_from_bucket.side_effect = Exception("S3 down mid-run")
+		with patch.object(backup_store.frappe, "log_error"):
+			backup_store.run_store_backup(conn, self.target, "2026-10-02", keep=1)
+		self.assertEqual(sorted(n for n in os.listdir(self.d) if n != "objects"), ["prv-2026-10-01.snapshot.jsonl.gz"])
+		self.assertEqual(self._blobs(), [_sha(b"a")])  # previous snapshot and its blob intact
+
+	def test_store_mode_routes_local_backup(self):
+		conn = self._conn({"files/a.jpg": b"a"})
+		conn.s3_settings.disable_s3_operations = 0
+		conn.s3_settings.get.side_effect = {
+			"enable_bucket_backup": 1, "backup_directory": self.d, "backup_mode": "Content-Addressed Store",
+		}.get
+		with patch.object(backup, "getS3Connection", return_value=conn), \
+		     patch.object(backup, "_stamp", return_value="2026-10-18_01-00-00.000001"):
+			backup.run_backup_s3_buckets()
+		self.assertEqual(sorted(n for n in os.listdir(self.d) if n != "objects"),
+		                 ["prv-2026-10-18_01-00-00.000001.snapshot.jsonl.gz"])
+		self.assertFalse([n for n in os.listdir(self.d) if n.endswith(".tar.gz")])  # no tarball
+
+	def test_sftp_target_refuses_a_truncated_write(self):
+		sftp = MagicMock()
+		sftp.stat.return_value = MagicMock(st_size=3)
+		target = backup_store.SFTPTarget(sftp, "/backup")
+		f = target.open_part("objects/ab/abc")
+		with self.assertRaises(IOError):
+			target.finish("objects/ab/abc", f, 5)
+		sftp.rename.assert_not_called()
+		self.assertEqual(sftp.open.call_args.args, ("/backup/objects/ab/abc.part", "wb"))
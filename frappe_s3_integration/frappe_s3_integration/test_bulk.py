@@ -0,0 +1,104 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and Contributors
+# See license.txt
+"""Tests for the bulk S3 engine (frappe_s3_integration.s3_core.bulk)."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import frappe
+from botocore.exceptions import ClientError
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_s3_integration.s3_core import bulk
+from frappe_s3_integration.s3_core.bulk import BulkS3, DeleteBatch
+
+
+def _conn(**settings):
+	return frappe._dict(s3_settings=frappe._dict(settings))
+
+
+def _throttled():
+	raise ClientError({"Error": {"Code": "SlowDown"}}, "HeadObject")
+
+
+class TestBulkS3(FrappeTestCase):
+	def test_results_in_order_and_failures_isolated(self):
+		engine = BulkS3(_conn(), concurrency=8)
+		calls = [lambda i=i: (time.sleep(0.01 * (5 - i % 5)), i)[1] for i in range(10)]
+		calls[3] = _throttled
+		out = engine.run(calls)
+		self.assertEqual([r for i, r in enumerate(out) if i != 3], [0, 1, 2, 4, 5, 6, 7, 8, 9])
+		self.assertIsInstance(out[3], ClientError)  # one bad object never aborts the batch
+
+	def test_in_flight_requests_are_bounded(self):
+		lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+		def call():
+			with lock:
+				state["now"] += 1
+				state["peak"] = max(state["peak"], state["now"])
+			time.sleep(0.02)
+			with lock:
+				state["now"] -= 1
+
+		BulkS3(_conn(), concurrency=4).run([call] * 20)
+		self.assertEqual(state["peak"], 4)
+
+	def test_rate_limit_spaces_requests(self):
+		engine = BulkS3(_conn(), concurrency=16, rate=5)
+		start = time.monotonic()
+		engine.run([lambda: None] * 8)  # 5 from the initial burst, then 3 at 5/s
+		self.assertGreaterEqual(time.monotonic() - start, 0.5)
+
+	def test_concurrency_and_rate_from_settings_with_site_config_override(self):
+		conn = _conn(bulk_concurrency=128, bulk_rate_limit=300, max_pool_connections=20)
+		with patch.object(bulk.frappe, "get_conf", return_value={}):
+			engine = BulkS3(conn)
+		self.assertEqual((engine.concurrency, engine.rate), (128, 300))
+		with patch.object(bulk.frappe, "get_conf", return_value={"s3_bulk_concurrency": 256}):
+			self.assertEqual(BulkS3(conn).concurrency, 256)
+		with patch.object(bulk.frappe, "get_conf", return_value={}):
+			self.assertEqual(BulkS3(_conn(max_pool_connections=20)).concurrency, 20)  # pool-sized
+
+	def test_prefetch_yields_every_item_in_order_across_batches(self):
+		def make_call(n):
+			if n == 2:
+				return None  # nothing to fetch for this item
+			if n == 4:
+				raise ValueError("bad row")  # planning failure belongs to the item
+			if n == 5:
+				return _throttled
+			return lambda: n * 10
+
+		with patch.object(bulk, "BATCH_SIZE", 3):
+			rows = list(BulkS3(_conn(), concurrency=4).prefetch(range(7), make_call))
+		self.assertEqual([n for n, _ in rows], list(range(7)))
+		self.assertEqual(rows[0][1](), 0)
+		self.assertIsNone(rows[2][1]())
+		self.assertRaises(ValueError, rows[4][1])
+		self.assertRaises(ClientError, rows[5][1])
+		self.assertEqual(rows[6][1](), 60)
+
+	def test_delete_batch_flushes_per_bucket_when_full(self):
+		conn = MagicMock()
+		conn.delete_files_from_bucket.side_effect = lambda keys, bucket: (
+			{"files/b": "AccessDenied: no"} if "files/b" in keys else {})
+		batch = DeleteBatch(conn, size=2)
+		self.assertEqual(batch.add("one", "files/a"), {})
+		self.assertEqual(batch.add("two", "files/x"), {})
+		self.assertEqual(batch.add("one", "files/b"), {("one", "files/b"): "AccessDenied: no"})
+		conn.delete_files_from_bucket.assert_called_once_with(["files/a", "files/b"], "one")
+		self.assertEqual(batch.flush(), {})
+		conn.delete_files_from_bucket.assert_called_with(["files/x"], "two")
+		self.assertEqual((batch.deleted, batch.failed), (2, 1))
+		self.assertEqual(batch.flush(), {})  # nothing pending: no request
+		self.assertEqual(conn.delete_files_from_bucket.call_count, 2)
+
+	def test_client_pool_covers_bulk_concurrency(self):
+		from frappe_s3_integration.s3_core import S3Connection
+
+		c = S3Connection.__new__(S3Connection)
+		c.s3_settings = frappe._dict(max_pool_connections=20, bulk_concurrency=200)
+		with patch("frappe_s3_integration.s3_core.frappe.get_conf", return_value={}):
+			self.assertEqual(c.client_config().max_pool_connections, 200)
@@ -0,0 +1,122 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and Contributors
+# See license.txt
+"""Tests for S3 Inventory ingestion (frappe_s3_integration.s3_core.inventory)."""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_s3_integration.s3_core import S3Connection
+from frappe_s3_integration.s3_core.inventory import InventoryError, _shape, iter_inventory
+from frappe_s3_integration.s3_core.snapshot import ObjectSnapshot
+
+
+def _gz_csv(*lines):
+	return gzip.compress(("\n".join(lines) + "\n").encode())
+
+
+def _s3(objects):
+	"""A connection whose destination bucket holds `objects` ({key: bytes})."""
+	conn = MagicMock()
+	conn.connection.get_object.side_effect = lambda Bucket, Key: {"Body": io.BytesIO(objects[Key])}
+	conn.list_objects.side_effect = lambda bucket, prefix=None: [
+		{"Key": k} for k in objects if k.startswith(prefix or "")]
+	return conn
+
+
+class TestInventory(FrappeTestCase):
+	def setUp(self):
+		self.tmp = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+	def _file(self, name, data):
+		path = os.path.join(self.tmp, name)
+		with open(path, "wb") as f:
+			f.write(data)
+		return path
+
+	def _manifest(self, created=None, **kw):
+		return json.dumps({
+			"sourceBucket": "bkt", "destinationBucket": "arn:aws:s3:::inv",
+			"fileFormat": "CSV", "fileSchema": "Bucket, Key, Size, ETag, StorageClass, IsDeleteMarker",
+			"creationTimestamp": str(int((created or time.time()) * 1000)),
+			"files": [{"key": "inv/bkt/cfg/data/part-1.csv.gz"}], **kw}).encode()
+
+	def test_newest_s3_manifest_is_streamed_and_decoded(self):
+		conn = _s3({
+			"inv/bkt/cfg/2026-10-16T01-00Z/manifest.json": b"{}",  # older report: never read
+			"inv/bkt/cfg/2026-10-17T01-00Z/manifest.json": self._manifest(),
+			"inv/bkt/cfg/data/part-1.csv.gz": _gz_csv(
+				'"bkt","files/a+b%2Bc.jpg","5","e1","STANDARD","false"',
+				'"bkt","files/gone.jpg","7","e2","STANDARD","true"',
+				'"bkt","private/files/d.pdf","9","e3","GLACIER","false"'),
+		})
+		rows = list(iter_inventory(conn, "s3://inv/inv/bkt/cfg/", bucket="bkt"))
+		self.assertEqual([(r["Key"], r["Size"], r["ETag"], r["StorageClass"]) for r in rows], [
+			("files/a b+c.jpg", 5, "e1", "STANDARD"),  # URL-encoded in CSV reports
+			("private/files/d.pdf", 9, "e3", "GLACIER"),  # the delete marker is dropped
+		])
+		self.assertEqual(len(list(iter_inventory(conn, "s3://inv/inv/bkt/cfg/", prefix="files/"))), 1)
+
+	def test_last_modified_is_an_aware_datetime_for_every_format(self):
+		# inventory rows stand in for listing rows: LastModified must be the same type
+		when = datetime(2026, 10, 17, 1, 0, tzinfo=timezone.utc)
+		csv_row = {"Key": "files/a.jpg", "LastModifiedDate": "2026-10-17T01:00:00.000Z"}
+		parquet_naive = {"Key": "files/a.jpg", "LastModifiedDate": when.replace(tzinfo=None)}
+		parquet_aware = {"Key": "files/a.jpg", "LastModifiedDate": when}
+		for rec in (csv_row, parquet_naive, parquet_aware):
+			self.assertEqual(_shape(rec, False)[0]["LastModified"], when)
+		self.assertIsNone(_shape({"Key": "files/a.jpg", "LastModifiedDate": "junk"}, False)[0]["LastModified"])
+		self.assertIsNone(_shape({"Key": "files/a.jpg"}, False)[0]["LastModified"])
+
+	def test_stale_report_is_refused(self):
+		conn = _s3({"m/manifest.json": self._manifest(created=time.time() - 30 * 86400)})
+		with self.assertRaises(InventoryError):
+			list(iter_inventory(conn, "s3://inv/m/manifest.json"))
+
+	def test_local_csv_with_header_carries_content_type(self):
+		path = self._file("inv.csv", b"Key,Size,ETag,ContentType\nfiles/a.png,5,\"e1\",image/png\n")
+		rows = list(iter_inventory(MagicMock(), path, bucket="bkt"))
+		self.assertEqual(rows[0]["Key"], "files/a.png")
+		self.assertEqual((rows[0]["ETag"], rows[0]["ContentType"]), ("e1", "image/png"))
+
+	def test_local_raw_report_and_manifest_with_local_data(self):
+		self._file("part-1.csv.gz", _gz_csv('"bkt","files/x.jpg","3","e","STANDARD","false"'))
+		manifest = self._file("manifest.json", self._manifest())
+		conn = MagicMock()
+		rows = list(iter_inventory(conn, manifest, bucket="bkt"))
+		self.assertEqual([r["Key"] for r in rows], ["files/x.jpg"])
+		conn.connection.get_object.assert_not_called()  # data file read from beside the manifest
+		raw = self._file("raw.csv.gz", _gz_csv('"bkt","files/y%20z.jpg","4","e","STANDARD"'))
+		self.assertEqual([r["Key"] for r in iter_inventory(conn, raw)], ["files/y z.jpg"])
+
+	def test_iter_objects_falls_back_to_listing(self):
+		c = S3Connection.__new__(S3Connection)
+		c.s3_settings = frappe._dict(s3_bucket_details=[
+			frappe._dict(bucket_name="bkt", inventory_source="/nonexistent/manifest.json")])
+		c.list_objects = MagicMock(return_value=iter([{"Key": "files/live.jpg"}]))
+		with patch("frappe_s3_integration.s3_core.frappe.log_error") as log:
+			self.assertEqual([o["Key"] for o in c.iter_objects("bkt")], ["files/live.jpg"])
+		log.assert_called_once()
+		c.list_objects.reset_mock(return_value=True)
+		c.list_objects.return_value = iter([])
+		list(c.iter_objects("other"))  # no source configured: a plain listing
+		c.list_objects.assert_called_once_with("other", prefix=None)
+
+	def test_snapshot_filled_from_inventory_never_lists(self):
+		conn = MagicMock()
+		conn.verify_object.return_value = "HEAD"
+		with ObjectSnapshot(conn) as snap:
+			snap.load_inventory("bkt", [{"Key": "files/a.jpg", "Size": 5, "ETag": "e1"}])
+			self.assertTrue(snap.verify_object("bkt", "files/a.jpg", expected_size=5))
+			self.assertEqual(snap.verify_object("bkt", "files/new.jpg"), "HEAD")  # after the report
+		conn.list_objects.assert_not_called()
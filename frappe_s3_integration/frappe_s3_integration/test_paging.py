@@ -0,0 +1,55 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and Contributors
+# See license.txt
+"""Tests for keyset pagination over File rows (frappe_s3_integration.s3_core.paging)."""
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_s3_integration.s3_core.paging import iter_files
+
+OPS = {"=": lambda a, b: a == b, ">": lambda a, b: a > b, "in": lambda a, b: a in b}
+
+
+class _Table:
+	"""File rows behind a get_all that honours the filters and ordering iter_files uses."""
+
+	def __init__(self, rows):
+		self.rows = rows
+		self.queries = 0
+
+	def get_all(self, doctype, filters, fields, order_by, limit_page_length):
+		self.queries += 1
+		hits = [r for r in self.rows if all(OPS[op](r[f], v) for f, op, v in filters)]
+		hits.sort(key=lambda r: (r["creation"], r["name"]) if "creation" in order_by else r["name"])
+		return [frappe._dict({f: r[f] for f in fields}) for r in hits[:limit_page_length]]
+
+
+def _rows():
+	# F2..F4 share one creation timestamp (a bulk import): the cursor must not lose any
+	return [dict(name=f"F{i}", creation=c, pending=1)
+	        for i, c in enumerate(["t1", "t2", "t3", "t3", "t3", "t4", "t5"])]
+
+
+class TestIterFiles(FrappeTestCase):
+	def _iter(self, table, **kw):
+		with patch("frappe_s3_integration.s3_core.paging.frappe.get_all", side_effect=table.get_all):
+			yield from iter_files({"pending": 1}, fields=["pending"], page_size=2, **kw)
+
+	def test_pages_in_keyset_order_across_equal_timestamps(self):
+		table = _Table(_rows())
+		self.assertEqual([r.name for r in self._iter(table)], [f"F{i}" for i in range(7)])
+		self.assertLessEqual(table.queries, 8)  # at most two queries per page of two
+
+	def test_rows_leaving_the_filter_are_never_skipped(self):
+		table = _Table(_rows())
+		seen = []
+		for r in self._iter(table):
+			seen.append(r.name)
+			table.rows[int(r.name[1:])]["pending"] = 0  # migrated: no longer a candidate
+		self.assertEqual(seen, [f"F{i}" for i in range(7)])  # limit/offset would skip half
+
+	def test_resumes_after_a_checkpointed_cursor(self):
+		table = _Table(_rows())
+		self.assertEqual([r.name for r in self._iter(table, after=("t3", "F2"))], ["F3", "F4", "F5", "F6"])
@@ -131,7 +131,8 @@ class TestMigrateSafety(FrappeTestCase):
 
 	def test_backfills_missing_content_hash_before_dedup(self):
 		# Sakthi's "doesn't store the hash" gap: a File reaching the sweep with no
-		# content_hash must get one stored (dedup + delete guards depend on it).
+		# content_hash must get one stored (dedup + delete guards depend on it) — with its
+		# pointer, never before the upload: that would move it to another sweep shard.
 		conn = MagicMock()
 		conn.upload_file_to_private_bucket.return_value = {"key": "k", "bucket_name": "b", "content_hash": "h"}
 		conn.verify_object.return_value = True
@@ -144,13 +145,22 @@ class TestMigrateSafety(FrappeTestCase):
 		     patch(f"{PKG}._hash_local_file", return_value="BACKFILLED"), \
 		     patch(f"{PKG}._migrated_sibling", return_value=None), \
 		     patch(f"{PKG}._other_unmigrated_share", return_value=False), \
-		     patch(f"{PKG}._point_doc_at_s3"), \
+		     patch(f"{PKG}.get_proxy_url", return_value="/proxy/F1"), \
+		     patch(f"{PKG}.clear_file_meta"), \
 		     patch(f"{PKG}.frappe.db") as db, \
 		     patch(f"{PKG}.frappe.get_meta"), \
-		     patch(f"{PKG}.os.remove"):
+		     patch(f"{PKG}.os.remove"), \
+		     patch(f"{PKG}._upload_planned") as upload:
+			def uploaded(c, plan, **kw):
+				db.set_value.assert_not_called()  # nothing stored while the upload runs
+				return {"key": "k", "bucket_name": "b"}
+
+			upload.side_effect = uploaded
 			ps.migrate_file_to_s3("F1", conn)
-		db.set_value.assert_any_call("File", "F1", "content_hash", "BACKFILLED", update_modified=False)
 		self.assertEqual(f.content_hash, "BACKFILLED")
+		db.set_value.assert_any_call("File", "F1", {
+			"file_url": "/proxy/F1", "custom_s3_key": "k", "custom_s3_bucket_name": "b",
+			"content_hash": "BACKFILLED"})
 
 
 class TestInvariant2Repoint(FrappeTestCase):
@@ -311,7 +321,7 @@ class TestSweepOrchestrator(FrappeTestCase):
 		conn.s3_settings.disable_s3_operations = 0
 		calls = []
 
-		def fake_migrate(name, c):
+		def fake_migrate(name, c, batch=None):
 			calls.append(name)
 			if name == "F2":
 				raise Exception("boom")
@@ -372,7 +382,7 @@ class TestSweepOrchestrator(FrappeTestCase):
 		conn = MagicMock()
 		conn.s3_settings.disable_s3_operations = 0
 
-		def fake_migrate(name, c):
+		def fake_migrate(name, c, batch=None):
 			raise ps.JobTimeoutException("deadline")
 
 		with patch(f"{PKG}.getS3Connection", return_value=conn), \
@@ -384,3 +394,297 @@ class TestSweepOrchestrator(FrappeTestCase):
 				ps.run_unuploaded_documents_sweep()
 		db.rollback.assert_called_once()   # rolled back the in-flight file
 		le.assert_not_called()             # a timeout is not logged as an upload failure
+
+
+class TestConcurrentSweep(FrappeTestCase):
+	"""Pooled sweep: uploads on threads, every DB write + the durability order on the main thread."""
+
+	def _plan(self, name, content_hash=None, key=None):
+		f = _file(name=name, content_hash=content_hash or f"h-{name}")
+		return frappe._dict(file=f, local_path=f"/tmp/{name}", local_size=5,
+		                    s3_key=key or f"private/files/{name}", bucket="b", content_type="image/png")
+
+	def _sweep(self, plans, upload=None, workers=4):
+		events = []
+		prepared = []
+
+		def prepare(name, conn):
+			prepared.append(name)
+			return plans.get(name)
+
+		def finish(plan, resp):
+			events.append(("finish", plan.file.name, resp["key"]))
+
+		with patch(f"{PKG}._prepare_migration", side_effect=prepare), \
+		     patch(f"{PKG}._upload_planned",
+		           side_effect=upload or (lambda c, p, t: {"key": p.s3_key, "bucket_name": "b"})) as up, \
+		     patch(f"{PKG}._finish_migration", side_effect=finish), \
+		     patch(f"{PKG}.frappe.db") as db, \
+		     patch(f"{PKG}.frappe.log_error") as le:
+			ps._sweep_concurrently(list(plans), MagicMock(), workers)
+		return events, prepared, up, db, le
+
+	def test_every_planned_file_is_uploaded_threaded_and_finished(self):
+		plans = {n: self._plan(n) for n in ("F1", "F2", "F3")}
+		events, _prepared, up, _db, le = self._sweep(plans)
+		self.assertEqual(sorted(e[1] for e in events), ["F1", "F2", "F3"])
+		self.assertTrue(all(c.args[2] is True for c in up.call_args_list))   # threaded=True
+		le.assert_not_called()
+
+	def test_settled_files_are_not_uploaded(self):
+		# prepare returning None = already migrated / deduped / skipped -> nothing to upload.
+		plans = {"F1": None, "F2": self._plan("F2")}
+		events, _prepared, up, _db, _le = self._sweep(plans)
+		self.assertEqual([e[1] for e in events], ["F2"])
+		self.assertEqual(up.call_count, 1)
+
+	def test_shared_blob_is_held_until_first_upload_finishes(self):
+		# Two Files with the same blob must not upload it twice: the second is held, then
+		# re-prepared (where it would dedup onto the now-migrated sibling).
+		plans = {"F1": self._plan("F1", content_hash="same"),
+		         "F2": self._plan("F2", content_hash="same", key="private/files/F2")}
+		events, prepared, up, _db, _le = self._sweep(plans)
+		self.assertEqual(prepared.count("F2"), 2)            # held once, re-prepared after F1
+		self.assertEqual(prepared.index("F1"), 0)
+		self.assertEqual(up.call_count, 2)
+		self.assertEqual([e[1] for e in events], ["F1", "F2"])
+
+	def test_same_target_key_is_never_uploaded_concurrently(self):
+		plans = {"F1": self._plan("F1", key="private/files/x.pdf"),
+		         "F2": self._plan("F2", key="private/files/x.pdf")}
+		events, prepared, _up, _db, _le = self._sweep(plans)
+		self.assertEqual(prepared.count("F2"), 2)
+		self.assertEqual([e[1] for e in events], ["F1", "F2"])
+
+	def test_failed_upload_is_rolled_back_logged_and_never_finished(self):
+		def upload(conn, plan, threaded):
+			if plan.file.name == "F2":
+				raise Exception("S3 object verification failed")
+			return {"key": plan.s3_key, "bucket_name": "b"}
+
+		plans = {n: self._plan(n) for n in ("F1", "F2", "F3")}
+		events, _prepared, _up, db, le = self._sweep(plans, upload=upload)
+		self.assertEqual(sorted(e[1] for e in events), ["F1", "F3"])   # F2 never committed/removed
+		db.rollback.assert_called_once()
+		le.assert_called_once()
+
+	def test_job_timeout_propagates(self):
+		def upload(conn, plan, threaded):
+			raise ps.JobTimeoutException("deadline")
+
+		with self.assertRaises(ps.JobTimeoutException):
+			self._sweep({"F1": self._plan("F1")}, upload=upload)
+
+	def test_upload_planned_threaded_uses_raising_put_file(self):
+		conn = MagicMock()
+		conn.put_file.return_value = {"key": "private/files/F1", "bucket_name": "b", "content_hash": "h"}
+		conn.verify_object.return_value = True
+		plan = self._plan("F1")
+		with patch(f"{PKG}.open", return_value=io.BytesIO(b"12345")):
+			resp = ps._upload_planned(conn, plan, threaded=True)
+		self.assertEqual(resp["key"], "private/files/F1")
+		conn.put_file.assert_called_once()
+		self.assertEqual(conn.put_file.call_args.args[1], "b")
+		conn.upload_file_to_private_bucket.assert_not_called()     # logs via frappe.db — not on a thread
+		conn.verify_object.assert_called_once_with("b", "private/files/F1", expected_size=5)
+
+	def test_sweep_uses_pool_when_workers_configured(self):
+		swept = []
+		conn = MagicMock()
+		conn.s3_settings.disable_s3_operations = 0
+		with patch(f"{PKG}.getS3Connection", return_value=conn), \
+		     patch(f"{PKG}.frappe.get_all", return_value=[frappe._dict(name="F1")]), \
+		     patch(f"{PKG}._sweep_workers", return_value=4), \
+		     patch(f"{PKG}._sweep_concurrently",
+		           side_effect=lambda names, *args: swept.append((list(names), *args[:2]))) as sc, \
+		     patch(f"{PKG}.migrate_file_to_s3") as mig, \
+		     patch(f"{PKG}.frappe.clear_cache"):
+			ps.run_unuploaded_documents_sweep()
+		sc.assert_called_once()
+		self.assertEqual(swept, [(["F1"], conn, 4)])  # names are streamed, not listed up front
+		mig.assert_not_called()
+
+	def test_sweep_workers_site_config_overrides_and_clamps(self):
+		with patch(f"{PKG}.frappe.db.get_single_value", return_value=3):
+			self.assertEqual(ps._sweep_workers({}), 3)                       # from settings
+			self.assertEqual(ps._sweep_workers({"s3_sweep_workers": 6}), 6)  # site_config wins
+			self.assertEqual(ps._sweep_workers({"s3_sweep_workers": 500}), ps.SWEEP_WORKERS_CAP)
+		with patch(f"{PKG}.frappe.db.get_single_value", return_value=None):
+			self.assertEqual(ps._sweep_workers({}), 1)                       # unset -> serial
+
+	def test_sweep_timeout_count_bound_shrinks_with_workers(self):
+		def compute(workers):
+			with patch(f"{PKG}.frappe.get_conf", return_value={}), \
+			     patch(f"{PKG}._sweep_workers", return_value=workers), \
+			     patch(f"{PKG}._pending_migration_stats", return_value=(0, 40000)):
+				return ps._sweep_timeout()
+		self.assertLess(compute(8), compute(1))
+
+
+class TestShardedSweep(FrappeTestCase):
+	"""N independent sweep jobs over disjoint, content-keyed slices of the backlog."""
+
+	def test_hashless_shard_is_stable_and_keyed_on_url(self):
+		rows = [frappe._dict(file_url=f"/private/files/f{i}.pdf", content_hash=None) for i in range(200)]
+		first = [ps._shard_of(r, 4) for r in rows]
+		self.assertEqual(first, [ps._shard_of(r, 4) for r in rows])   # deterministic
+		self.assertEqual(set(first), {0, 1, 2, 3})                     # every shard gets work
+		self.assertEqual(ps._shard_of(frappe._dict(file_url="/files/x.png", content_hash="h"), 1), 0)
+
+	def test_same_content_under_different_urls_shares_a_shard(self):
+		# One blob uploaded as a.pdf and copy-of-a.pdf: one shard dedups it, never two.
+		for i in range(50):
+			a = frappe._dict(file_url=f"/private/files/a{i}.pdf", content_hash=f"h{i}")
+			b = frappe._dict(file_url=f"/private/files/copy-{i}.pdf", content_hash=f"h{i}")
+			self.assertEqual(ps._shard_of(a, 4), ps._shard_of(b, 4))
+
+	def test_entry_enqueues_one_deduplicated_job_per_shard(self):
+		with patch(f"{PKG}.frappe.has_permission", return_value=True), \
+		     patch(f"{PKG}._sweep_shards", return_value=3), \
+		     patch(f"{PKG}._claim_sweep_layout", return_value=True), \
+		     patch(f"{PKG}._pending_stats_by_shard", return_value=[(0, 1), (0, 2), (0, 3)]), \
+		     patch(f"{PKG}._sweep_timeout", side_effect=lambda stats=None: 100 + stats[1]), \
+		     patch(f"{PKG}._SweepProgress"), \
+		     patch(f"{PKG}.frappe.enqueue") as enq:
+			ps.process_unuploaded_documents()
+		self.assertEqual(enq.call_count, 3)
+		kwargs = [c.kwargs for c in enq.call_args_list]
+		self.assertEqual([k["shard"] for k in kwargs], [0, 1, 2])
+		self.assertEqual({k["shards"] for k in kwargs}, {3})
+		self.assertEqual([k["timeout"] for k in kwargs], [101, 102, 103])   # sized per shard
+		self.assertEqual(len({k["job_id"] for k in kwargs}), 3)               # distinct dedup ids
+		self.assertTrue(all(k["deduplicate"] for k in kwargs))
+
+	def test_sweep_progress_is_json_serializable(self):
+		# RedisWrapper.hgetall returns bytes field names; the whitelisted method returns JSON.
+		import json
+
+		cache = MagicMock()
+		cache.hgetall.return_value = {b"0": {"shards": 2, "status": "running"}, b"1": {"shards": 2}}
+		with patch(f"{PKG}.frappe.cache", return_value=cache):
+			progress = ps._read_sweep_progress()
+		self.assertEqual(json.loads(json.dumps(progress))["0"]["status"], "running")
+		self.assertEqual(sorted(progress), ["0", "1"])
+
+	def test_layout_change_waits_for_previous_jobs(self):
+		old = {"0": {"shards": 2, "job_id": "old-0"}, "1": {"shards": 2, "job_id": "old-1"}}
+		with patch(f"{PKG}._read_sweep_progress", return_value=old), \
+		     patch("frappe.utils.background_jobs.is_job_enqueued", side_effect=lambda j: j == "old-1"), \
+		     patch(f"{PKG}.frappe.log_error") as le:
+			self.assertFalse(ps._claim_sweep_layout(4))
+		le.assert_called_once()
+
+	def test_sweep_only_touches_its_own_shard(self):
+		conn = MagicMock()
+		conn.s3_settings.disable_s3_operations = 0
+		rows = [frappe._dict(name=f"F{i}", file_url=f"/files/f{i}.png", content_hash=f"h{i % 7}")
+		        for i in range(40)]
+		seen = []
+		with patch(f"{PKG}.getS3Connection", return_value=conn), \
+		     patch(f"{PKG}.frappe.get_all", return_value=rows), \
+		     patch(f"{PKG}._sweep_workers", return_value=1), \
+		     patch(f"{PKG}._SweepProgress"), \
+		     patch(f"{PKG}.migrate_file_to_s3", side_effect=lambda name, c, batch=None: seen.append(name)), \
+		     patch(f"{PKG}.frappe.clear_cache"):
+			ps.run_unuploaded_documents_sweep(shard=1, shards=3)
+		expected = [r.name for r in rows if ps._shard_of(r, 3) == 1]
+		self.assertTrue(expected)
+		self.assertEqual(seen, expected)
+
+
+class TestGroupCommit(FrappeTestCase):
+	"""Group-commit sweep: one multi-row UPDATE per batch, local copies removed only after it commits."""
+
+	def _plan(self, name, content_hash=None):
+		f = _file(name=name, file_name=f"{name}.png", content_hash=content_hash or f"h-{name}")
+		return frappe._dict(file=f, local_path=f"/tmp/{name}", local_size=5,
+		                    s3_key=f"private/files/{name}.png", bucket="b", content_type="image/png")
+
+	def _flush(self, plans, sql_error=None, failed_repoints=()):
+		order = MagicMock()
+		order.sql.side_effect = sql_error
+
+		def repoint(f, commit):
+			order.repoint(f.name, commit)
+			return f.name not in failed_repoints
+
+		with patch(f"{PKG}.frappe.db", order), \
+		     patch(f"{PKG}.get_proxy_url", side_effect=lambda n, fn: f"/proxy/{n}"), \
+		     patch(f"{PKG}.clear_file_meta"), \
+		     patch(f"{PKG}.frappe.log_error") as le, \
+		     patch(f"{PKG}._repoint_attached", side_effect=repoint), \
+		     patch(f"{PKG}._maybe_remove_local", side_effect=lambda f, p: order.remove(p)):
+			progress = MagicMock()
+			batch = ps._PointerBatch(len(plans), progress)
+			for plan in plans:
+				batch.add(plan, {"key": plan.s3_key, "bucket_name": "b"})
+		return order, progress, le
+
+	def test_batch_is_one_update_committed_before_any_local_is_removed(self):
+		order, progress, _le = self._flush([self._plan("F1"), self._plan("F2")])
+		names = [c[0] for c in order.mock_calls]
+		self.assertEqual(names.count("sql"), 1)
+		self.assertEqual(names, ["sql", "commit", "savepoint", "repoint", "savepoint", "repoint", "commit",
+		                         "remove", "remove"])
+		query, params = order.sql.call_args.args
+		self.assertTrue(query.startswith("UPDATE `tabFile` SET `file_url` = CASE `name`"))
+		self.assertIn("F1", params)
+		self.assertIn("private/files/F2.png", params)
+		self.assertIn("h-F2", params)  # a backfilled hash is written with its pointer
+		self.assertEqual(order.repoint.call_args.args, ("F2", False))
+		progress.ok.assert_called_once_with(2)
+
+	def test_failed_repoint_rolls_back_to_its_savepoint_and_keeps_its_local_copy(self):
+		# F1's attach field may still hold /private/files/F1.png: its local file must stay.
+		order, progress, _le = self._flush([self._plan("F1"), self._plan("F2")], failed_repoints={"F1"})
+		order.rollback.assert_called_once_with(save_point="s3_repoint")
+		self.assertEqual([c.args for c in order.remove.call_args_list], [("/tmp/F2",)])
+		names = [c[0] for c in order.mock_calls]
+		self.assertEqual(names, ["sql", "commit", "savepoint", "repoint", "rollback", "savepoint", "repoint",
+		                         "commit", "remove"])
+		progress.ok.assert_called_once_with(2)  # both pointers are durable
+
+	def test_unattached_file_is_freed_by_the_real_repoint(self):
+		# Most Files attach to nothing: "nothing to repoint" must not read as a failure.
+		plan = self._plan("F1")
+		db = MagicMock()
+		with patch(f"{PKG}.frappe.db", db), \
+		     patch(f"{PKG}.clear_file_meta"), \
+		     patch(f"{PKG}.frappe.log_error"), \
+		     patch(f"{PKG}._maybe_remove_local") as remove:
+			ps._PointerBatch(1).add(plan, {"key": plan.s3_key, "bucket_name": "b"})
+		db.rollback.assert_not_called()
+		remove.assert_called_once_with(plan.file, "/tmp/F1")
+
+	def test_failed_batch_rolls_back_and_keeps_every_local_copy(self):
+		order, progress, le = self._flush([self._plan("F1"), self._plan("F2")], sql_error=Exception("deadlock"))
+		order.rollback.assert_called_once()
+		order.remove.assert_not_called()
+		order.commit.assert_not_called()
+		le.assert_called_once()
+		progress.failed.assert_called_once_with(2)
+
+	def test_queued_sibling_is_committed_before_a_file_sharing_its_blob(self):
+		# F2 shares F1's blob while F1's pointer is still queued: flush F1, then re-prepare
+		# F2 (where it would dedup onto F1) instead of uploading the bytes again.
+		batch = ps._PointerBatch(100)
+		batch.add(self._plan("F1", content_hash="same"), {"key": "private/files/F1.png", "bucket_name": "b"})
+		with patch(f"{PKG}._prepare_migration",
+		           side_effect=[self._plan("F2", content_hash="same"), None]) as prep, \
+		     patch.object(batch, "flush", wraps=batch.flush) as flush, \
+		     patch(f"{PKG}._point_docs_at_s3"), \
+		     patch(f"{PKG}._maybe_remove_local"), \
+		     patch(f"{PKG}._upload_planned") as up, \
+		     patch(f"{PKG}.frappe.db"):
+			self.assertFalse(ps.migrate_file_to_s3("F2", MagicMock(), batch))
+		flush.assert_called_once()
+		self.assertEqual(prep.call_count, 2)
+		up.assert_not_called()
+
+	def test_commit_batch_site_config_overrides_and_clamps(self):
+		with patch(f"{PKG}.frappe.db.get_single_value", return_value=200):
+			self.assertEqual(ps._sweep_commit_batch({}), 200)
+			self.assertEqual(ps._sweep_commit_batch({"s3_sweep_commit_batch": 50}), 50)
+			self.assertEqual(ps._sweep_commit_batch({"s3_sweep_commit_batch": 10 ** 6}), ps.SWEEP_COMMIT_BATCH_CAP)
+		with patch(f"{PKG}.frappe.db.get_single_value", return_value=None):
+			self.assertEqual(ps._sweep_commit_batch({}), 1)  # unset -> a commit per file
@@ -2,12 +2,14 @@
 # See license.txt
 """Data-safety + behaviour tests for frappe_s3_integration.s3_normalize."""
 
+from functools import partial
 from unittest.mock import MagicMock, patch
 
 import frappe
 from frappe.tests.utils import FrappeTestCase
 
 from frappe_s3_integration import s3_normalize as norm
+from frappe_s3_integration.s3_core import S3Connection
 
 PMOD = "frappe_s3_integration.s3_normalize"
 
@@ -21,9 +23,19 @@ def _file(**kw):
 
 
 class TestS3Normalize(FrappeTestCase):
-	def _run(self, files, conn, local_exists=False, local_size=5, disabled=0, dry_run=0):
-		conn._unique_key = MagicMock(side_effect=lambda b, k: k)  # no collision suffix
+	def setUp(self):
+		# MagicMock connections script their S3 replies as ordered side_effect lists, so
+		# run the bulk engine inline here; test_bulk covers its concurrency.
+		for name, value in (("bulk_concurrency", 1), ("bulk_rate_limit", 0)):
+			patcher = patch(f"frappe_s3_integration.s3_core.bulk.{name}", return_value=value)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def _run(self, files, conn, local_exists=False, local_size=5, disabled=0, dry_run=0, unique_key=None):
+		# no collision suffix unless a test supplies the real guard
+		conn._unique_key = unique_key or MagicMock(side_effect=lambda b, k, probe=False: k)
 		with patch(f"{PMOD}.frappe.db.get_table_columns", return_value=["custom_s3_key"]), \
+		     patch(f"{PMOD}.frappe.db.count", return_value=len(files)), \
 		     patch(f"{PMOD}.frappe.db.get_single_value", return_value=disabled), \
 		     patch("frappe_s3_integration.s3_core.getS3Connection", return_value=conn), \
 		     patch("frappe_s3_integration.s3_core.get_proxy_url",
@@ -48,7 +60,7 @@ class TestS3Normalize(FrappeTestCase):
 		self.assertEqual(args["Key"], "private/files/a.jpg")
 		self.assertEqual(args["CopySource"], {"Bucket": "bkt", "Key": "uploads/uuid1/a.jpg"})
 		self.assertEqual(setv.call_args.args[2]["custom_s3_key"], "private/files/a.jpg")
-		conn.delete_file_from_bucket.assert_called_once_with("uploads/uuid1/a.jpg", "bkt")
+		conn.delete_files_from_bucket.assert_called_once_with(["uploads/uuid1/a.jpg"], "bkt")
 
 	def test_public_file_goes_to_files_prefix(self):
 		conn = MagicMock()
@@ -79,17 +91,31 @@ class TestS3Normalize(FrappeTestCase):
 		b = _file(name="F2", file_name="a.jpg", custom_s3_key="uploads/uuid1/a.jpg")
 		setv, rm = self._run([a, b], conn)
 		conn.connection.copy_object.assert_called_once()
-		conn.delete_file_from_bucket.assert_called_once_with("uploads/uuid1/a.jpg", "bkt")
+		conn.delete_files_from_bucket.assert_called_once_with(["uploads/uuid1/a.jpg"], "bkt")
 		repointed = {c.args[1]: c.args[2]["custom_s3_key"] for c in setv.call_args_list}
 		self.assertEqual(repointed, {"F1": "private/files/a.jpg", "F2": "private/files/a.jpg"})
 
 	# ---- never-in-neither-place --------------------------------------------------------
+	def test_existing_target_key_is_never_overwritten(self):
+		# copy_object can't be conditional: the target must be HEAD-probed, so an object
+		# the key index hasn't seen at private/files/a.jpg gets a suffixed key instead.
+		conn = MagicMock()
+		present = {"uploads/uuid1/a.jpg", "private/files/a.jpg"}
+		conn.verify_object.side_effect = lambda b, k: k in present
+		conn.connection.copy_object.side_effect = lambda **kw: present.add(kw["Key"])
+		conn._key_taken = partial(S3Connection._key_taken, conn)
+		setv, rm = self._run([_file(custom_s3_bucket_name="bkt-normalize-probe")], conn,
+		                     unique_key=partial(S3Connection._unique_key, conn))
+		new_key = conn.connection.copy_object.call_args.kwargs["Key"]
+		self.assertRegex(new_key, r"^private/files/a[0-9a-f]{6}\.jpg$")
+		self.assertEqual(setv.call_args.args[2]["custom_s3_key"], new_key)
+
 	def test_copy_verify_failure_keeps_old_and_skips_update(self):
 		conn = MagicMock()
 		conn.verify_object.side_effect = [True, False]  # source ok, copy NOT verified
 		setv, rm = self._run([_file()], conn)
 		setv.assert_not_called()
-		conn.delete_file_from_bucket.assert_not_called()
+		conn.delete_files_from_bucket.assert_not_called()
 
 	def test_source_missing_is_skipped_safely(self):
 		conn = MagicMock()
@@ -97,7 +123,7 @@ class TestS3Normalize(FrappeTestCase):
 		setv, rm = self._run([_file()], conn)
 		conn.connection.copy_object.assert_not_called()
 		setv.assert_not_called()
-		conn.delete_file_from_bucket.assert_not_called()
+		conn.delete_files_from_bucket.assert_not_called()
 
 	def test_correctly_keyed_file_is_left_completely_untouched(self):
 		# "only those like that": a key already under files/ is skipped entirely.
@@ -105,7 +131,7 @@ class TestS3Normalize(FrappeTestCase):
 		conn.verify_object.return_value = True
 		setv, rm = self._run([_file(custom_s3_key="private/files/a.jpg")], conn, local_exists=True)
 		conn.connection.copy_object.assert_not_called()
-		conn.delete_file_from_bucket.assert_not_called()
+		conn.delete_files_from_bucket.assert_not_called()
 		setv.assert_not_called()
 		rm.assert_not_called()
 
@@ -127,7 +153,7 @@ class TestS3Normalize(FrappeTestCase):
 		conn.verify_object.return_value = True
 		setv, rm = self._run([_file()], conn, local_exists=True, dry_run=1)
 		conn.connection.copy_object.assert_not_called()
-		conn.delete_file_from_bucket.assert_not_called()
+		conn.delete_files_from_bucket.assert_not_called()
 		setv.assert_not_called()
 		rm.assert_not_called()
 
@@ -164,6 +190,7 @@ class TestS3Normalize(FrappeTestCase):
 	# ---- local-copy cleanup sweep ------------------------------------------------------
 	def _run_cleanup(self, files, conn, local_exists=False, local_size=5, disabled=0, dry_run=0):
 		with patch(f"{PMOD}.frappe.db.get_table_columns", return_value=["custom_s3_key"]), \
+		     patch(f"{PMOD}.frappe.db.count", return_value=len(files)), \
 		     patch(f"{PMOD}.frappe.db.get_single_value", return_value=disabled), \
 		     patch("frappe_s3_integration.s3_core.getS3Connection", return_value=conn), \
 		     patch(f"{PMOD}.frappe.get_all", return_value=files), \
@@ -200,6 +227,34 @@ class TestS3Normalize(FrappeTestCase):
 		rm.assert_not_called()
 		conn.verify_object.assert_not_called()  # no S3 call when there's no local file
 
+	def test_local_cleanup_verifies_large_runs_from_one_listing(self):
+		conn = MagicMock()
+		conn.list_objects.return_value = [{"Key": "files/a.jpg", "Size": 5}, {"Key": "files/b.jpg", "Size": 5}]
+		conn.verify_object.return_value = False  # a HEAD would keep the local copy
+		conn.inventory_source_for.return_value = None
+		files = [_file(name="F1", custom_s3_key="files/a.jpg"), _file(name="F2", custom_s3_key="files/b.jpg"),
+		         _file(name="F3", custom_s3_key="files/gone.jpg")]
+		with patch(f"{PMOD}.LISTING_VERIFY_MIN", 2), patch(f"{PMOD}.frappe.conf", {}):
+			rm = self._run_cleanup(files, conn, local_exists=True, local_size=5)
+		self.assertEqual(rm.call_count, 2)  # the two listed objects, no HEADs for them
+		conn.list_objects.assert_called_once_with("bkt", prefix="files/")
+		conn.verify_object.assert_called_once_with("bkt", "files/gone.jpg", expected_size=5)
+
+	def test_local_cleanup_never_trusts_an_inventory_report(self):
+		# The report can list an object deleted since: a local delete needs a listing or HEAD.
+		conn = MagicMock()
+		conn.list_objects.return_value = []  # a.jpg is gone from the bucket
+		conn.verify_object.return_value = False
+		conn.inventory_source_for.return_value = "s3://inv/bkt/manifest.json"
+		conn.s3_settings.get.return_value = [{"bucket_name": "bkt"}]
+		files = [_file(name="F1", custom_s3_key="files/a.jpg"), _file(name="F2", custom_s3_key="files/b.jpg")]
+		with patch(f"{PMOD}.LISTING_VERIFY_MIN", 2), patch(f"{PMOD}.frappe.conf", {}), \
+		     patch("frappe_s3_integration.s3_core.inventory.iter_inventory",
+		           return_value=[{"Key": "files/a.jpg", "Size": 5}, {"Key": "files/b.jpg", "Size": 5}]) as inv:
+			rm = self._run_cleanup(files, conn, local_exists=True, local_size=5)
+		rm.assert_not_called()
+		inv.assert_not_called()
+
 	def test_enqueue_local_cleanup_queues_long_with_sized_timeout(self):
 		with patch(f"{PMOD}._s3_backed_count", return_value=500), \
 		     patch(f"{PMOD}.frappe.conf", {}), \
@@ -355,10 +410,16 @@ class TestS3Normalize(FrappeTestCase):
 		self.assertEqual(out["queued"], 0)
 
 	# ---- sibling sync (same file uploaded -> all File docs point to S3) ------------------
-	def _run_sibling_sync(self, files, twin, verify=True, disabled=0, dry_run=0, local_here=False):
+	def _run_sibling_sync(self, files, twin, verify=True, disabled=0, dry_run=0, local_here=False,
+	                      current=None, twin_owned=True):
 		conn = MagicMock()
 		conn.verify_object.return_value = verify
+		# the write-time re-check: by default nothing moved since the twin lookup
+		rows = {f.name: frappe._dict(file_url=f.file_url, custom_s3_key="") for f in files}
+		rows.update(current or {})
 		with patch(f"{PMOD}.frappe.db.get_table_columns", return_value=["custom_s3_key"]), \
+		     patch(f"{PMOD}.frappe.db.get_value", side_effect=lambda dt, name, *a, **kw: rows.get(name)), \
+		     patch(f"{PMOD}.frappe.db.exists", return_value=twin_owned) as exists, \
 		     patch(f"{PMOD}.frappe.db.get_single_value", return_value=disabled), \
 		     patch("frappe_s3_integration.s3_core.getS3Connection", return_value=conn), \
 		     patch(f"{PMOD}.frappe.get_all", return_value=files), \
@@ -373,6 +434,7 @@ class TestS3Normalize(FrappeTestCase):
 		     patch(f"{PMOD}.frappe.clear_cache") as cc, \
 		     patch(f"{PMOD}.frappe.log_error"):
 			norm._sync_s3_siblings(dry_run=dry_run)
+		self.exists = exists
 		return conn, setv, rep, cc
 
 	def test_sibling_sync_points_straggler_at_twin(self):
@@ -391,6 +453,24 @@ class TestS3Normalize(FrappeTestCase):
 		}, update_modified=False)
 		rep.assert_called_once_with(f, "PROXY:S1", expected="/private/files/a.png")
 		cc.assert_called_once()  # refresh caches (a synced Single would otherwise serve stale)
+		self.assertEqual(self.exists.call_args.args[1]["custom_s3_key"], "private/files/a.png")
+
+	def test_sibling_sync_rechecks_the_twin_at_write_time(self):
+		# The twin was found a batch ahead; it has since been re-keyed / deleted.
+		f = _file(name="S1", file_url="/private/files/a.png", custom_s3_key="")
+		f.content_hash = "h1"
+		twin = frappe._dict(custom_s3_key="private/files/a.png", custom_s3_bucket_name="bkt")
+		conn, setv, rep, cc = self._run_sibling_sync([f], twin, twin_owned=False)
+		setv.assert_not_called()
+		rep.assert_not_called()
+
+	def test_sibling_sync_skips_a_straggler_migrated_since_the_lookup(self):
+		f = _file(name="S1", file_url="/private/files/a.png", custom_s3_key="")
+		f.content_hash = "h1"
+		twin = frappe._dict(custom_s3_key="private/files/a.png", custom_s3_bucket_name="bkt")
+		moved = {"S1": frappe._dict(file_url="PROXY:S1", custom_s3_key="private/files/a1.png")}
+		conn, setv, rep, cc = self._run_sibling_sync([f], twin, current=moved)
+		setv.assert_not_called()
 
 	def test_sibling_sync_hashes_local_bytes_before_matching(self):
 		# a hashless straggler with local bytes: hash from its OWN bytes (stored), then match.
@@ -401,6 +481,8 @@ class TestS3Normalize(FrappeTestCase):
 		conn = MagicMock(); conn.verify_object.return_value = True
 		with patch(f"{PMOD}.frappe.db.get_table_columns", return_value=["custom_s3_key"]), \
 		     patch(f"{PMOD}.frappe.db.get_single_value", return_value=0), \
+		     patch(f"{PMOD}.frappe.db.get_value", return_value=frappe._dict(file_url=f.file_url, custom_s3_key="")), \
+		     patch(f"{PMOD}.frappe.db.exists", return_value=True), \
 		     patch("frappe_s3_integration.s3_core.getS3Connection", return_value=conn), \
 		     patch(f"{PMOD}.frappe.get_all", return_value=[f]), \
 		     patch(f"{PMOD}._migrated_twin", return_value=twin), \
@@ -578,6 +660,7 @@ class TestS3Normalize(FrappeTestCase):
 	                       disabled=0, dry_run=0):
 		import io
 		with patch(f"{PMOD}.frappe.db.get_table_columns", return_value=["custom_s3_key"]), \
+		     patch(f"{PMOD}.frappe.db.count", return_value=len(files)), \
 		     patch(f"{PMOD}.frappe.db.get_single_value", return_value=disabled), \
 		     patch("frappe_s3_integration.s3_core.getS3Connection", return_value=conn), \
 		     patch(f"{PMOD}.frappe.get_all", return_value=files), \
@@ -676,6 +759,70 @@ class TestS3Normalize(FrappeTestCase):
 		enq.assert_not_called()
 		self.assertEqual(out["queued"], 0)
 
+	# ---- S3 orphan purge ------------------------------------------------------------------
+	def _purge(self, objects, dry_run=0, heads=None):
+		from datetime import datetime, timedelta, timezone
+
+		old = datetime.now(timezone.utc) - timedelta(days=30)
+		conn = MagicMock(private_bucket="bkt", public_bucket="bkt")
+		conn.iter_objects.return_value = [
+			{"Key": k, "Size": 10, "ETag": '"e1"', "LastModified": old if age == "old" else datetime.now(timezone.utc)}
+			for k, age in objects]
+		# the HEAD right before the delete sees what was listed, unless a test says otherwise
+		listed = {o["Key"]: o for o in conn.iter_objects.return_value}
+		heads = heads or {}
+
+		def head_object(Bucket, Key):
+			head = heads.get(Key, listed[Key])
+			if isinstance(head, Exception):
+				raise head
+			return head
+
+		conn.connection.head_object.side_effect = head_object
+		conn.delete_files_from_bucket.return_value = {}
+
+		def get_all(doctype, filters=None, fields=None, pluck=None, **kw):
+			if pluck:  # the re-check right before queueing: a File took this key meanwhile
+				return [k for k in filters["custom_s3_key"][1] if k == "files/relinked.jpg"]
+			return [frappe._dict(custom_s3_key="files/owned.jpg")]
+
+		with patch(f"{PMOD}.frappe.db.get_table_columns", return_value=["custom_s3_key"]), \
+		     patch(f"{PMOD}.frappe.db.get_single_value", return_value=0), \
+		     patch("frappe_s3_integration.s3_core.getS3Connection", return_value=conn), \
+		     patch(f"{PMOD}.frappe.get_all", side_effect=get_all), \
+		     patch(f"{PMOD}.frappe.log_error"):
+			norm._purge_s3_orphans(dry_run=dry_run)
+		return conn
+
+	def test_s3_orphan_purge_deletes_only_old_unreferenced_frappe_keys(self):
+		conn = self._purge([
+			("files/owned.jpg", "old"), ("files/orphan.jpg", "old"), ("private/files/o.pdf", "old"),
+			("files/fresh.jpg", "new"), ("files/relinked.jpg", "old"), ("backups/site.tar", "old"),
+		])
+		conn.delete_files_from_bucket.assert_called_once_with(["files/orphan.jpg", "private/files/o.pdf"], "bkt")
+		conn.iter_objects.assert_called_once_with("bkt")  # a shared bucket is swept once
+
+	def test_s3_orphan_purge_heads_each_object_right_before_deleting(self):
+		# The listing may be an inventory report: a key deleted or re-uploaded since is kept.
+		from datetime import datetime, timezone
+
+		from botocore.exceptions import ClientError
+
+		conn = self._purge(
+			[("files/orphan.jpg", "old"), ("files/gone.jpg", "old"), ("files/reuploaded.jpg", "old"),
+			 ("files/flaky.jpg", "old")],
+			heads={
+				"files/gone.jpg": ClientError({"Error": {"Code": "404"}}, "HeadObject"),
+				"files/reuploaded.jpg": {"ETag": '"e2"', "LastModified": datetime.now(timezone.utc)},
+				"files/flaky.jpg": ClientError({"Error": {"Code": "503"}}, "HeadObject"),
+			})
+		conn.delete_files_from_bucket.assert_called_once_with(["files/orphan.jpg"], "bkt")
+		self.assertEqual(conn.connection.head_object.call_count, 4)
+
+	def test_s3_orphan_purge_dry_run_deletes_nothing(self):
+		conn = self._purge([("files/orphan.jpg", "old")], dry_run=1)
+		conn.delete_files_from_bucket.assert_not_called()
+
 	# ---- orphan forensics (read-only) ---------------------------------------------------
 	def test_age_bucket_boundaries(self):
 		self.assertEqual(norm._age_bucket(0.5), "<1d")
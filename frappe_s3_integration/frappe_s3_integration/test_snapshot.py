@@ -0,0 +1,70 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and Contributors
+# See license.txt
+"""Tests for listing-backed verification (frappe_s3_integration.s3_core.snapshot)."""
+
+import os
+from unittest.mock import MagicMock, patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_s3_integration.s3_core.snapshot import ObjectSnapshot
+
+
+def _conn(listing):
+	conn = MagicMock()
+	conn.list_objects.side_effect = lambda bucket, prefix=None: [
+		o for o in listing.get(bucket, []) if o["Key"].startswith(prefix or "")]
+	conn.verify_object.return_value = "HEAD"
+	return conn
+
+
+class TestObjectSnapshot(FrappeTestCase):
+	LISTING = {"bkt": [
+		{"Key": "files/a.jpg", "Size": 5, "ETag": '"e1"'},
+		{"Key": "files/b.jpg", "Size": 7, "ETag": '"e2"'},
+		{"Key": "private/files/c.pdf", "Size": 9, "ETag": '"e3"'},
+	]}
+
+	def test_listed_keys_verify_without_head(self):
+		conn = _conn(self.LISTING)
+		with ObjectSnapshot(conn) as snap:
+			self.assertTrue(snap.verify_object("bkt", "files/a.jpg", expected_size=5))
+			self.assertTrue(snap.verify_object("bkt", "files/b.jpg"))
+			self.assertEqual(snap.lookup("bkt", "private/files/c.pdf"), (9, "e3"))
+		conn.verify_object.assert_not_called()
+		# one listing per prefix, not per key
+		self.assertEqual(sorted(c.kwargs["prefix"] for c in conn.list_objects.call_args_list),
+		                 ["files/", "private/"])
+
+	def test_unconfirmed_keys_fall_back_to_head(self):
+		conn = _conn(self.LISTING)
+		with ObjectSnapshot(conn) as snap:
+			# absent from the listing (written after it), a different size, a bucket-root key
+			self.assertEqual(snap.verify_object("bkt", "files/new.jpg"), "HEAD")
+			self.assertEqual(snap.verify_object("bkt", "files/a.jpg", expected_size=6), "HEAD")
+			self.assertEqual(snap.verify_object("bkt", "root.txt"), "HEAD")
+		self.assertEqual(conn.verify_object.call_count, 3)
+		self.assertEqual(conn.list_objects.call_count, 1)  # root keys never list the bucket
+
+	def test_discarded_key_is_no_longer_trusted(self):
+		conn = _conn(self.LISTING)
+		with ObjectSnapshot(conn) as snap:
+			snap.lookup("bkt", "files/a.jpg")
+			snap.discard("bkt", "files/a.jpg")
+			self.assertEqual(snap.verify_object("bkt", "files/a.jpg", expected_size=5), "HEAD")
+
+	def test_stale_prefix_is_relisted(self):
+		conn = _conn(self.LISTING)
+		with ObjectSnapshot(conn, max_age=60) as snap, \
+		     patch("frappe_s3_integration.s3_core.snapshot.time.monotonic", side_effect=[0, 10, 100, 100]):
+			snap.lookup("bkt", "files/a.jpg")   # listed at t=0
+			snap.lookup("bkt", "files/a.jpg")   # t=10: fresh
+			snap.lookup("bkt", "files/a.jpg")   # t=100: re-listed
+		self.assertEqual(conn.list_objects.call_count, 2)
+
+	def test_close_removes_the_database_file(self):
+		snap = ObjectSnapshot(_conn({}))
+		path = snap.path
+		self.assertTrue(os.path.exists(path))
+		snap.close()
+		self.assertFalse(os.path.exists(path))
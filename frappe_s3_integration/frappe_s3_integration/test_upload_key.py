@@ -7,18 +7,31 @@ wrong content."""
 import io
 from unittest.mock import MagicMock
 
+from botocore.exceptions import ClientError
 from frappe.tests.utils import FrappeTestCase
 from werkzeug.datastructures import FileStorage
 
-from frappe_s3_integration.s3_core import S3Connection
+from frappe_s3_integration.s3_core import REWRITE_MAX_AGE, S3Connection, _key_index, _rewrite_cache_control
 
 
-def _conn(exists_sequence):
-	"""A bare S3Connection with a stubbed transport + verify_object result sequence."""
+def _conn(existing=(), conditional=True):
+	"""A bare S3Connection over a stubbed bucket already holding `existing` keys. Like S3,
+	put_object with If-None-Match: * refuses (412) an existing key."""
+	existing = set(existing)
 	conn = S3Connection.__new__(S3Connection)      # bypass __init__ (no real AWS)
 	conn.connection = MagicMock()
 	conn.connection.meta.region_name = "ap-south-1"
-	conn.verify_object = MagicMock(side_effect=exists_sequence)
+
+	def put_object(**kw):
+		if "IfNoneMatch" in kw:
+			if not conditional:
+				raise ClientError({"Error": {"Code": "NotImplemented"}}, "PutObject")
+			if kw["Key"] in existing:
+				raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+		existing.add(kw["Key"])
+
+	conn.connection.put_object.side_effect = put_object
+	conn.verify_object = MagicMock(side_effect=lambda bucket, key, expected_size=None: key in existing)
 	return conn
 
 
@@ -27,12 +40,15 @@ def _file(content=b"data", name="report.pdf"):
 
 
 class TestUploadKeyCollision(FrappeTestCase):
+	def setUp(self):
+		_key_index.clear()
+
 	def _uploaded_key(self, conn):
-		return conn.connection.upload_fileobj.call_args.kwargs["Key"]
+		return conn.connection.put_object.call_args.kwargs["Key"]
 
 	def test_supplied_key_is_suffixed_when_object_already_exists(self):
 		# object at the supplied key exists -> must NOT overwrite; a suffix is added.
-		conn = _conn([True, False])  # taken, then the suffixed candidate is free
+		conn = _conn({"private/files/report.pdf"})
 		resp = conn.upload_file_to_bucket(_file(), bucket_name="bkt", allow_public=False,
 		                                  key="private/files/report.pdf")
 		used = self._uploaded_key(conn)
@@ -40,16 +56,164 @@ class TestUploadKeyCollision(FrappeTestCase):
 		self.assertTrue(used.startswith("private/files/report"))
 		self.assertTrue(used.endswith(".pdf"))
 		self.assertEqual(resp["key"], used)                     # doc stores the ACTUAL key
+		self.assertTrue(_key_index.taken("bkt", "private/files/report.pdf"))   # learned from the 412
+
+	def test_known_key_is_suffixed_without_any_round_trip(self):
+		conn = _conn({"private/files/report.pdf"})
+		conn.seed_key_index = S3Connection.seed_key_index.__get__(conn)
+		conn.list_objects = MagicMock(return_value=[{"Key": "private/files/report.pdf"}])
+		conn.seed_key_index("bkt", "private/files/")
+		conn.upload_file_to_bucket(_file(), bucket_name="bkt", key="private/files/report.pdf")
+		self.assertEqual(conn.connection.put_object.call_count, 1)   # no refused put first
+		self.assertNotEqual(self._uploaded_key(conn), "private/files/report.pdf")
+		conn.verify_object.assert_not_called()                        # and no HEAD probe
+
+	def test_free_key_costs_no_head(self):
+		conn = _conn()
+		conn.upload_file_to_bucket(_file(), bucket_name="bkt", key="private/files/new.pdf")
+		conn.verify_object.assert_not_called()
+		self.assertEqual(conn.connection.put_object.call_args.kwargs["IfNoneMatch"], "*")
+		self.assertTrue(_key_index.taken("bkt", "private/files/new.pdf"))
+
+	def test_store_without_conditional_writes_falls_back_to_head(self):
+		conn = _conn({"private/files/report.pdf"}, conditional=False)
+		conn.upload_file_to_bucket(_file(), bucket_name="bkt", key="private/files/report.pdf")
+		self.assertNotEqual(self._uploaded_key(conn), "private/files/report.pdf")
+		self.assertIn("bkt", _key_index.unconditional)
+		self.assertNotIn("IfNoneMatch", conn.connection.put_object.call_args.kwargs)
+
+	def test_bucket_cache_control_is_written_on_upload(self):
+		import frappe
+		conn = _conn()
+		conn.s3_settings = frappe._dict(s3_bucket_details=[frappe._dict(
+			bucket_name="bkt", cache_control="public, max-age=600", cache_control_extensions="png")])
+		conn.put_file(_file(name="logo.png"), "bkt", key="files/logo.png")
+		self.assertEqual(conn.connection.put_object.call_args.kwargs["CacheControl"], "public, max-age=600")
+		conn.put_file(_file(name="doc.pdf"), "bkt", key="files/doc.pdf")
+		self.assertNotIn("CacheControl", conn.connection.put_object.call_args.kwargs)   # not covered
+
+	def test_in_place_rewrite_drops_immutable_and_caps_max_age(self):
+		# Image optimization overwrites the key: a year-long immutable copy would never refresh.
+		import frappe
+		conn = _conn()
+		conn.s3_settings = frappe._dict(s3_bucket_details=[frappe._dict(
+			bucket_name="bkt", cache_control="public, max-age=31536000, immutable")])
+		conn.update_file_in_bucket(io.BytesIO(b"smaller"), "bkt", "files/logo.png", allow_public=True)
+		extra = conn.connection.upload_fileobj.call_args.kwargs["ExtraArgs"]
+		self.assertEqual(extra["CacheControl"], f"public, max-age={REWRITE_MAX_AGE}")
+		self.assertEqual(_rewrite_cache_control("no-cache"), "no-cache")
+		self.assertIsNone(_rewrite_cache_control("immutable"))
+
+	def test_delete_forgets_the_key(self):
+		conn = _conn()
+		_key_index.add("bkt", "private/files/gone.pdf")
+		conn.delete_file_from_bucket("private/files/gone.pdf", "bkt")
+		self.assertFalse(_key_index.taken("bkt", "private/files/gone.pdf"))
+
+	def test_batched_delete_reports_per_key_errors(self):
+		from unittest.mock import patch
+
+		conn = _conn()
+		conn.connection.delete_objects.side_effect = [
+			{"Errors": [{"Key": "files/b.pdf", "Code": "AccessDenied", "Message": "Access Denied"}]},
+			ClientError({"Error": {"Code": "SlowDown"}}, "DeleteObjects"),
+		]
+		_key_index.add("bkt", "files/a.pdf")
+		with patch("frappe_s3_integration.s3_core.DELETE_BATCH_SIZE", 2):
+			errors = conn.delete_files_from_bucket(["files/a.pdf", "files/b.pdf", "files/c.pdf"], "bkt")
+		first = conn.connection.delete_objects.call_args_list[0].kwargs
+		self.assertEqual(first["Delete"]["Objects"], [{"Key": "files/a.pdf"}, {"Key": "files/b.pdf"}])
+		self.assertTrue(first["Delete"]["Quiet"])
+		self.assertEqual(errors["files/b.pdf"], "AccessDenied: Access Denied")
+		self.assertTrue(errors["files/c.pdf"].startswith("SlowDown"))  # a failed request fails its keys
+		self.assertNotIn("files/a.pdf", errors)
+		self.assertFalse(_key_index.taken("bkt", "files/a.pdf"))
 
 	def test_supplied_key_kept_when_object_is_free(self):
 		# no collision -> the caller's Frappe-layout key is used unchanged.
-		conn = _conn([False])
+		conn = _conn()
 		conn.upload_file_to_bucket(_file(), bucket_name="bkt", allow_public=False,
 		                           key="private/files/unique.pdf")
 		self.assertEqual(self._uploaded_key(conn), "private/files/unique.pdf")
 
+	def test_file_is_read_once_and_hashed_in_flight(self):
+		import base64
+		import hashlib
+		conn = _conn()
+		f = _file(b"x" * 50000)
+		reads = []
+		real_read = f.stream.read
+		f.stream.read = lambda *a: reads.append(real_read(*a)) or reads[-1]
+		resp = conn.put_file(f, "bkt", key="private/files/r.pdf")
+		self.assertEqual(sum(len(r) for r in reads), 50000)                # one pass, no pre-hash
+		self.assertEqual(resp["content_hash"], hashlib.md5(b"x" * 50000).hexdigest())
+		sent = conn.connection.put_object.call_args.kwargs
+		self.assertEqual(sent["ContentMD5"], base64.b64encode(hashlib.md5(b"x" * 50000).digest()).decode())
+
 	def test_empty_file_is_rejected(self):
-		conn = _conn([False])
+		conn = _conn()
 		import frappe
 		with self.assertRaises(frappe.exceptions.ValidationError):
 			conn.upload_file_to_bucket(_file(content=b""), bucket_name="bkt", key="private/files/x.pdf")
+
+
+class TestMultipartUpload(FrappeTestCase):
+	"""Large files go up in parts; the migration sweep resumes an interrupted upload."""
+
+	def setUp(self):
+		_key_index.clear()
+
+	def _big_conn(self, uploads=None, parts=None):
+		conn = _conn()
+		conn.multipart_threshold = 10
+		conn.multipart_chunksize = 4        # tiny parts keep the test in memory
+		conn.multipart_concurrency = 2
+		conn.connection.create_multipart_upload.return_value = {"UploadId": "new"}
+		conn.connection.upload_part.side_effect = lambda **kw: {"ETag": f"etag-{kw['PartNumber']}"}
+		conn.connection.list_multipart_uploads.return_value = {"Uploads": uploads or []}
+		conn.connection.get_paginator.return_value.paginate.return_value = [{"Parts": parts or []}]
+		return conn
+
+	def _sent_parts(self, conn):
+		return sorted(c.kwargs["PartNumber"] for c in conn.connection.upload_part.call_args_list)
+
+	def test_small_file_is_sent_in_one_request(self):
+		conn = self._big_conn()
+		conn.upload_file_to_bucket(_file(b"tiny"), bucket_name="bkt", key="private/files/a.pdf")
+		conn.connection.put_object.assert_called_once()
+		conn.connection.create_multipart_upload.assert_not_called()
+
+	def test_large_file_is_uploaded_in_parts(self):
+		conn = self._big_conn()
+		resp = conn.upload_file_to_bucket(_file(b"0123456789ab"), bucket_name="bkt", key="private/files/a.pdf")
+		self.assertEqual(self._sent_parts(conn), [1, 2, 3])
+		done = conn.connection.complete_multipart_upload.call_args.kwargs
+		self.assertEqual([p["PartNumber"] for p in done["MultipartUpload"]["Parts"]], [1, 2, 3])
+		self.assertEqual(done["UploadId"], "new")
+		self.assertEqual(resp["key"], "private/files/a.pdf")
+		conn.connection.list_multipart_uploads.assert_not_called()     # resume is opt-in
+
+	def test_resume_skips_parts_already_in_s3(self):
+		import hashlib
+		data = b"0123456789ab"
+		part1 = ('"%s"' % hashlib.md5(data[:4]).hexdigest())
+		conn = self._big_conn(
+			uploads=[{"Key": "private/files/a.pdf", "UploadId": "old", "Initiated": 1},
+			         {"Key": "private/files/a.pdf.bak", "UploadId": "other", "Initiated": 2}],
+			parts=[{"PartNumber": 1, "Size": 4, "ETag": part1},
+			       {"PartNumber": 2, "Size": 4, "ETag": '"stale"'}],   # changed bytes -> resent
+		)
+		conn.put_file(_file(data), "bkt", key="private/files/a.pdf", resume=True)
+		conn.connection.create_multipart_upload.assert_not_called()
+		self.assertEqual(self._sent_parts(conn), [2, 3])
+		done = conn.connection.complete_multipart_upload.call_args.kwargs
+		self.assertEqual(done["UploadId"], "old")
+		self.assertEqual(done["MultipartUpload"]["Parts"][0], {"PartNumber": 1, "ETag": part1})
+
+	def test_failed_upload_is_kept_for_resume_or_aborted(self):
+		for resume in (True, False):
+			conn = self._big_conn()
+			conn.connection.upload_part.side_effect = Exception("network")
+			with self.assertRaises(Exception):
+				conn.put_file(_file(b"0123456789ab"), "bkt", key="private/files/a.pdf", resume=resume)
+			self.assertEqual(conn.connection.abort_multipart_upload.called, not resume)
@@ -260,8 +260,14 @@ override_doctype_class = {
 doc_events = {
     "File": {
         "after_insert": "frappe_s3_integration.s3_core.flag_file_for_s3",
-        "on_update": "frappe_s3_integration.s3_core.handle_is_private_change",
-        "on_trash": "frappe_s3_integration.s3_core.delete_file_from_s3",
+        "on_update": [
+            "frappe_s3_integration.s3_core.handle_is_private_change",
+            "frappe_s3_integration.s3_core.invalidate_file_meta",
+        ],
+        "on_trash": [
+            "frappe_s3_integration.s3_core.delete_file_from_s3",
+            "frappe_s3_integration.s3_core.invalidate_file_meta",
+        ],
     }
 }
 
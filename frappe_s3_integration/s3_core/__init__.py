@@ -1,14 +1,41 @@
 
 import uuid
+import base64
 import hashlib
 import mimetypes
 import os
 import re
+import threading
 import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.parse import quote
-import boto3 as s3
 import frappe
+# Only the exception module is imported eagerly (the except clauses below need the class);
+# boto3 itself, its service models and the transfer manager load on the first client.
 from botocore.exceptions import ClientError
+from frappe.utils import cint
+
+MB = 1024 * 1024
+MULTIPART_MIN_PART = 5 * MB       # S3 minimum for every part but the last
+MULTIPART_MAX_PARTS = 10000       # S3 hard limit on parts per upload
+DELETE_BATCH_SIZE = 1000          # S3 limit on keys per DeleteObjects request
+DEFAULT_POOL_CONNECTIONS = 50     # botocore's own default (10) starves the upload pools
+STREAM_CHUNK_MIN = 64 * 1024      # first read of a streamed body (fast first bytes)...
+STREAM_CHUNK_MAX = 1024 * 1024    # ...doubling per read up to this
+ACCEL_LOCATION = "/_s3_proxy"     # default nginx internal location for X-Accel-Redirect
+ACCEL_URL_HEADER = "X-S3-Url"     # carries the signed url to that location ($upstream_http_x_s3_url)
+PUBLIC_REDIRECT_MAX_AGE = 3600    # browsers may reuse a public file's redirect (key -> url is stable)
+REWRITE_MAX_AGE = 3600            # Cache-Control max-age cap for objects rewritten in place
+PRIVATE_REDIRECT_EXPIRES = 600   # lifetime (s) of the presigned url a private redirect points at
+PRESIGN_CACHE_PREFIX = "s3_presigned_url"
+FILE_META_PREFIX = "s3_file_meta"
+FILE_META_TTL = 24 * 3600         # safety net only; every write path clears its entry
+_FILE_META_FIELDS = ["name", "file_name", "file_size", "is_private", "owner",
+                     "attached_to_doctype", "attached_to_name", "custom_s3_key",
+                     "custom_s3_bucket_name", "custom_is_s3_uploaded"]
+PRESIGN_CACHE_MARGIN = 300        # a cached url always has at least this many seconds left
+_PRESIGN_FILE_FIELDS = ["name", "owner", "is_private", "attached_to_doctype", "attached_to_name",
+                        "custom_s3_key", "custom_s3_bucket_name", "custom_is_s3_uploaded"]
 
 
 def _guess_content_type(filename):
@@ -35,6 +62,38 @@ def _s3_safe_filename(filename, fallback="file"):
 	return name
 
 
+def _rewrite_cache_control(policy):
+	"""A bucket's Cache-Control for an object overwritten under its own key (image
+	optimization): no `immutable` and max-age / s-maxage capped at REWRITE_MAX_AGE, so
+	browsers and CDNs pick up the new bytes instead of the old ones for up to a year."""
+	directives = []
+	for directive in (policy or "").split(","):
+		name, sep, value = (part.strip() for part in directive.partition("="))
+		if not name or name.lower() == "immutable":
+			continue
+		if name.lower() in ("max-age", "s-maxage") and value.isdigit():
+			value = str(min(int(value), REWRITE_MAX_AGE))
+		directives.append(f"{name}{sep}{value}")
+	return ", ".join(directives) or None
+
+
+def _replace_metadata(head, cache_control=None, content_type=None):
+	"""copy_object params that rewrite an object's metadata in place (MetadataDirective
+	REPLACE) while keeping everything of `head` that isn't being changed."""
+	params = {
+		"MetadataDirective": "REPLACE",
+		"ContentType": content_type or head.get("ContentType") or "application/octet-stream",
+	}
+	for field in ("ContentDisposition", "ContentEncoding", "ContentLanguage"):
+		if head.get(field):
+			params[field] = head[field]
+	if head.get("Metadata"):
+		params["Metadata"] = head["Metadata"]
+	if cache_control:
+		params["CacheControl"] = cache_control
+	return params
+
+
 def _s3_key_from_file_url(file_url):
 	"""Map a local File url to its S3 key, mirroring Frappe's own on-disk layout:
 	'/files/x.pdf' -> 'files/x.pdf', '/private/files/x.pdf' -> 'private/files/x.pdf'.
@@ -46,6 +105,35 @@ def _s3_key_from_file_url(file_url):
 	return "/".join(parts)
 
 
+_session = None
+_session_lock = threading.RLock()
+
+
+def _boto_session():
+	"""One boto3 Session per process, shared by every site's client: the service model,
+	endpoint data and loader caches are built once instead of per site. Each client still
+	gets its own site's explicit credentials, so no credential chain is resolved.
+
+	boto3 is imported here rather than at module level: hooks.py points File doc_events
+	at this package, so every web and worker process imports it, but most never build a
+	client. See startup_benchmark.py for the measured difference."""
+	global _session
+	with _session_lock:
+		if _session is None:
+			import boto3
+
+			_session = boto3.session.Session()
+		return _session
+
+
+def _boto_client(**kwargs):
+	"""A client from the shared session. A Session is not thread-safe — client() fills its
+	loader and component caches — so clients are only ever created under the lock; the
+	clients themselves are safe to share across threads."""
+	with _session_lock:
+		return _boto_session().client(**kwargs)
+
+
 def getS3Connection():
 		"""
 			This method is a placeholder for the S3 connection.
@@ -77,12 +165,95 @@ image_extensions = [
 	"svg"
 ]
 
+class _HashingReader:
+	"""Tee over a binary stream: every byte read through it is also folded into an md5 and
+	a byte count, so an upload and its content hash come from a single pass over the file."""
+
+	def __init__(self, stream):
+		self.stream = stream
+		self.md5 = hashlib.md5()
+		self.size = 0
+
+	def read(self, size=-1):
+		chunk = self.stream.read(size)
+		self.md5.update(chunk)
+		self.size += len(chunk)
+		return chunk
+
+	def hexdigest(self):
+		return self.md5.hexdigest()
+
+
+class _KeyIndex:
+	"""Per-process record of S3 keys known to exist, per bucket, so _unique_key can answer
+	"is this key taken?" without a HEAD. Maintained on every upload / copy / delete made
+	through S3Connection and optionally seeded from a listing (seed_key_index). Bucket names
+	are global in S3, so one index serves every site in the process.
+
+	The index is only a hint — another node may have written a key since. Correctness comes
+	from the conditional put (If-None-Match: *) in put_file, which fails instead of
+	overwriting; buckets on stores without conditional writes are remembered in
+	`unconditional` and fall back to a HEAD per candidate key."""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.clear()
+
+	def clear(self):
+		with self._lock:
+			self._keys = {}
+			self._seeded = set()
+			self.unconditional = set()
+
+	def taken(self, bucket, key):
+		with self._lock:
+			return key in self._keys.get(bucket, ())
+
+	def add(self, bucket, key):
+		with self._lock:
+			self._keys.setdefault(bucket, set()).add(key)
+
+	def discard(self, bucket, key):
+		with self._lock:
+			self._keys.get(bucket, set()).discard(key)
+
+	def seeded(self, bucket, prefix):
+		with self._lock:
+			return (bucket, prefix) in self._seeded
+
+	def seed(self, bucket, prefix, keys):
+		keys = set(keys)
+		with self._lock:
+			self._keys.setdefault(bucket, set()).update(keys)
+			self._seeded.add((bucket, prefix))
+
+
+_key_index = _KeyIndex()
+
+
+def _precondition_failed(e):
+	"""A conditional write lost: the key exists (412) or another conditional write to it
+	is in flight (409)."""
+	code = str(e.response.get("Error", {}).get("Code", ""))
+	return code in ("PreconditionFailed", "412", "ConditionalRequestConflict", "409")
+
+
+def _conditional_unsupported(e):
+	code = str(e.response.get("Error", {}).get("Code", ""))
+	return code in ("NotImplemented", "501")
+
+
 class S3Connection:
 	"""
 		This class is a placeholder for the S3 connection.
 		It is used to create an S3 connection object.
 	"""
 
+	# Transfer tuning (AWS S3 Settings > Transfer); class defaults keep a bare instance usable.
+	multipart_threshold = 64 * MB
+	multipart_chunksize = 16 * MB
+	multipart_concurrency = 4
+
 	def __init__(self, *args, **kwargs):
 		self.connection = None
 		self.setup_s3_settings()
@@ -92,11 +263,33 @@ class S3Connection:
 			frappe.throw("Please set AWS Access Key ID and Secret Access Key in S3 Settings")
 		if not self.s3_settings.region:
 			frappe.throw("Please set AWS Region Name in S3 Settings")
-		self.connection = s3.client(
+		self.connection = _boto_client(
 			service_name='s3',
 			aws_access_key_id=self.s3_settings.get('aws_key'),
 			aws_secret_access_key=self.s3_settings.get_password('aws_secret'),
 			region_name=self.s3_settings.get('region'),
+			config=self.client_config(),
+		)
+
+	def client_config(self):
+		"""botocore Config from AWS S3 Settings > Connection. The pool is never smaller than
+		what one sweep job can use at once (upload threads x parts per upload), or than an
+		explicit Bulk Concurrency, so neither queues on connections."""
+		from botocore.config import Config
+
+		s = self.s3_settings
+		conf = frappe.get_conf()
+		sweep_workers = cint(conf.get("s3_sweep_workers")) or cint(s.get("sweep_workers")) or 1
+		bulk = cint(conf.get("s3_bulk_concurrency")) or cint(s.get("bulk_concurrency"))
+		pool = max(cint(s.get("max_pool_connections")) or DEFAULT_POOL_CONNECTIONS,
+		           sweep_workers * self.multipart_concurrency, bulk)
+		return Config(
+			max_pool_connections=pool,
+			connect_timeout=cint(s.get("connect_timeout")) or 10,
+			read_timeout=cint(s.get("read_timeout")) or 60,
+			retries={"mode": (s.get("retry_mode") or "adaptive").lower(),
+			         "max_attempts": cint(s.get("max_attempts")) or 5},
+			tcp_keepalive=bool(cint(s.get("tcp_keepalive"))),
 		)
 
 	def setup_s3_settings(self):
@@ -104,6 +297,29 @@ class S3Connection:
 		self.setup_private_bucket()
 		self.setup_public_bucket()
 		self.construct_bucket_restrictions()
+		self.setup_transfer_config()
+
+	def setup_transfer_config(self):
+		"""Multipart threshold / part size (MB) and part concurrency from AWS S3 Settings.
+		Part size is floored at S3's 5 MB minimum; blank fields keep the class defaults."""
+		s = self.s3_settings
+		if cint(s.get("multipart_threshold")):
+			self.multipart_threshold = cint(s.get("multipart_threshold")) * MB
+		if cint(s.get("multipart_chunksize")):
+			self.multipart_chunksize = max(MULTIPART_MIN_PART, cint(s.get("multipart_chunksize")) * MB)
+		if cint(s.get("multipart_concurrency")):
+			self.multipart_concurrency = max(1, cint(s.get("multipart_concurrency")))
+
+	def transfer_config(self):
+		"""boto3 TransferConfig built from the same settings, for managed transfers
+		(upload_fileobj / download_file) that don't go through _multipart_upload."""
+		from boto3.s3.transfer import TransferConfig
+
+		return TransferConfig(
+			multipart_threshold=self.multipart_threshold,
+			multipart_chunksize=self.multipart_chunksize,
+			max_concurrency=self.multipart_concurrency,
+		)
 
 	def setup_public_bucket(self):
 		self.public_bucket= None
@@ -134,7 +350,9 @@ class S3Connection:
 		return self.bucket_restrictions[bucket_name]['file_max']
 	
 	def get_pre_signed_url(self, file, content_type=None):
-		file_doc = frappe.get_doc("File", file)
+		file_doc = frappe.db.get_value("File", file, _PRESIGN_FILE_FIELDS, as_dict=True)
+		if not file_doc:
+			frappe.throw(f"File {file} not found", frappe.DoesNotExistError)
 		from frappe.core.doctype.file.file import has_permission as file_has_permission
 		if not file_has_permission(file_doc, "read"):
 			frappe.throw("You don't have permission to access this file", frappe.PermissionError)
@@ -146,7 +364,29 @@ class S3Connection:
 			key=file_doc.custom_s3_key,
 			content_type=content_type,
 		)
-	
+
+	def get_pre_signed_urls(self, files, content_type=None):
+		"""Batch get_pre_signed_url: {file name: url} for every File the user may read that
+		lives in S3 (others map to None). One query for all rows; the permission check is
+		shared by Files with the same owner / visibility / attachment."""
+		from frappe.core.doctype.file.file import has_permission as file_has_permission
+		rows = frappe.get_all("File", filters={"name": ["in", list(files)]}, fields=_PRESIGN_FILE_FIELDS)
+		urls = dict.fromkeys(files)
+		allowed = {}
+		for row in rows:
+			if not row.custom_s3_key or not row.custom_s3_bucket_name or not row.custom_is_s3_uploaded:
+				continue
+			scope = (row.is_private, row.owner, row.attached_to_doctype, row.attached_to_name)
+			if scope not in allowed:
+				allowed[scope] = file_has_permission(row, "read")
+			if allowed[scope]:
+				urls[row.name] = self.generate_temporary_url(
+					bucket_name=row.custom_s3_bucket_name,
+					key=row.custom_s3_key,
+					content_type=content_type,
+				)
+		return urls
+
 	def generate_temporary_url(
 		self,
 		bucket_name,
@@ -154,21 +394,48 @@ class S3Connection:
 		expires_in=3600,
 		inline=True,
 		content_type=None,
+		filename=None,
 	):
 		"""
-		Generate a temporary (pre-signed) URL to access a file.
+		Generate a temporary (pre-signed) URL to access a file. With `filename`, S3 sends
+		it in Content-Disposition, so a download keeps the File's name rather than the key's.
+
+		Signed urls are cached in redis (shared by every worker) for expires_in minus
+		PRESIGN_CACHE_MARGIN, so a url handed out from the cache is never about to expire.
 		"""
 
 		if self.s3_settings.disable_s3_operations:
 			frappe.throw("S3 operations are disabled")
 
+		cache_key = self._presign_cache_key(bucket_name, key, expires_in, inline, content_type, filename)
+		ttl = expires_in - min(PRESIGN_CACHE_MARGIN, expires_in // 2)
+		url = frappe.cache().get_value(cache_key)
+		if url:
+			return url
+
+		cdn_base_url = self.cdn_base_url_for(bucket_name)
+		signer = self.cdn_signer() if cdn_base_url else None
+		if signer:
+			# Private object behind the CDN: a CloudFront signed url (canned policy). The
+			# edge serves the object's own Content-Type / -Disposition metadata.
+			import datetime
+			url = signer.generate_presigned_url(
+				_s3_https_url(bucket_name, key, None, cdn_base_url),
+				date_less_than=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in),
+			)
+			if ttl > 0:
+				frappe.cache().set_value(cache_key, url, expires_in_sec=ttl)
+			return url
+
 		try:
 			params = {
 				"Bucket": bucket_name,
 				"Key": key
 			}
 
-			if inline:
+			if filename:
+				params["ResponseContentDisposition"] = _content_disposition(filename, inline)
+			elif inline:
 				params["ResponseContentDisposition"] = "inline"
 			if content_type:
 				params["ResponseContentType"] = content_type
@@ -179,12 +446,22 @@ class S3Connection:
 				ExpiresIn=expires_in
 			)
 
+			if ttl > 0:
+				frappe.cache().set_value(cache_key, url, expires_in_sec=ttl)
 			return url
 
 		except ClientError as e:
 			frappe.log_error(str(e), "S3 Presigned URL Error")
 			return None
-	
+
+	def _presign_cache_key(self, bucket_name, key, expires_in, inline, content_type, filename=None):
+		# The access key id is part of the key: rotating credentials must not keep serving
+		# urls signed by the retired key.
+		parts = (self.s3_settings.get("aws_key"), bucket_name, key, expires_in,
+		         "inline" if inline else "attachment", content_type or "", filename or "")
+		digest = hashlib.sha1("\0".join(str(p) for p in parts).encode()).hexdigest()
+		return f"{PRESIGN_CACHE_PREFIX}:{digest}"
+
 	def create_bucket(self, bucket_name):
 		"""
 		Create a new S3 bucket.
@@ -218,86 +495,308 @@ class S3Connection:
 			frappe.log_error(f"Error getting bucket list: {str(e)}")
 			return []
 		
+	def private_serve_mode(self, bucket_name, file_size=None):
+		"""How serve_file delivers a private object: "Stream" (through this worker),
+		"Presigned Redirect" (302 to a short-lived signed url, bytes go S3 -> browser) or
+		"Nginx Accel Redirect" (nginx fetches the signed url itself; see docs/SERVING.md).
+		The bucket row's mode wins over the global one; in either redirect mode, files below
+		'Redirect Min Size' (KB) are still streamed, saving small images the extra hop."""
+		mode = None
+		for i in self.s3_settings.s3_bucket_details:
+			if i.get('bucket_name') == bucket_name:
+				mode = i.get('private_serve_mode')
+				break
+		mode = mode or self.s3_settings.get('private_serve_mode') or "Stream"
+		min_kb = cint(self.s3_settings.get('redirect_min_size'))
+		if mode != "Stream" and min_kb and file_size is not None and file_size < min_kb * 1024:
+			return "Stream"
+		return mode
+
+	def cdn_base_url_for(self, bucket_name):
+		"""The bucket row's CDN Base URL, or None to address S3 directly."""
+		for i in getattr(self, "s3_settings", frappe._dict()).get("s3_bucket_details") or []:
+			if i.get('bucket_name') == bucket_name:
+				return (i.get('cdn_base_url') or "").strip() or None
+		return None
+
+	def inventory_source_for(self, bucket_name):
+		"""The bucket row's Inventory Source (see s3_core.inventory), or None."""
+		for i in getattr(self, "s3_settings", frappe._dict()).get("s3_bucket_details") or []:
+			if i.get('bucket_name') == bucket_name:
+				return (i.get('inventory_source') or "").strip() or None
+		return None
+
+	def cdn_signer(self):
+		"""botocore CloudFrontSigner for private objects behind the CDN, or None when no
+		key pair is configured. Key Pair ID comes from AWS S3 Settings; the RSA private key
+		from site_config (s3_cdn_private_key: PEM text, or s3_cdn_private_key_file: path),
+		so the key never lands in the database."""
+		if getattr(self, "_cdn_signer", None) is not None:
+			return self._cdn_signer or None
+		self._cdn_signer = False
+		key_pair_id = self.s3_settings.get("cdn_key_pair_id")
+		conf = frappe.get_conf()
+		pem = conf.get("s3_cdn_private_key")
+		if not pem and conf.get("s3_cdn_private_key_file"):
+			with open(conf.get("s3_cdn_private_key_file")) as f:
+				pem = f.read()
+		if key_pair_id and pem:
+			from botocore.signers import CloudFrontSigner
+			from cryptography.hazmat.primitives import hashes, serialization
+			from cryptography.hazmat.primitives.asymmetric import padding
+
+			private_key = serialization.load_pem_private_key(pem.encode(), password=None)
+			self._cdn_signer = CloudFrontSigner(
+				key_pair_id, lambda message: private_key.sign(message, padding.PKCS1v15(), hashes.SHA1()))
+		return self._cdn_signer or None
+
+	def cache_control_for(self, bucket_name, filename):
+		"""The bucket row's Cache-Control for this file, or None. 'Cache Control
+		Extensions' limits the policy to those extensions (blank = every file)."""
+		for i in getattr(self, "s3_settings", frappe._dict()).get("s3_bucket_details") or []:
+			if i.get('bucket_name') != bucket_name:
+				continue
+			policy = (i.get('cache_control') or "").strip()
+			if not policy:
+				return None
+			exts = {e.strip().lstrip(".").lower() for e in (i.get('cache_control_extensions') or "").split(",") if e.strip()}
+			ext = os.path.splitext(filename or "")[1].lstrip(".").lower()
+			return policy if not exts or ext in exts else None
+		return None
+
 	def get_default_upload_folder(self, bucket_name):
 		for i in self.s3_settings.s3_bucket_details:
 			if i.get('bucket_name') == bucket_name:
 				return i.get('default_folder')
 		return 'uploads'
 		
-	def upload_file_to_public_bucket(self, file, key=None):
+	def upload_file_to_public_bucket(self, file, key=None, resume=False):
 		"""Upload to the default public bucket. `key` mirrors Frappe's path when known."""
 		if not self.public_bucket:
 			frappe.throw("No public bucket found in S3 Settings")
-		return self.upload_file_to_bucket(file, self.public_bucket, allow_public=True, key=key)
+		return self.upload_file_to_bucket(file, self.public_bucket, allow_public=True, key=key, resume=resume)
 
-	def upload_file_to_private_bucket(self, file, key=None):
+	def upload_file_to_private_bucket(self, file, key=None, resume=False):
 		"""Upload to the default private bucket. `key` mirrors Frappe's path when known."""
 		if not self.private_bucket:
 			frappe.throw("No private bucket found in S3 Settings")
-		return self.upload_file_to_bucket(file, self.private_bucket, allow_public=False, key=key)
-
-	def _unique_key(self, bucket_name, key):
-		"""Frappe-style collision guard: if `key` already exists, insert a short random
-		suffix before the extension until it's free. Only needed for direct API uploads
-		that don't pass through Frappe's local-file dedup."""
+		return self.upload_file_to_bucket(file, self.private_bucket, allow_public=False, key=key, resume=resume)
+
+	def _unique_key(self, bucket_name, key, probe=False):
+		"""Frappe-style collision guard: if `key` is taken, insert a short random suffix
+		before the extension until it's free. Only needed for direct API uploads that don't
+		pass through Frappe's local-file dedup.
+
+		"Taken" is answered from _key_index, with no network call; the conditional put in
+		put_file catches what the index hasn't seen. `probe` adds a HEAD per candidate —
+		used where a lost conditional put would be expensive (multipart), where the write
+		isn't a conditional put (a server-side copy) or where the bucket can't do
+		conditional writes at all."""
+		probe = probe or bucket_name in _key_index.unconditional
 		candidate = key
-		while self.verify_object(bucket_name, candidate):
+		while self._key_taken(bucket_name, candidate, probe):
 			root, ext = os.path.splitext(key)
 			candidate = f"{root}{uuid.uuid4().hex[:6]}{ext}"
 		return candidate
 
-	def upload_file_to_bucket(self, file, bucket_name=None, allow_public = False, key=None):
+	def _key_taken(self, bucket_name, key, probe=False):
+		if _key_index.taken(bucket_name, key):
+			return True
+		if probe and self.verify_object(bucket_name, key):
+			_key_index.add(bucket_name, key)
+			return True
+		return False
+
+	def seed_key_index(self, bucket_name, prefix):
+		"""Load every existing key under `prefix` into _key_index (once per process), so a
+		batch of uploads into an already-populated folder skips straight to free keys."""
+		if not _key_index.seeded(bucket_name, prefix):
+			_key_index.seed(bucket_name, prefix, (o["Key"] for o in self.list_objects(bucket_name, prefix=prefix)))
+
+	def upload_file_to_bucket(self, file, bucket_name=None, allow_public = False, key=None, resume=False):
 		"""Upload a file to an S3 bucket. `key` is the object key; when omitted it mirrors
 		Frappe's own layout — files/<name> (public) / private/files/<name> (private) — with
 		a collision-safe suffix, so the S3 path matches how Frappe stores the file."""
 		if not bucket_name:
 			frappe.throw("Please provide a bucket name")
-		# Validate non-empty + compute content hash WITHOUT loading the whole file in memory
-		file.stream.seek(0)
-		hasher = hashlib.md5()
-		total = 0
-		for chunk in iter(lambda: file.stream.read(8192), b""):
-			total += len(chunk)
-			hasher.update(chunk)
-		if total == 0:
+		if not self._stream_has_bytes(file.stream):
 			frappe.throw("Cannot upload an empty file")
-		content_hash = hasher.hexdigest()
-		file.stream.seek(0)
 		try:
-			if not key:
-				# No Frappe path supplied (direct API upload): build one the Frappe way.
-				prefix = "files" if allow_public else "private/files"
-				key = f"{prefix}/{_s3_safe_filename(file.filename)}"
-			# ALWAYS collision-guard the key — even a caller-supplied one. This app deletes
-			# local copies after migrating, so a recycled generic filename (report.pdf) can
-			# map two DIFFERENT files to the same url-derived key; without this the second
-			# upload would OVERWRITE the first object and the first File doc would then serve
-			# the wrong content. Legitimate dedup never reaches here (it reuses the sibling).
-			key = self._unique_key(bucket_name, key)
-			content_type = getattr(file, "content_type", None) or _guess_content_type(file.filename)
-			extra_args = {"ContentType": content_type}
-			if allow_public:
-				extra_args["ACL"] = "public-read"
-			self.connection.upload_fileobj(
-				Fileobj=file,
-				Bucket=bucket_name,
-				Key=key,
-				ExtraArgs=extra_args,
-			)
-			region = self.connection.meta.region_name
-			file_url = _s3_https_url(bucket_name, key, region)
-			return {
-				"file_url": file_url,
-				"key" : key,
-				"bucket_name" : bucket_name,
-				"content_hash": content_hash,
-			}
+			return self.put_file(file, bucket_name, allow_public=allow_public, key=key, resume=resume)
 		except Exception as e:
 			frappe.log_error(f"Error uploading file: {str(e)}")
 			return False
+
+	@staticmethod
+	def _stream_has_bytes(stream):
+		"""Cheap non-empty check: peek one byte, then rewind."""
+		stream.seek(0)
+		has_bytes = bool(stream.read(1))
+		stream.seek(0)
+		return has_bytes
+
+	def put_file(self, file, bucket_name, allow_public=False, key=None, resume=False):
+		"""Raising core of upload_file_to_bucket: hash, collision-guard and upload, with no
+		frappe.db / frappe.local access — so it is safe on a worker thread (the migration
+		sweep's upload pool). Failures raise to the caller instead of being logged here.
+
+		Files of multipart_threshold or more go through _multipart_upload; `resume=True`
+		(the migration sweep, whose key is derived from the File's own url) lets it pick up
+		an interrupted upload of the same key instead of re-sending every byte."""
+		# Size from the file's end offset — no read. The bytes themselves are read exactly
+		# once, through _HashingReader, which folds them into the content hash on the way.
+		file.stream.seek(0, os.SEEK_END)
+		total = file.stream.tell()
+		file.stream.seek(0)
+		if total == 0:
+			raise frappe.ValidationError("Cannot upload an empty file")
+		if not key:
+			# No Frappe path supplied (direct API upload): build one the Frappe way.
+			prefix = "files" if allow_public else "private/files"
+			key = f"{prefix}/{_s3_safe_filename(file.filename)}"
+		# ALWAYS collision-guard the key — even a caller-supplied one. This app deletes
+		# local copies after migrating, so a recycled generic filename (report.pdf) can
+		# map two DIFFERENT files to the same url-derived key; without this the second
+		# upload would OVERWRITE the first object and the first File doc would then serve
+		# the wrong content. Legitimate dedup never reaches here (it reuses the sibling).
+		multipart = total >= self.multipart_threshold
+		key = self._unique_key(bucket_name, key, probe=multipart)
+		content_type = getattr(file, "content_type", None) or _guess_content_type(file.filename)
+		extra_args = {"ContentType": content_type}
+		cache_control = self.cache_control_for(bucket_name, key)
+		if cache_control:
+			extra_args["CacheControl"] = cache_control
+		if allow_public:
+			extra_args["ACL"] = "public-read"
+		reader = _HashingReader(file.stream)
+		if multipart:
+			self._multipart_upload(reader, bucket_name, key, total, extra_args, resume=resume)
+		else:
+			# Below the threshold the body is held in memory (so the threshold also bounds
+			# per-upload memory): a retry re-sends these bytes instead of re-reading the file,
+			# and S3 checks them against ContentMD5.
+			body = reader.read()
+			if not body:
+				raise frappe.ValidationError("Cannot upload an empty file")
+			content_md5 = base64.b64encode(reader.md5.digest()).decode()
+			while True:
+				try:
+					self._put_if_absent(bucket_name, key, body, content_md5, extra_args)
+					break
+				except ClientError as e:
+					if not _precondition_failed(e):
+						raise
+					# The index missed a key written elsewhere: remember it, take a new one.
+					_key_index.add(bucket_name, key)
+					key = self._unique_key(bucket_name, key)
+		_key_index.add(bucket_name, key)
+		content_hash = reader.hexdigest()
+		region = self.connection.meta.region_name
+		file_url = _s3_https_url(bucket_name, key, region, self.cdn_base_url_for(bucket_name))
+		return {
+			"file_url": file_url,
+			"key" : key,
+			"bucket_name" : bucket_name,
+			"content_hash": content_hash,
+		}
 	
-	def get_file_from_bucket(self, key, bucket_name):
-		object = self.connection.get_object(Bucket = bucket_name, Key=key)
+	def _put_if_absent(self, bucket_name, key, body, content_md5, extra_args):
+		"""put_object that never overwrites: If-None-Match: * makes S3 refuse (412) when the
+		key already exists. A store that rejects the header is remembered and then written
+		unconditionally, its keys having been HEAD-probed by _unique_key."""
+		params = dict(Bucket=bucket_name, Key=key, Body=body, ContentMD5=content_md5, **extra_args)
+		if bucket_name not in _key_index.unconditional:
+			try:
+				return self.connection.put_object(IfNoneMatch="*", **params)
+			except ClientError as e:
+				if not _conditional_unsupported(e):
+					raise
+				_key_index.unconditional.add(bucket_name)
+				if self.verify_object(bucket_name, key):
+					raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+		return self.connection.put_object(**params)
+
+	def _multipart_upload(self, stream, bucket_name, key, total, extra_args, resume=False):
+		"""Explicit multipart upload: parts of multipart_chunksize sent on up to
+		multipart_concurrency threads, at most that many parts held in memory.
+
+		Resume state lives in S3 itself — the open upload for `key` and its uploaded parts
+		(list_multipart_uploads / list_parts) — so it survives a killed worker and needs no
+		frappe.db, keeping this safe on a sweep thread. A part is skipped only when the
+		part already in S3 has the same size AND the MD5 of our local bytes (its ETag), so
+		a changed file or a changed part size just re-sends the parts that differ. A failed
+		resumable upload is left open for the next run; a non-resumable one is aborted.
+		(Pair with a bucket lifecycle rule that aborts incomplete uploads after N days.)"""
+		part_size = max(self.multipart_chunksize, -(-total // MULTIPART_MAX_PARTS))
+		upload_id, done = (self._open_multipart_upload(bucket_name, key) if resume else (None, {}))
+		if not upload_id:
+			upload_id = self.connection.create_multipart_upload(
+				Bucket=bucket_name, Key=key, **extra_args)["UploadId"]
+		parts = {}
+		pool = ThreadPoolExecutor(max_workers=self.multipart_concurrency, thread_name_prefix="s3-part")
+		try:
+			in_flight = set()
+			number = 0
+			for chunk in iter(lambda: stream.read(part_size), b""):
+				number += 1
+				etag = '"%s"' % hashlib.md5(chunk).hexdigest()
+				if done.get(number) == (len(chunk), etag):
+					parts[number] = etag
+					continue
+				if len(in_flight) >= self.multipart_concurrency:
+					finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+					for fut in finished:
+						parts.update([fut.result()])
+				in_flight.add(pool.submit(self._upload_part, bucket_name, key, upload_id, number, chunk))
+			for fut in in_flight:
+				parts.update([fut.result()])
+			complete = dict(
+				Bucket=bucket_name, Key=key, UploadId=upload_id,
+				MultipartUpload={"Parts": [{"PartNumber": n, "ETag": parts[n]} for n in sorted(parts)]},
+			)
+			if bucket_name not in _key_index.unconditional:
+				complete["IfNoneMatch"] = "*"   # never overwrite a key written meanwhile
+			self.connection.complete_multipart_upload(**complete)
+		except ClientError as e:
+			if not resume or _precondition_failed(e):
+				self._abort_multipart(bucket_name, key, upload_id)
+			raise
+		except Exception:
+			if not resume:
+				self._abort_multipart(bucket_name, key, upload_id)
+			raise
+		finally:
+			pool.shutdown(wait=False, cancel_futures=True)
+
+	def _abort_multipart(self, bucket_name, key, upload_id):
+		try:
+			self.connection.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+		except Exception:
+			pass
+
+	def _upload_part(self, bucket_name, key, upload_id, number, chunk):
+		resp = self.connection.upload_part(
+			Bucket=bucket_name, Key=key, UploadId=upload_id, PartNumber=number, Body=chunk)
+		return number, resp["ETag"]
+
+	def _open_multipart_upload(self, bucket_name, key):
+		"""(upload_id, {part_number: (size, etag)}) of the newest unfinished multipart upload
+		of exactly `key`, or (None, {}) when there is none to resume."""
+		resp = self.connection.list_multipart_uploads(Bucket=bucket_name, Prefix=key)
+		uploads = [u for u in resp.get("Uploads", []) if u.get("Key") == key]
+		if not uploads:
+			return None, {}
+		upload_id = max(uploads, key=lambda u: u["Initiated"])["UploadId"]
+		done = {}
+		paginator = self.connection.get_paginator("list_parts")
+		for page in paginator.paginate(Bucket=bucket_name, Key=key, UploadId=upload_id):
+			for part in page.get("Parts", []):
+				done[part["PartNumber"]] = (part["Size"], part["ETag"])
+		return upload_id, done
+
+	def get_file_from_bucket(self, key, bucket_name, **params):
+		"""get_object; `params` are passed through (Range, IfNoneMatch, IfModifiedSince...)."""
+		object = self.connection.get_object(Bucket = bucket_name, Key=key, **params)
 		return object
 
 	def verify_object(self, bucket_name, key, expected_size=None):
@@ -326,14 +825,39 @@ class S3Connection:
 			for obj in page.get("Contents", []):
 				yield obj
 
+	def iter_objects(self, bucket_name, prefix=None, use_inventory=True):
+		"""Object listing for the bulk jobs: the bucket's S3 Inventory report when one is
+		configured, else list_objects. A report that is missing, unreadable or too old is
+		logged and replaced by a live listing, as long as it failed before its first row."""
+		from frappe_s3_integration.s3_core.inventory import iter_inventory
+
+		source = self.inventory_source_for(bucket_name) if use_inventory else None
+		if source:
+			started = False
+			try:
+				for obj in iter_inventory(self, source, bucket=bucket_name, prefix=prefix):
+					started = True
+					yield obj
+				return
+			except Exception:
+				if started:
+					raise
+				frappe.log_error(frappe.get_traceback(), f"S3 Inventory unusable for {bucket_name}: listing instead")
+		yield from self.list_objects(bucket_name, prefix=prefix)
+
 	def download_object(self, bucket_name, key, dest_path):
 		"""Download one object to a local path (used by the read-only backup job)."""
-		self.connection.download_file(bucket_name, key, dest_path)
+		self.connection.download_file(bucket_name, key, dest_path, Config=self.transfer_config())
 		
 
 	def update_file_in_bucket(self, file, bucket_name, key, allow_public=False, content_type=None):
-		
+		"""Overwrite the object at `key` in place. The bucket's Cache-Control is applied
+		without `immutable` and with a capped max-age (_rewrite_cache_control): the key now
+		serves different bytes than any copy cached before."""
 		extra_args = {"ContentType": content_type or _guess_content_type(key)}
+		cache_control = _rewrite_cache_control(self.cache_control_for(bucket_name, key))
+		if cache_control:
+			extra_args["CacheControl"] = cache_control
 		if allow_public:
 			extra_args["ACL"] = "public-read"
 		self.connection.upload_fileobj(
@@ -341,7 +865,9 @@ class S3Connection:
 			Bucket=bucket_name,
 			Key=key,
 			ExtraArgs=extra_args,
+			Config=self.transfer_config(),
 		)
+		_key_index.add(bucket_name, key)
 
 	def copy_object_to_bucket(self, src_bucket, src_key, dest_bucket, filename, make_public):
 		"""Server-side copy into another bucket (visibility toggle). Mirror Frappe: the
@@ -355,9 +881,15 @@ class S3Connection:
 			"Key": new_key,
 			"CopySource": {"Bucket": src_bucket, "Key": src_key},
 		}
+		# The object takes the DESTINATION bucket's Cache-Control — never carry a public
+		# "max-age / immutable" policy onto a private object (or the reverse). REPLACE
+		# drops unspecified metadata, so type / disposition / user metadata are carried.
+		head = self.connection.head_object(Bucket=src_bucket, Key=src_key)
+		params.update(_replace_metadata(head, self.cache_control_for(dest_bucket, new_key)))
 		if make_public:
 			params["ACL"] = "public-read"
 		self.connection.copy_object(**params)
+		_key_index.add(dest_bucket, new_key)
 		return new_key
 
 	def delete_file_from_bucket(self, file_name, bucket_name=None):
@@ -368,10 +900,35 @@ class S3Connection:
 			frappe.throw("Please provide a bucket name")
 		try:
 			self.connection.delete_object(Bucket=bucket_name, Key=file_name)
+			_key_index.discard(bucket_name, file_name)
 			return False
 		except Exception as e:
 			error_log = frappe.log_error(f"Error deleting file: {str(e)}")
 			return error_log.name
+
+	def delete_files_from_bucket(self, keys, bucket_name):
+		"""Delete many keys with DeleteObjects, DELETE_BATCH_SIZE per request. Returns
+		{key: "Code: Message"} for the keys S3 refused; every other key is gone (a key
+		that was already absent counts as deleted, as with delete_object)."""
+		errors = {}
+		keys = list(dict.fromkeys(keys))
+		for start in range(0, len(keys), DELETE_BATCH_SIZE):
+			chunk = keys[start:start + DELETE_BATCH_SIZE]
+			try:
+				resp = self.connection.delete_objects(
+					Bucket=bucket_name,
+					Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+				)
+			except ClientError as e:
+				msg = f"{_s3_error_code(e)}: {e}"
+				errors.update((k, msg) for k in chunk)
+				continue
+			failed = {err["Key"]: f"{err.get('Code')}: {err.get('Message')}" for err in resp.get("Errors") or []}
+			errors.update(failed)
+			for k in chunk:
+				if k not in failed:
+					_key_index.discard(bucket_name, k)
+		return errors
 		
 	def validate_file_size(self, file, is_public = False):
 		bucket = None
@@ -478,6 +1035,7 @@ def handle_is_private_change(doc, event=None, *args):
 		"custom_s3_key": new_key,
 		"file_url": get_proxy_url(doc.name, doc.file_name),
 	})
+	clear_file_meta(doc.name)
 	doc.custom_s3_bucket_name = dest_bucket
 	doc.custom_s3_key = new_key
 
@@ -567,17 +1125,32 @@ def child_attach_repoint(parent_doctype, parent_name, field, expected_url, proxy
 	return n
 
 
-def _s3_https_url(bucket, key, region):
+def _s3_https_url(bucket, key, region, cdn_base_url=None):
 	"""Path-style S3 URL: https://s3.<region>.amazonaws.com/<bucket>/<key>.
 	Path-style (bucket in the PATH, not the hostname) is REQUIRED for buckets whose name
 	contains dots (e.g. hr.essdee.fit.public): a virtual-hosted url like
 	<bucket>.s3.<region>.amazonaws.com breaks HTTPS — the wildcard cert *.s3... doesn't
-	cover the extra dotted labels — so the browser fails / mis-redirects."""
+	cover the extra dotted labels — so the browser fails / mis-redirects.
+
+	With the bucket's CDN Base URL (CloudFront or any reverse proxy whose origin is the
+	bucket) the object is addressed through the CDN instead: <cdn_base_url>/<key>."""
 	from urllib.parse import quote
 
+	if cdn_base_url:
+		return f"{cdn_base_url.rstrip('/')}/{quote(key, safe='/')}"
 	return f"https://s3.{region}.amazonaws.com/{bucket}/{quote(key, safe='/')}"
 
 
+@frappe.whitelist()
+def get_pre_signed_urls(files, content_type=None):
+	"""Pre-signed urls for many Files in one call (portal grids, galleries):
+	{file name: url or None}. `files` is a list of File names (or its JSON)."""
+	files = frappe.parse_json(files) if isinstance(files, str) else files
+	if not isinstance(files, (list, tuple)):
+		frappe.throw("files must be a list of File names")
+	return getS3Connection().get_pre_signed_urls(files, content_type=content_type)
+
+
 @frappe.whitelist(allow_guest=True)
 def serve_file(file_id=None):
 	"""
@@ -588,10 +1161,7 @@ def serve_file(file_id=None):
 	if not file_id:
 		raise frappe.exceptions.NotFound
 
-	file_doc = frappe.db.get_value("File", file_id,
-		["name", "file_name", "is_private", "custom_s3_key",
-		 "custom_s3_bucket_name", "custom_is_s3_uploaded"],
-		as_dict=True)
+	file_doc = get_file_meta(file_id)
 
 	if not file_doc or not file_doc.custom_is_s3_uploaded or not file_doc.custom_s3_key:
 		raise frappe.exceptions.NotFound
@@ -600,59 +1170,247 @@ def serve_file(file_id=None):
 	if file_doc.is_private:
 		if frappe.session.user == "Guest":
 			raise frappe.PermissionError
+		# File's has_permission only reads owner / is_private / attached_to_*, all in the
+		# cached metadata — no full File doc load.
 		from frappe.core.doctype.file.file import has_permission as file_has_permission
-		full_doc = frappe.get_doc("File", file_id)
-		if not file_has_permission(full_doc, "read"):
+		if not file_has_permission(file_doc, "read"):
 			raise frappe.PermissionError
 
+		conn = getS3Connection()
+		mode = conn.private_serve_mode(file_doc.custom_s3_bucket_name, file_doc.file_size)
+		if mode == "Presigned Redirect":
+			return _redirect_to_s3(file_doc, conn)
+		if mode == "Nginx Accel Redirect":
+			return _accel_redirect_to_s3(file_doc, conn)
 		return _stream_from_s3(file_doc)
 
-	# Public files — redirect to the direct S3 URL (no server bandwidth used).
-	# Build from settings (not conn.connection) so it still works when the
-	# disable_s3_operations kill switch is ON — public objects stay reachable.
-	conn = getS3Connection()
-	region = conn.s3_settings.region
-	# Path-style url — dotted bucket names (hr.essdee.fit.public) can't use virtual-hosted.
-	s3_url = _s3_https_url(file_doc.custom_s3_bucket_name, file_doc.custom_s3_key, region)
+	# Public files — redirect to the direct S3 URL (no server bandwidth used), built
+	# when the metadata was cached (see get_file_meta).
+	from werkzeug.utils import redirect
+	response = redirect(file_doc.public_url, code=302)
+	response.headers["Cache-Control"] = f"public, max-age={PUBLIC_REDIRECT_MAX_AGE}"
+	return response
+
+
+def get_file_meta(file_id):
+	"""What serve_file needs to know about a File, from redis (one round trip) instead of
+	the database. Cleared by clear_file_meta on every write that can change it — File
+	on_update / on_trash and the migration / normalize paths that write with db.set_value —
+	and wholesale when AWS S3 Settings is saved. None for a missing File (not cached)."""
+	cache_key = f"{FILE_META_PREFIX}:{file_id}"
+	meta = frappe.cache().get_value(cache_key)
+	if meta:
+		return frappe._dict(meta)
+	meta = frappe.db.get_value("File", file_id, _FILE_META_FIELDS, as_dict=True)
+	if not meta:
+		return None
+	if not meta.is_private and meta.custom_s3_key:
+		# Public files — build from settings (not conn.connection) so it still works when
+		# the disable_s3_operations kill switch is ON — public objects stay reachable.
+		# Path-style url — dotted bucket names (hr.essdee.fit.public) can't use virtual-hosted.
+		conn = getS3Connection()
+		meta.public_url = _s3_https_url(meta.custom_s3_bucket_name, meta.custom_s3_key,
+		                                conn.s3_settings.region, conn.cdn_base_url_for(meta.custom_s3_bucket_name))
+	frappe.cache().set_value(cache_key, dict(meta), expires_in_sec=FILE_META_TTL)
+	return meta
+
+
+def clear_file_meta(*file_names):
+	"""Drop cached serve_file metadata — now, and again once the transaction commits, so
+	a request that read the old row in between can't leave it cached."""
+	keys = [f"{FILE_META_PREFIX}:{name}" for name in file_names]
+	if not keys:
+		return
+
+	def clear():
+		for key in keys:
+			frappe.cache().delete_value(key)
+
+	clear()
+	frappe.db.after_commit.add(clear)
+
+
+def clear_all_file_meta():
+	"""Settings changed (region, buckets, CDN): every cached public / signed url may be stale."""
+	frappe.cache().delete_keys(f"{FILE_META_PREFIX}:")
+	frappe.cache().delete_keys(f"{PRESIGN_CACHE_PREFIX}:")
+
+
+def invalidate_file_meta(doc, event=None, *args):
+	"""File.on_update / on_trash hook."""
+	clear_file_meta(doc.name)
+
+
+def _redirect_to_s3(file_doc, conn):
+	"""302 to a short-lived presigned url (permission already checked by serve_file), so
+	the bytes flow S3 -> browser without holding a web worker. The redirect itself must
+	not be cached past the signature's life."""
+	url = _private_presigned_url(file_doc, conn)
+	if not url:
+		return _stream_from_s3(file_doc)  # signing failed (logged): fall back to streaming
 
 	from werkzeug.utils import redirect
-	return redirect(s3_url, code=302)
+	response = redirect(url, code=302)
+	response.headers["Cache-Control"] = "private, no-store"
+	return response
+
+
+def _accel_redirect_to_s3(file_doc, conn):
+	"""Hand the transfer to nginx: an empty response whose X-Accel-Redirect sends it to the
+	internal S3-proxy location, which fetches the presigned url, so this worker is free as
+	soon as the permission check is done while the browser still only ever talks to this
+	site. nginx forwards the client's Range / validators; S3 sets type + disposition from
+	the url.
+
+	The url goes in its own header, not in the X-Accel-Redirect path: nginx decodes that
+	path, so a key with a space, "+", "%" or non-ASCII would reach S3 re-encoded differently
+	from what was signed. A header is proxied exactly as sent."""
+	url = _private_presigned_url(file_doc, conn)
+	if not url:
+		return _stream_from_s3(file_doc)
+	from werkzeug.wrappers import Response
+
+	response = Response()
+	response.headers["X-Accel-Redirect"] = (conn.s3_settings.get("accel_location") or ACCEL_LOCATION).rstrip("/")
+	response.headers[ACCEL_URL_HEADER] = url
+	response.headers["X-Accel-Buffering"] = "no"
+	return response
+
+
+def _private_presigned_url(file_doc, conn):
+	if conn.s3_settings.disable_s3_operations:
+		from werkzeug.exceptions import ServiceUnavailable
+		raise ServiceUnavailable("S3 file access is temporarily disabled")
+	return conn.generate_temporary_url(
+		bucket_name=file_doc.custom_s3_bucket_name,
+		key=file_doc.custom_s3_key,
+		expires_in=PRIVATE_REDIRECT_EXPIRES,
+		content_type=_guess_content_type(file_doc.file_name),
+		filename=file_doc.file_name,
+	)
+
+
+def _content_disposition(filename, inline=True):
+	"""Content-Disposition that survives any filename: an ASCII fallback plus the RFC 6266
+	filename* form, so non-Latin names neither break the header nor get mangled."""
+	kind = "inline" if inline else "attachment"
+	fallback = unicodedata.normalize("NFKD", filename or "").encode("ascii", "ignore").decode()
+	fallback = fallback.replace('"', "").replace("\\", "") or "file"
+	return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename or 'file', safe='')}"
 
 
 def _stream_from_s3(file_doc):
-	"""Stream private file content from S3 through the server."""
+	"""Stream private file content from S3 through the server.
+
+	The client's Range and validators (If-None-Match / If-Modified-Since / If-Range) are
+	forwarded to S3, so a seek in a video fetches only that range (206) and an unchanged
+	image costs a 304 instead of a full download; ETag / Last-Modified are passed back."""
 	conn = getS3Connection()
 	if conn.s3_settings.disable_s3_operations:
 		from werkzeug.exceptions import ServiceUnavailable
 		raise ServiceUnavailable("S3 file access is temporarily disabled")
 
+	from werkzeug.wrappers import Response
+
+	params = _conditional_get_params(getattr(frappe.local, "request", None))
 	try:
-		s3_obj = conn.get_file_from_bucket(
-			file_doc.custom_s3_key, file_doc.custom_s3_bucket_name
-		)
+		try:
+			s3_obj = conn.get_file_from_bucket(
+				file_doc.custom_s3_key, file_doc.custom_s3_bucket_name, **params
+			)
+		except ClientError as e:
+			# If-Range failed (object changed since the client's partial copy): RFC 9110
+			# says send the whole current object, not an error.
+			if _s3_error_code(e) not in ("412", "PreconditionFailed") or "Range" not in params:
+				raise
+			params = {k: v for k, v in params.items() if k not in ("Range", "IfMatch", "IfUnmodifiedSince")}
+			s3_obj = conn.get_file_from_bucket(
+				file_doc.custom_s3_key, file_doc.custom_s3_bucket_name, **params
+			)
 	except ClientError as e:
-		code = str(e.response.get("Error", {}).get("Code", ""))
+		code = _s3_error_code(e)
 		if code in ("404", "NoSuchKey", "NoSuchBucket", "NotFound"):
 			raise frappe.exceptions.NotFound
+		if code in ("304", "NotModified"):
+			response = Response(status=304)
+			headers = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+			for name in ("ETag", "Last-Modified"):
+				if headers.get(name.lower()):
+					response.headers[name] = headers[name.lower()]
+			response.headers["Cache-Control"] = "private, no-cache"
+			return response
+		if code in ("416", "InvalidRange"):
+			return Response(status=416)
 		raise
 
 	content_type = s3_obj.get("ContentType")
 	if not content_type or content_type in ("binary/octet-stream", "application/octet-stream"):
 		content_type = mimetypes.guess_type(file_doc.file_name)[0] or "application/octet-stream"
 
-	from werkzeug.wrappers import Response
+	first = cint(conn.s3_settings.get("stream_chunk_size")) * 1024 or STREAM_CHUNK_MIN
+	largest = max(first, cint(conn.s3_settings.get("stream_max_chunk_size")) * 1024 or STREAM_CHUNK_MAX)
 
 	def stream_body():
+		# Adaptive reads: small first chunk for fast first bytes, then doubling up to
+		# `largest`, so a big object takes hundreds of iterations, not tens of thousands.
 		body = s3_obj["Body"]
-		while True:
-			chunk = body.read(8192)
-			if not chunk:
-				break
-			yield chunk
+		size = first
+		try:
+			while True:
+				chunk = body.read(size)
+				if not chunk:
+					break
+				yield chunk
+				size = min(size * 2, largest)
+		finally:
+			body.close()  # hand the HTTP connection back to the pool even on client abort
 
 	response = Response(stream_body(), content_type=content_type)
-	response.headers["Content-Disposition"] = f'inline; filename="{file_doc.file_name}"'
+	response.headers["Content-Disposition"] = _content_disposition(file_doc.file_name)
+	response.headers["Accept-Ranges"] = "bytes"
+	# Private: browsers may keep a copy but must revalidate it (-> cheap 304s).
+	response.headers["Cache-Control"] = "private, no-cache"
+	if s3_obj.get("ContentLength") is not None:
+		response.headers["Content-Length"] = str(s3_obj["ContentLength"])
+	if s3_obj.get("ContentRange"):
+		response.status_code = 206
+		response.headers["Content-Range"] = s3_obj["ContentRange"]
+	if s3_obj.get("ETag"):
+		response.headers["ETag"] = s3_obj["ETag"]
+	if s3_obj.get("LastModified"):
+		from werkzeug.http import http_date
+		response.headers["Last-Modified"] = http_date(s3_obj["LastModified"])
 	return response
 
 
+def _conditional_get_params(request):
+	"""get_object params for the client's Range / conditional headers (None-safe)."""
+	if request is None:
+		return {}
+	from werkzeug.http import parse_date
+
+	headers = request.headers
+	params = {}
+	if headers.get("Range", "").startswith("bytes="):
+		params["Range"] = headers["Range"]
+		if_range = headers.get("If-Range")
+		if if_range:
+			if if_range.startswith('"'):
+				params["IfMatch"] = if_range
+			elif parse_date(if_range):
+				params["IfUnmodifiedSince"] = parse_date(if_range)
+			else:
+				del params["Range"]  # weak / unparseable validator never satisfies If-Range
+	if headers.get("If-None-Match"):
+		params["IfNoneMatch"] = headers["If-None-Match"]
+	elif headers.get("If-Modified-Since") and parse_date(headers["If-Modified-Since"]):
+		# RFC 9110: If-Modified-Since is ignored when If-None-Match is present.
+		params["IfModifiedSince"] = parse_date(headers["If-Modified-Since"])
+	return params
+
+
+def _s3_error_code(e):
+	return str(e.response.get("Error", {}).get("Code", ""))
+
+
 connection = {}
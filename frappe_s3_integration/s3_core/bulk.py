@@ -0,0 +1,187 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and contributors
+# For license information, please see license.txt
+"""Asyncio engine for the bulk maintenance tools (normalize, local cleanup, sibling sync,
+hash and metadata backfills), which otherwise issue one blocking HEAD/COPY/GET at a time.
+
+boto3 is blocking and its clients are thread-safe, so each call runs on the connection's
+own client in a thread pool; asyncio only schedules them. A semaphore bounds the requests
+in flight and an optional token bucket caps the request rate. Calls run without frappe
+context: submit S3 work only, and apply DB writes on the caller's thread from the results.
+
+	engine = BulkS3(conn)
+	for f, verified in engine.prefetch(files, lambda f: partial(conn.verify_object, ...)):
+		if verified():   # the call's result, or its exception re-raised here
+			...
+
+DeleteBatch collects the keys a job has released and deletes them with DeleteObjects,
+a thousand per request, instead of one DELETE each.
+
+Concurrency: AWS S3 Settings > Bulk Concurrency (site_config s3_bulk_concurrency),
+defaulting to the client's connection pool. Rate: Bulk Rate Limit in requests/second
+(site_config s3_bulk_rate_limit), 0 = unlimited.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from frappe.utils import cint, flt
+
+from frappe_s3_integration.s3_core import DEFAULT_POOL_CONNECTIONS, DELETE_BATCH_SIZE
+
+try:
+	from rq.timeouts import JobTimeoutException
+except Exception:  # pragma: no cover
+	class JobTimeoutException(Exception):
+		pass
+
+BATCH_SIZE = 1000  # calls scheduled per asyncio.run; bounds memory on 500k-row tools
+
+
+def bulk_concurrency(settings):
+	return max(1, cint(frappe.get_conf().get("s3_bulk_concurrency"))
+	           or cint(settings.get("bulk_concurrency"))
+	           or cint(settings.get("max_pool_connections"))
+	           or DEFAULT_POOL_CONNECTIONS)
+
+
+def bulk_rate_limit(settings):
+	return max(0.0, flt(frappe.get_conf().get("s3_bulk_rate_limit")) or flt(settings.get("bulk_rate_limit")))
+
+
+class _RateLimiter:
+	"""Token bucket refilled at `rate` tokens/second, holding one second's worth (at least
+	one token, so sub-1/s rates still make progress)."""
+
+	def __init__(self, rate):
+		self.rate = rate
+		self.burst = max(1.0, rate)
+		self.tokens = self.burst
+		self.stamp = time.monotonic()
+		self.lock = asyncio.Lock()
+
+	async def acquire(self):
+		async with self.lock:
+			while True:
+				now = time.monotonic()
+				self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+				self.stamp = now
+				if self.tokens >= 1:
+					self.tokens -= 1
+					return
+				await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BulkS3:
+	def __init__(self, conn, concurrency=None, rate=None):
+		self.conn = conn
+		settings = conn.s3_settings
+		self.concurrency = max(1, cint(concurrency)) if concurrency else bulk_concurrency(settings)
+		self.rate = max(0.0, flt(rate)) if rate is not None else bulk_rate_limit(settings)
+
+	def run(self, calls):
+		"""Run zero-argument callables and return their results in order. A call that
+		raised contributes its exception instead of a result, so one failed object never
+		aborts the batch; the caller decides what an exception means."""
+		calls = list(calls)
+		if not calls:
+			return []
+		if self.concurrency == 1 and not self.rate:
+			return [_capture(call) for call in calls]
+		return asyncio.run(self._gather(calls))
+
+	async def _gather(self, calls):
+		loop = asyncio.get_running_loop()
+		in_flight = asyncio.Semaphore(self.concurrency)
+		limiter = _RateLimiter(self.rate) if self.rate else None
+
+		with ThreadPoolExecutor(max_workers=min(self.concurrency, len(calls)),
+		                        thread_name_prefix="s3-bulk") as pool:
+			async def one(call):
+				async with in_flight:
+					if limiter:
+						await limiter.acquire()
+					return await loop.run_in_executor(pool, _capture, call)
+
+			return await asyncio.gather(*(one(call) for call in calls))
+
+	def prefetch(self, items, make_call):
+		"""Yield (item, fetched) for every item, in order. `make_call(item)` runs on the
+		caller's thread and returns the S3 call for that item, or None for no call;
+		BATCH_SIZE items' calls run concurrently before any of them is yielded.
+		`fetched()` returns the call's result (None when there was no call) or re-raises
+		its exception, so it drops into a per-item try/except where the blocking call was.
+		"""
+		batch = []
+		for item in items:
+			batch.append(item)
+			if len(batch) >= BATCH_SIZE:
+				yield from self._fetch_batch(batch, make_call)
+				batch = []
+		if batch:
+			yield from self._fetch_batch(batch, make_call)
+
+	def _fetch_batch(self, batch, make_call):
+		calls = [_capture(lambda item=item: make_call(item)) for item in batch]
+		pending = [i for i, call in enumerate(calls) if callable(call)]
+		results = dict(zip(pending, self.run(calls[i] for i in pending)))
+		for i, item in enumerate(batch):
+			yield item, _Fetched(results[i] if i in results else calls[i])
+
+
+class DeleteBatch:
+	"""Keys queued per bucket and deleted DELETE_BATCH_SIZE at a time. Only queue a key
+	once nothing references it (its DB repoint is committed): a job that dies before the
+	final flush() leaves those objects behind as orphans, never a dangling pointer.
+	flush() returns {(bucket, key): error} for keys S3 refused, and the job logs them."""
+
+	def __init__(self, conn, size=DELETE_BATCH_SIZE):
+		self.conn = conn
+		self.size = size
+		self.pending = {}  # bucket -> [key, ...]
+		self.deleted = self.failed = 0
+
+	def add(self, bucket, key):
+		"""Queue one key; returns the errors of the flush this triggered ({} if none)."""
+		keys = self.pending.setdefault(bucket, [])
+		keys.append(key)
+		if len(keys) >= self.size:
+			return self._flush_bucket(bucket)
+		return {}
+
+	def flush(self):
+		errors = {}
+		for bucket in list(self.pending):
+			errors.update(self._flush_bucket(bucket))
+		return errors
+
+	def _flush_bucket(self, bucket):
+		keys = self.pending.pop(bucket, [])
+		if not keys:
+			return {}
+		failed = self.conn.delete_files_from_bucket(keys, bucket) or {}
+		self.deleted += len(set(keys)) - len(failed)
+		self.failed += len(failed)
+		return {(bucket, key): err for key, err in failed.items()}
+
+
+class _Fetched:
+	__slots__ = ("value",)
+
+	def __init__(self, value):
+		self.value = value
+
+	def __call__(self):
+		if isinstance(self.value, BaseException):
+			raise self.value
+		return self.value
+
+
+def _capture(call):
+	try:
+		return call()
+	except JobTimeoutException:
+		raise  # the job's deadline, not the object's failure: stop the batch
+	except Exception as e:
+		return e
@@ -0,0 +1,209 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and contributors
+# For license information, please see license.txt
+"""S3 Inventory reports as an object listing for the bulk jobs.
+
+Paginating ListObjectsV2 over a very large bucket takes hours; the bucket's daily or
+weekly S3 Inventory report holds the same rows. Set **Inventory Source** on a bucket
+row and S3Connection.iter_objects() streams the report instead of listing the bucket.
+Accepted sources:
+
+  s3://<dest-bucket>/<prefix>/<source-bucket>/<config-id>/       newest manifest.json below
+  s3://<dest-bucket>/.../<yyyy-mm-ddThh-mmZ>/manifest.json        that report
+  /abs/path/or/site-relative/manifest.json | inventory.csv[.gz] | inventory.parquet
+
+Rows come out shaped like list_objects entries (Key, Size, ETag, StorageClass,
+LastModified, plus ContentType when a locally supplied file carries that column).
+Manifests list gzipped CSV, Parquet or ORC data files; Parquet and ORC need pyarrow,
+which is optional and only imported for those formats. CSV data files have no header
+row, their columns follow the manifest's fileSchema, and keys are URL-encoded. A local
+CSV without a manifest may start with a header row; without one, the default inventory
+columns are assumed.
+
+A report is a snapshot of the bucket at its creation time. Anything older than
+INVENTORY_MAX_AGE is ignored in favour of a live listing, and consumers must tolerate
+keys deleted since the report was taken.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus, urlparse
+
+import frappe
+
+INVENTORY_MAX_AGE = 8 * 24 * 3600  # a weekly report plus a day's slack
+DEFAULT_CSV_SCHEMA = ["Bucket", "Key", "Size", "LastModifiedDate", "ETag", "StorageClass"]
+_SPOOL_MAX = 64 * 1024 * 1024  # Parquet/ORC data files are spooled (readers need seeks)
+
+
+class InventoryError(Exception):
+	pass
+
+
+def iter_inventory(conn, source, bucket=None, prefix=None, max_age=INVENTORY_MAX_AGE):
+	"""Yield list_objects-shaped dicts for `bucket` from an inventory source. Raises
+	InventoryError when the source can't be found, parsed, or is older than max_age."""
+	for row in _rows(conn, source.strip(), max_age):
+		row_bucket = row.pop("Bucket", None)
+		if bucket and row_bucket and row_bucket != bucket:
+			continue  # a report or local file covering several buckets
+		if prefix and not row["Key"].startswith(prefix):
+			continue
+		yield row
+
+
+def _rows(conn, source, max_age):
+	if source.startswith("s3://"):
+		url = urlparse(source)
+		dest, key = url.netloc, url.path.lstrip("/")
+		if not key.endswith("manifest.json"):
+			key = _latest_manifest(conn, dest, key)
+		body = conn.connection.get_object(Bucket=dest, Key=key)["Body"]
+		try:
+			manifest = json.load(body)
+		finally:
+			body.close()
+		yield from _manifest_rows(conn, manifest, max_age)
+		return
+
+	path = source if os.path.isabs(source) else frappe.get_site_path(source)
+	if not os.path.isfile(path):
+		raise InventoryError(f"inventory file not found: {path}")
+	if path.endswith(".json"):
+		with open(path, "rb") as f:
+			manifest = json.load(f)
+		yield from _manifest_rows(conn, manifest, max_age, local_dir=os.path.dirname(path))
+		return
+	_check_age(os.path.getmtime(path), max_age, path)
+	if path.endswith((".parquet", ".orc")):
+		with open(path, "rb") as f:
+			yield from _columnar_rows(f, path)
+	else:
+		opener = gzip.open if path.endswith(".gz") else open
+		with opener(path, "rt", newline="", encoding="utf-8") as f:
+			yield from _csv_rows(f, schema=None)
+
+
+def _latest_manifest(conn, dest, prefix):
+	"""Newest <timestamp>/manifest.json under an inventory configuration's prefix. The
+	timestamp folder names sort chronologically."""
+	prefix = prefix.rstrip("/") + "/" if prefix else ""
+	manifests = [o["Key"] for o in conn.list_objects(dest, prefix=prefix)
+	             if o["Key"].endswith("/manifest.json") and "/hive/" not in o["Key"]]
+	if not manifests:
+		raise InventoryError(f"no manifest.json under s3://{dest}/{prefix}")
+	return max(manifests)
+
+
+def _manifest_rows(conn, manifest, max_age, local_dir=None):
+	created = manifest.get("creationTimestamp")
+	if created:
+		_check_age(int(created) / 1000.0, max_age, "inventory manifest")
+	fmt = (manifest.get("fileFormat") or "CSV").upper()
+	dest = (manifest.get("destinationBucket") or "").rsplit(":", 1)[-1]
+	schema = [c.strip() for c in (manifest.get("fileSchema") or "").split(",")] if fmt == "CSV" else None
+	for entry in manifest.get("files") or []:
+		local = os.path.join(local_dir, os.path.basename(entry["key"])) if local_dir else None
+		if local and os.path.isfile(local):
+			fileobj = open(local, "rb")  # a report copied next to its manifest
+		else:
+			fileobj = conn.connection.get_object(Bucket=dest, Key=entry["key"])["Body"]
+		try:
+			if fmt == "CSV":
+				text = io.TextIOWrapper(gzip.GzipFile(fileobj=fileobj), encoding="utf-8", newline="")
+				yield from _csv_rows(text, schema=schema or DEFAULT_CSV_SCHEMA, encoded=True)
+			else:
+				with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX) as spool:
+					for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+						spool.write(chunk)
+					spool.seek(0)
+					yield from _columnar_rows(spool, entry["key"])
+		finally:
+			fileobj.close()
+
+
+def _csv_rows(f, schema, encoded=False):
+	reader = csv.reader(f)
+	if schema is None:
+		first = next(reader, None)
+		if first is None:
+			return
+		if "Key" in first:
+			schema = [c.strip() for c in first]
+		else:
+			schema, encoded = DEFAULT_CSV_SCHEMA, True  # a raw inventory data file
+			yield from _shape(dict(zip(schema, first)), encoded)
+	for values in reader:
+		yield from _shape(dict(zip(schema, values)), encoded)
+
+
+def _columnar_rows(f, name):
+	try:
+		if name.endswith(".orc"):
+			from pyarrow import orc
+
+			reader = orc.ORCFile(f)
+			batches = (reader.read_stripe(i) for i in range(reader.nstripes))
+		else:
+			from pyarrow import parquet
+
+			batches = parquet.ParquetFile(f).iter_batches(batch_size=10000)
+	except ImportError:
+		raise InventoryError(f"{name}: reading Parquet/ORC inventories needs pyarrow installed")
+	for batch in batches:
+		for rec in batch.to_pylist():
+			yield from _shape({_camel(k): v for k, v in rec.items()}, encoded=False)
+
+
+def _shape(rec, encoded):
+	"""One inventory record -> [list_objects-shaped dict], or [] for rows that don't
+	describe a current object (delete markers, older versions)."""
+	if str(rec.get("IsDeleteMarker", "")).lower() == "true" or \
+			str(rec.get("IsLatest", "true")).lower() == "false":
+		return []
+	key = rec.get("Key")
+	if not key:
+		return []
+	row = {
+		"Bucket": rec.get("Bucket"),
+		"Key": unquote_plus(key) if encoded else key,
+		"Size": int(rec.get("Size") or 0),
+		"ETag": str(rec.get("ETag") or "").strip('"'),
+		"StorageClass": rec.get("StorageClass") or "STANDARD",
+		"LastModified": _last_modified(rec.get("LastModifiedDate")),
+	}
+	if rec.get("ContentType"):
+		row["ContentType"] = rec["ContentType"]
+	return [row]
+
+
+def _last_modified(value):
+	"""LastModifiedDate as an aware UTC datetime, like a listing's LastModified: CSV reports
+	carry an ISO string ("...T01:00:00.000Z"), Parquet/ORC a timestamp that pyarrow may
+	hand back naive. None when missing or unparseable."""
+	if isinstance(value, str):
+		try:
+			value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+		except ValueError:
+			return None
+	if not isinstance(value, datetime):
+		return None
+	return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _camel(name):
+	"""Parquet/ORC inventory columns are snake_case (last_modified_date); CSV schemas and
+	this module use the manifest's CamelCase names."""
+	if "_" not in name:
+		return name[:1].upper() + name[1:]
+	return "".join(part.capitalize() for part in name.split("_"))
+
+
+def _check_age(created, max_age, what):
+	if max_age and time.time() - created > max_age:
+		raise InventoryError(f"{what} is older than {max_age // 3600} h; not trusted as a listing")
@@ -0,0 +1,53 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and contributors
+# For license information, please see license.txt
+"""Keyset pagination over File rows for the bulk workers.
+
+frappe.get_all without a limit loads every candidate row before the first one is
+processed: hundreds of MB and a long first query on a large site. iter_files() reads
+PAGE_SIZE rows per query in (creation, name) order and resumes after the last row it
+yielded, so a worker's memory stays flat however large the backlog is.
+
+Unlike limit/offset, the cursor never skips rows when earlier ones stop matching the
+filters, which is exactly what the workers do to the rows they have read (a migrated
+File leaves the sweep's filter, a re-keyed one leaves normalize's). It can also be
+persisted: a yielded row's (creation, name) passed back as `after` resumes right after
+that row.
+"""
+
+import frappe
+
+PAGE_SIZE = 1000
+
+
+def iter_files(filters, fields, after=None, page_size=PAGE_SIZE):
+	"""Yield File rows matching `filters` in (creation, name) order, a page per query.
+	`fields` always gains name and creation (the cursor)."""
+	filters = _as_list(filters)
+	fields = list(dict.fromkeys([*fields, "name", "creation"]))
+	while True:
+		if after:
+			creation, name = after
+			# rows sharing the cursor's creation timestamp first, then everything later
+			page = _page(filters + [["creation", "=", creation], ["name", ">", name]],
+			             fields, "name asc", page_size)
+			if len(page) < page_size:
+				page += _page(filters + [["creation", ">", creation]],
+				              fields, "creation asc, name asc", page_size - len(page))
+		else:
+			page = _page(filters, fields, "creation asc, name asc", page_size)
+		yield from page
+		if len(page) < page_size:
+			return
+		after = (page[-1].creation, page[-1].name)
+
+
+def _page(filters, fields, order_by, limit):
+	return frappe.get_all("File", filters=filters, fields=fields, order_by=order_by,
+	                      limit_page_length=limit)
+
+
+def _as_list(filters):
+	"""Dict or list-of-lists filters as a fresh list-of-lists the cursor terms can join."""
+	if isinstance(filters, dict):
+		return [[k, *v] if isinstance(v, (list, tuple)) else [k, "=", v] for k, v in filters.items()]
+	return [list(f) for f in filters or []]
@@ -0,0 +1,130 @@
+# Copyright (c) 2026, sakthi123msd@gmail.com and contributors
+# For license information, please see license.txt
+"""Listing-backed object verification for the bulk maintenance tools.
+
+_cleanup_local, _backfill_content_hashes and _normalize check every File's object with a
+HEAD (verify_object): a million Files is a million requests. ObjectSnapshot lists each
+key prefix once (ListObjectsV2, 1000 keys per request) into an on-disk SQLite table
+(key -> size, etag) and answers verify_object from it. Only keys the snapshot doesn't
+confirm cost a HEAD: those absent from the listing, or whose listed size differs from
+the expected size (the object may have been written after the listing).
+
+A prefix is the key's first path segment ("files/", "private/", "uploads/"...), listed
+lazily on the first query that needs it and re-listed once older than max_age, which
+bounds how stale a positive answer can be; keys at the bucket root are always HEADed.
+Keys this process deletes are dropped via discard(). Thread-safe, so it can stand in
+for the connection inside BulkS3 calls.
+
+load_inventory() fills a whole bucket from its S3 Inventory report instead (see
+s3_core.inventory); that bucket is then never listed. A key written after the report is
+simply absent and gets a HEAD, but one deleted after it is still reported present: an
+inventory-filled snapshot is only for checks that don't destroy anything on a positive
+answer, and _cleanup_local never loads one.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+
+SNAPSHOT_MAX_AGE = 3600  # seconds a listed prefix is trusted before it is re-listed
+
+
+class ObjectSnapshot:
+	def __init__(self, conn, max_age=SNAPSHOT_MAX_AGE):
+		self.conn = conn
+		self.max_age = max_age
+		self.lock = threading.Lock()
+		self.loaded = {}  # (bucket, prefix) -> monotonic time it was listed
+		self.inventoried = set()  # buckets filled from an inventory report
+		fd, self.path = tempfile.mkstemp(prefix="s3-snapshot-", suffix=".sqlite")
+		os.close(fd)
+		self.db = sqlite3.connect(self.path, check_same_thread=False)
+		self.db.execute("PRAGMA journal_mode=OFF")
+		self.db.execute("PRAGMA synchronous=OFF")
+		self.db.execute(
+			"CREATE TABLE objects (bucket TEXT, key TEXT, size INTEGER, etag TEXT,"
+			" PRIMARY KEY (bucket, key)) WITHOUT ROWID")
+		# a job killed mid-run (timeout) still drops its temp file when the snapshot is collected
+		self._finalizer = weakref.finalize(self, _drop, self.db, self.path)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def close(self):
+		with self.lock:
+			self._finalizer()
+
+	def lookup(self, bucket, key):
+		"""(size, etag) from the listing, or None if the key wasn't listed."""
+		prefix = _prefix_of(key)
+		if not prefix:
+			return None  # bucket-root key: listing "" would list the whole bucket
+		with self.lock:
+			loaded_at = self.loaded.get((bucket, prefix))
+			if bucket in self.inventoried:
+				pass
+			elif loaded_at is None or time.monotonic() - loaded_at > self.max_age:
+				self._load(bucket, prefix)
+			return self.db.execute(
+				"SELECT size, etag FROM objects WHERE bucket = ? AND key = ?", (bucket, key)).fetchone()
+
+	def verify_object(self, bucket_name, key, expected_size=None):
+		"""Same answer as S3Connection.verify_object, from the listing when it can be."""
+		hit = self.lookup(bucket_name, key)
+		if hit and (expected_size is None or hit[0] == expected_size):
+			return True
+		return self.conn.verify_object(bucket_name, key, expected_size=expected_size)
+
+	def discard(self, bucket, key):
+		with self.lock:
+			self.db.execute("DELETE FROM objects WHERE bucket = ? AND key = ?", (bucket, key))
+
+	def load_inventory(self, bucket, objects):
+		"""Fill `bucket` from list_objects-shaped rows (an inventory report) in one pass."""
+		with self.lock:
+			self.db.execute("DELETE FROM objects WHERE bucket = ?", (bucket,))
+			try:
+				self._insert(bucket, objects)
+			except Exception:
+				# a report that breaks midway: drop its rows, the bucket is listed instead
+				self.db.execute("DELETE FROM objects WHERE bucket = ?", (bucket,))
+				raise
+			self.inventoried.add(bucket)
+
+	def _load(self, bucket, prefix):
+		"""(Re-)list one prefix. Caller holds the lock."""
+		self.db.execute("DELETE FROM objects WHERE bucket = ? AND substr(key, 1, ?) = ?",
+		                (bucket, len(prefix), prefix))
+		self._insert(bucket, self.conn.list_objects(bucket, prefix=prefix))
+		self.loaded[(bucket, prefix)] = time.monotonic()
+
+	def _insert(self, bucket, objects):
+		"""A page of rows per executemany. Caller holds the lock."""
+		rows = []
+		for obj in objects:
+			rows.append((bucket, obj["Key"], obj.get("Size"), (obj.get("ETag") or "").strip('"')))
+			if len(rows) >= 1000:
+				self.db.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)", rows)
+				rows = []
+		if rows:
+			self.db.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)", rows)
+
+
+def _prefix_of(key):
+	"""First path segment including its slash; "" for a key at the bucket root."""
+	head, sep, _ = key.partition("/")
+	return head + sep if sep else ""
+
+
+def _drop(db, path):
+	db.close()
+	try:
+		os.unlink(path)
+	except OSError:
+		pass
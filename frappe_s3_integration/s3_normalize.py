@@ -22,9 +22,12 @@ repoint every sibling before the old object is dropped; public copies keep publi
 
 import os
 import re
+from functools import partial
 
 import frappe
-from frappe.utils import cint, get_files_path
+from frappe.utils import cint, flt, get_files_path
+
+from frappe_s3_integration.s3_core.paging import iter_files
 
 FRAPPE_PREFIXES = ("files/", "private/files/")
 
@@ -47,6 +50,7 @@ MISKEYED_FILTERS = [
 SECONDS_PER_FILE = 3        # verify + copy + verify + db round-trips per object, with headroom
 TIMEOUT_FLOOR = 600         # 10 min minimum
 TIMEOUT_CAP = 24 * 3600     # 24 h ceiling
+LISTING_VERIFY_MIN = 2000   # candidates from which objects are verified from a bucket listing
 
 
 def _correct_key(file_name, is_private):
@@ -100,6 +104,47 @@ def _repoint_attached_field(f, proxy_url, expected=None):
 		frappe.log_error(frappe.get_traceback(), f"S3 normalize: attach repoint failed ({f.name})")
 
 
+def _verifier(conn, count, inventory=True):
+	"""What the tools call verify_object on: the connection (a HEAD per object) for small
+	runs, or an ObjectSnapshot (one listing per key prefix, a HEAD only for keys it can't
+	confirm) from LISTING_VERIFY_MIN candidates (`count`). site_config
+	s3_listing_verify_min overrides the threshold. Buckets with an Inventory Source are
+	filled from the report instead of being listed, unless `inventory` is off: a report
+	can be days old and still list objects deleted since, so a caller that deletes local
+	bytes on a positive answer must not take it from one."""
+	from frappe_s3_integration.s3_core.inventory import iter_inventory
+	from frappe_s3_integration.s3_core.snapshot import ObjectSnapshot
+
+	if count < (cint(frappe.conf.get("s3_listing_verify_min")) or LISTING_VERIFY_MIN):
+		return conn
+	snapshot = ObjectSnapshot(conn)
+	for row in (conn.s3_settings.get("s3_bucket_details") or []) if inventory else []:
+		bucket = row.get("bucket_name")
+		source = conn.inventory_source_for(bucket) if bucket else None
+		if not source:
+			continue
+		try:
+			snapshot.load_inventory(bucket, iter_inventory(conn, source, bucket=bucket))
+		except Exception:
+			# unusable report: this bucket falls back to per-prefix listings
+			frappe.log_error(frappe.get_traceback(), f"S3 Inventory unusable for {bucket}: listing instead")
+	return snapshot
+
+
+def _close_verifier(verifier, conn):
+	if verifier is not conn:
+		verifier.close()
+
+
+def _log_delete_errors(failed, title):
+	"""Log the keys a DeleteBatch flush couldn't delete. Nothing points at them any more,
+	so they're orphans (orphan_report include_s3=1), not lost data."""
+	if failed:
+		frappe.log_error(
+			"\n".join(f"{bucket}/{key}: {err}" for (bucket, key), err in sorted(failed.items())),
+			f"{title}: {len(failed)} object(s) not deleted")
+
+
 def _miskeyed_count():
 	if "custom_s3_key" not in frappe.db.get_table_columns("File"):
 		return 0
@@ -144,7 +189,8 @@ def _normalize(dry_run=0):
 	if "custom_s3_key" not in frappe.db.get_table_columns("File"):
 		return
 
-	from frappe_s3_integration.s3_core import getS3Connection, get_proxy_url
+	from frappe_s3_integration.s3_core import clear_file_meta, getS3Connection, get_proxy_url
+	from frappe_s3_integration.s3_core.bulk import BulkS3, DeleteBatch
 
 	if frappe.db.get_single_value("AWS S3 Settings", "disable_s3_operations"):
 		frappe.log_error("S3 disabled — normalization skipped", "S3 Normalize")
@@ -163,18 +209,24 @@ def _normalize(dry_run=0):
 		class JobTimeoutException(Exception):
 			pass
 
-	files = frappe.get_all(
-		"File",
-		filters=MISKEYED_FILTERS,
-		fields=[
-			"name", "file_name", "is_private", "custom_s3_key", "custom_s3_bucket_name",
-			"attached_to_doctype", "attached_to_name", "attached_to_field",
-		],
-	)
+	files = iter_files(MISKEYED_FILTERS, fields=[
+		"name", "file_name", "is_private", "custom_s3_key", "custom_s3_bucket_name",
+		"attached_to_doctype", "attached_to_name", "attached_to_field",
+	])
+
+	verifier = _verifier(conn, _miskeyed_count())
+	deletions = DeleteBatch(conn)
+
+	def _source_check(f):
+		if f.custom_s3_key and f.custom_s3_bucket_name and not f.custom_s3_key.startswith(FRAPPE_PREFIXES):
+			return partial(verifier.verify_object, f.custom_s3_bucket_name, f.custom_s3_key)
 
-	rekeyed = local_removed = skipped = errors = 0
+	candidates = rekeyed = local_removed = skipped = errors = 0
 	processed = set()  # File names already repointed as part of a shared-blob group
-	for f in files:
+	# Source HEADs run a batch at a time on the bulk engine; copy/repoint/delete stay
+	# sequential (they're ordered per shared-blob group and commit per file).
+	for f, source_exists in BulkS3(conn).prefetch(files, _source_check):
+		candidates += 1
 		try:
 			if f.name in processed:
 				continue
@@ -188,13 +240,15 @@ def _normalize(dry_run=0):
 				continue
 
 			# Verify the source object exists before doing anything (never lose the pointer).
-			if not conn.verify_object(bucket, key):
+			if not source_exists():
 				errors += 1
 				frappe.log_error(
 					f"normalize: source missing {bucket}/{key} (File {f.name}) — left as-is",
 					"S3 Normalize")
 				continue
-			new_key = conn._unique_key(bucket, _correct_key(f.file_name, f.is_private))
+			# copy_object has no If-None-Match: HEAD-probe the target, or an object already at
+			# the corrected key (uploaded since this process built its key index) is overwritten.
+			new_key = conn._unique_key(bucket, _correct_key(f.file_name, f.is_private), probe=True)
 
 			if dry_run:
 				rekeyed += 1
@@ -233,10 +287,14 @@ def _normalize(dry_run=0):
 					{"custom_s3_key": new_key, "file_url": s_proxy},
 					update_modified=False,
 				)
+				clear_file_meta(s.name)
 				_repoint_attached_field(s, s_proxy)
 				processed.add(s.name)
 			frappe.db.commit()
-			conn.delete_file_from_bucket(key, bucket)  # no File references old key now — safe
+			# No File references the old key now — safe. Queued, deleted a batch at a time.
+			_log_delete_errors(deletions.add(bucket, key), "S3 Normalize")
+			if verifier is not conn:
+				verifier.discard(bucket, key)
 			key = new_key
 			rekeyed += len(sharers)
 
@@ -256,6 +314,7 @@ def _normalize(dry_run=0):
 		except JobTimeoutException:
 			# Deadline hit: persist what's done and stop — a re-run finishes the rest.
 			frappe.db.commit()
+			_log_delete_errors(deletions.flush(), "S3 Normalize")
 			frappe.log_error(
 				f"normalize: job timeout after {rekeyed} re-keyed — re-run to finish", "S3 Normalize")
 			raise
@@ -263,9 +322,11 @@ def _normalize(dry_run=0):
 			errors += 1
 			frappe.log_error(frappe.get_traceback(), f"S3 normalize failed for File {f.get('name')}")
 
+	_close_verifier(verifier, conn)
 	frappe.db.commit()
+	_log_delete_errors(deletions.flush(), "S3 Normalize")
 	print(
-		f"[s3 normalize] {'DRY-RUN ' if dry_run else ''}done: candidates={len(files)} "
+		f"[s3 normalize] {'DRY-RUN ' if dry_run else ''}done: candidates={candidates} "
 		f"rekeyed={rekeyed} local_removed={local_removed} skipped={skipped} errors={errors}"
 	)
 
@@ -316,6 +377,7 @@ def _cleanup_local(dry_run=0):
 		return
 
 	from frappe_s3_integration.s3_core import getS3Connection
+	from frappe_s3_integration.s3_core.bulk import BulkS3
 
 	if frappe.db.get_single_value("AWS S3 Settings", "disable_s3_operations"):
 		frappe.log_error("S3 disabled — local cleanup skipped", "S3 Local Cleanup")
@@ -332,14 +394,24 @@ def _cleanup_local(dry_run=0):
 		class JobTimeoutException(Exception):
 			pass
 
-	files = frappe.get_all(
-		"File",
-		filters=S3_BACKED_FILTERS,
-		fields=["name", "file_name", "is_private", "custom_s3_key", "custom_s3_bucket_name"],
-	)
+	files = iter_files(S3_BACKED_FILTERS,
+	                   fields=["name", "file_name", "is_private", "custom_s3_key", "custom_s3_bucket_name"])
 
-	removed = kept = no_local = errors = 0
-	for f in files:
+	# A positive answer here deletes the local copy, so never from an inventory report
+	# (invariant 1): only from a listing no older than SNAPSHOT_MAX_AGE, or a HEAD.
+	verifier = _verifier(conn, _s3_backed_count(), inventory=False)
+
+	def _verify(f):
+		if not f.file_name or not f.custom_s3_key or not f.custom_s3_bucket_name:
+			return None
+		local_abs = _local_path(f.file_name, f.is_private)
+		if os.path.exists(local_abs):
+			return partial(verifier.verify_object, f.custom_s3_bucket_name, f.custom_s3_key,
+			               expected_size=os.path.getsize(local_abs))
+
+	scanned = removed = kept = no_local = errors = 0
+	for f, verified in BulkS3(conn).prefetch(files, _verify):
+		scanned += 1
 		try:
 			if not f.file_name or not f.custom_s3_key or not f.custom_s3_bucket_name:
 				continue
@@ -348,7 +420,7 @@ def _cleanup_local(dry_run=0):
 				no_local += 1
 				continue
 			# Verify S3 has it (present + size match) before removing the local copy.
-			if conn.verify_object(f.custom_s3_bucket_name, f.custom_s3_key, expected_size=os.path.getsize(local_abs)):
+			if verified():
 				if dry_run:
 					frappe.logger("s3").info(f"[s3 local-cleanup dry-run] would delete {local_abs} (File {f.name})")
 				else:
@@ -366,8 +438,9 @@ def _cleanup_local(dry_run=0):
 			errors += 1
 			frappe.log_error(frappe.get_traceback(), f"S3 local cleanup failed for File {f.get('name')}")
 
+	_close_verifier(verifier, conn)
 	print(
-		f"[s3 local-cleanup] {'DRY-RUN ' if dry_run else ''}done: scanned={len(files)} "
+		f"[s3 local-cleanup] {'DRY-RUN ' if dry_run else ''}done: scanned={scanned} "
 		f"removed={removed} kept(size-mismatch)={kept} no_local={no_local} errors={errors}"
 	)
 
@@ -420,9 +493,10 @@ def _current_attach_value(doctype, name, field, issingle):
 	return frappe.db.get_value(doctype, name, field)
 
 
-def enqueue_attach_backfill(dry_run=0):
+def enqueue_attach_backfill(dry_run=0, after=None):
 	"""Console entry point: size a timeout to the attached S3-backed file count and enqueue
-	the attach-field backfill worker on the `long` queue. Returns the plan (also printed)."""
+	the attach-field backfill worker on the `long` queue. Returns the plan (also printed).
+	`after` is the [creation, name] cursor a timed-out run logged: resume right after it."""
 	dry_run = cint(dry_run)
 	count = _attach_backfill_count()
 	if not count:
@@ -435,6 +509,7 @@ def enqueue_attach_backfill(dry_run=0):
 		timeout=timeout,
 		job_name="s3_attach_backfill",
 		dry_run=dry_run,
+		after=after,
 	)
 	print(
 		f"[s3 attach-backfill] queued scan of {count} attached S3-backed file(s) on 'long' queue "
@@ -443,10 +518,12 @@ def enqueue_attach_backfill(dry_run=0):
 	return {"queued": count, "timeout": timeout, "dry_run": bool(dry_run)}
 
 
-def _backfill_attached_fields(dry_run=0):
+def _backfill_attached_fields(dry_run=0, after=None):
 	"""Background worker: for every S3-backed File whose attached field STILL holds a local
 	/files url, repoint that field at the File's proxy url. Singles-aware, idempotent, and
-	resumable (per-file commits). Never touches an already-proxied / external / empty value."""
+	resumable (per-file commits). Never touches an already-proxied / external / empty value.
+	Every attached File is scanned, repointed or not, so a timeout logs the cursor to pass
+	back as `after` instead of re-scanning from the start."""
 	dry_run = cint(dry_run)
 	if "custom_s3_key" not in frappe.db.get_table_columns("File"):
 		return
@@ -459,15 +536,15 @@ def _backfill_attached_fields(dry_run=0):
 		class JobTimeoutException(Exception):
 			pass
 
-	files = frappe.get_all(
-		"File",
-		filters=ATTACH_BACKFILL_FILTERS,
-		fields=["name", "file_name", "custom_s3_key",
-		        "attached_to_doctype", "attached_to_name", "attached_to_field"],
-	)
+	files = iter_files(ATTACH_BACKFILL_FILTERS, after=after, fields=[
+		"name", "file_name", "custom_s3_key", "attached_to_doctype", "attached_to_name", "attached_to_field",
+	])
 
-	repointed = skipped = errors = 0
+	scanned = repointed = skipped = errors = 0
+	last = after
 	for f in files:
+		scanned += 1
+		cursor, last = last, (str(f.creation), f.name)  # cursor: the last finished row
 		try:
 			dt, dn, fld = f.attached_to_doctype, f.attached_to_name, f.attached_to_field
 			if not (dt and fld):
@@ -520,7 +597,8 @@ def _backfill_attached_fields(dry_run=0):
 		except JobTimeoutException:
 			frappe.db.commit()
 			frappe.log_error(
-				f"attach-backfill: job timeout after {repointed} repointed — re-run to finish",
+				f"attach-backfill: job timeout after {repointed} repointed — re-run to finish, "
+				f"resuming with --kwargs \"{{'after': {list(cursor) if cursor else None}}}\"",
 				"S3 Attach Backfill")
 			raise
 		except Exception:
@@ -533,7 +611,7 @@ def _backfill_attached_fields(dry_run=0):
 		# is served immediately, without a manual `bench clear-cache`.
 		frappe.clear_cache()
 	print(
-		f"[s3 attach-backfill] {'DRY-RUN ' if dry_run else ''}done: scanned={len(files)} "
+		f"[s3 attach-backfill] {'DRY-RUN ' if dry_run else ''}done: scanned={scanned} "
 		f"repointed={repointed} skipped={skipped} errors={errors}"
 	)
 
@@ -582,6 +660,19 @@ def _migrated_twin(f):
 	return rows[0] if rows else None
 
 
+def _twin_still_current(f, url, twin):
+	"""Write-time re-check for sibling sync, whose twin lookup ran a batch ahead: the
+	straggler is still unmigrated on `url`, and a File with its content still owns the
+	twin's object."""
+	row = frappe.db.get_value("File", f.name, ["file_url", "custom_s3_key"], as_dict=True)
+	if not row or row.custom_s3_key or row.file_url != url:
+		return False
+	return bool(frappe.db.exists("File", {
+		"name": ["!=", f.name], "content_hash": f.content_hash, "is_private": f.is_private,
+		"custom_s3_key": twin.custom_s3_key, "custom_s3_bucket_name": twin.custom_s3_bucket_name,
+	}))
+
+
 def _sibling_sync_count():
 	if "custom_s3_key" not in frappe.db.get_table_columns("File"):
 		return 0
@@ -619,7 +710,8 @@ def _sync_s3_siblings(dry_run=0):
 	if "custom_s3_key" not in frappe.db.get_table_columns("File"):
 		return
 
-	from frappe_s3_integration.s3_core import getS3Connection, get_proxy_url
+	from frappe_s3_integration.s3_core import clear_file_meta, getS3Connection, get_proxy_url
+	from frappe_s3_integration.s3_core.bulk import BulkS3
 
 	if frappe.db.get_single_value("AWS S3 Settings", "disable_s3_operations"):
 		frappe.log_error("S3 disabled — sibling sync skipped", "S3 Sibling Sync")
@@ -636,46 +728,66 @@ def _sync_s3_siblings(dry_run=0):
 		class JobTimeoutException(Exception):
 			pass
 
-	files = frappe.get_all(
-		"File",
-		filters=SIBLING_SYNC_FILTERS,
-		fields=["name", "file_name", "is_private", "content_hash", "file_url",
-		        "attached_to_doctype", "attached_to_name", "attached_to_field"],
-	)
-
-	synced = skipped = errors = 0
-	for f in files:
+	files = iter_files(SIBLING_SYNC_FILTERS, fields=[
+		"name", "file_name", "is_private", "content_hash", "file_url",
+		"attached_to_doctype", "attached_to_name", "attached_to_field",
+	])
+
+	def _twin_check(f):
+		"""Runs on this thread, one batch ahead of the loop below: find f's twin and return
+		the HEAD that verifies it. Read-only — by the time the loop writes, either side may
+		have moved, so the loop re-checks (_twin_still_current) and stores any hash computed
+		here. A failure here re-raises in the loop, against f."""
+		f.twin = None
+		f.hashed = False
+		url = f.file_url or ""
+		if not (url.startswith("/files/") or url.startswith("/private/files/")):
+			return None
+		# Byte-safe identity: if this straggler has no content_hash but its LOCAL bytes
+		# are still on disk, hash THOSE bytes so it can be matched to a twin by content.
+		# We never guess content identity from a shared url.
+		local_abs = _local_path(f.file_name, f.is_private) if f.file_name else None
+		local_here = bool(local_abs and os.path.isfile(local_abs))
+		if not f.content_hash and local_here:
+			with open(local_abs, "rb") as fh:
+				f.content_hash = _md5_of_stream(fh.read)
+			f.hashed = True
+		f.twin = _migrated_twin(f)
+		if not f.twin:
+			return None
+		# The twin's object must exist; when we still hold the local copy, its SIZE must
+		# match too (defence in depth on top of the md5 identity) — never point at nothing
+		# and never at a different-sized object.
+		expected_size = os.path.getsize(local_abs) if local_here else None
+		return partial(conn.verify_object, f.twin.custom_s3_bucket_name, f.twin.custom_s3_key,
+		               expected_size=expected_size)
+
+	candidates = synced = skipped = errors = 0
+	for f, twin_verified in BulkS3(conn).prefetch(files, _twin_check):
+		candidates += 1
 		try:
 			url = f.file_url or ""
 			if not (url.startswith("/files/") or url.startswith("/private/files/")):
 				skipped += 1
 				continue
-			# Byte-safe identity: if this straggler has no content_hash but its LOCAL bytes
-			# are still on disk, hash THOSE bytes so it can be matched to a twin by content.
-			# We never guess content identity from a shared url.
-			local_abs = _local_path(f.file_name, f.is_private) if f.file_name else None
-			local_here = bool(local_abs and os.path.isfile(local_abs))
-			if not f.content_hash and local_here:
-				with open(local_abs, "rb") as fh:
-					f.content_hash = _md5_of_stream(fh.read)
+			verified = twin_verified()  # re-raises a hashing/lookup/HEAD failure for f
+			if f.hashed and not dry_run:
 				frappe.db.set_value("File", f.name, "content_hash", f.content_hash, update_modified=False)
 				frappe.db.commit()
-			twin = _migrated_twin(f)
+			twin = f.twin
 			if not twin:
 				# no content-matched twin (or hashless with no local copy) — never guess.
 				skipped += 1
 				continue
-			# The twin's object must exist; when we still hold the local copy, its SIZE must
-			# match too (defence in depth on top of the md5 identity) — never point at nothing
-			# and never at a different-sized object.
-			expected_size = os.path.getsize(local_abs) if local_here else None
-			if not conn.verify_object(twin.custom_s3_bucket_name, twin.custom_s3_key,
-			                          expected_size=expected_size):
+			if not verified:
 				skipped += 1
 				frappe.log_error(
 					f"sibling-sync: twin object missing/size-mismatch {twin.custom_s3_bucket_name}/"
 					f"{twin.custom_s3_key} for File {f.name} — left as-is", "S3 Sibling Sync")
 				continue
+			if not _twin_still_current(f, url, twin):
+				skipped += 1  # migrated, or the twin moved, since the lookup: the next run retries
+				continue
 			if dry_run:
 				frappe.logger("s3").info(
 					f"[sibling-sync dry-run] would point File {f.name} ({url}) -> {twin.custom_s3_key}")
@@ -688,6 +800,7 @@ def _sync_s3_siblings(dry_run=0):
 				"custom_is_s3_uploaded": 1,
 				"file_url": proxy,
 			}, update_modified=False)
+			clear_file_meta(f.name)
 			# identity-guarded: only repoint the parent field if it still holds THIS file's
 			# own local url — never clobber a field that has moved to another file.
 			_repoint_attached_field(f, proxy, expected=url)
@@ -705,7 +818,7 @@ def _sync_s3_siblings(dry_run=0):
 	if synced and not dry_run:
 		frappe.clear_cache()
 	print(
-		f"[s3 sibling-sync] {'DRY-RUN ' if dry_run else ''}done: candidates={len(files)} "
+		f"[s3 sibling-sync] {'DRY-RUN ' if dry_run else ''}done: candidates={candidates} "
 		f"synced={synced} skipped={skipped} errors={errors}"
 	)
 
@@ -752,8 +865,7 @@ def _hash_backfill_timeout(count):
 	"""Streaming-hash is bandwidth-bound, so size the timeout by the backlog's BYTES as
 	well as its count (whichever is larger), clamped to the same cap. Overridable via
 	site_config (s3_normalize_throughput_mbps). The worker is resumable either way."""
-	rows = frappe.get_all("File", filters=HASHLESS_FILTERS, fields=["file_size"])
-	total_bytes = sum(r.file_size or 0 for r in rows)
+	total_bytes = sum(r.file_size or 0 for r in iter_files(HASHLESS_FILTERS, fields=["file_size"]))
 	throughput = float(frappe.conf.get("s3_normalize_throughput_mbps") or 0.5) * 1024 * 1024
 	byte_secs = int(total_bytes / throughput * 2)  # 2x safety buffer
 	cap = cint(frappe.conf.get("s3_normalize_timeout_cap")) or TIMEOUT_CAP
@@ -792,6 +904,7 @@ def _backfill_content_hashes(dry_run=0):
 		return
 
 	from frappe_s3_integration.s3_core import getS3Connection
+	from frappe_s3_integration.s3_core.bulk import BulkS3
 
 	if frappe.db.get_single_value("AWS S3 Settings", "disable_s3_operations"):
 		frappe.log_error("S3 disabled — hash backfill skipped", "S3 Hash Backfill")
@@ -808,14 +921,35 @@ def _backfill_content_hashes(dry_run=0):
 		class JobTimeoutException(Exception):
 			pass
 
-	files = frappe.get_all(
-		"File",
-		filters=HASHLESS_FILTERS,
-		fields=["name", "file_name", "is_private", "custom_s3_key", "custom_s3_bucket_name"],
-	)
+	files = iter_files(HASHLESS_FILTERS,
+	                   fields=["name", "file_name", "is_private", "custom_s3_key", "custom_s3_bucket_name"])
 
-	hashed = errors = 0
-	for f in files:
+	verifier = _verifier(conn, _hashless_count())
+
+	def _digest(f):
+		"""Pure S3 + local-disk work, so it runs on the bulk engine's threads."""
+		# 1) local copy still on disk AND size-matches the S3 object — hash it without
+		#    downloading. The hash must describe the bytes the File actually SERVES (S3),
+		#    so a stale/replaced local leftover must never be trusted blindly: a wrong
+		#    content_hash would poison dedup + the shared-blob delete guards.
+		if f.file_name:
+			local_abs = _local_path(f.file_name, f.is_private)
+			if os.path.isfile(local_abs) and verifier.verify_object(
+					f.custom_s3_bucket_name, f.custom_s3_key,
+					expected_size=os.path.getsize(local_abs)):
+				with open(local_abs, "rb") as fh:
+					return _md5_of_stream(fh.read)
+		# 2) else stream the S3 object itself — always correct.
+		obj = conn.get_file_from_bucket(f.custom_s3_key, f.custom_s3_bucket_name)
+		return _md5_of_stream(obj["Body"].read)
+
+	def _plan(f):
+		if f.custom_s3_key and f.custom_s3_bucket_name and not dry_run:
+			return partial(_digest, f)
+
+	candidates = hashed = errors = 0
+	for f, digest in BulkS3(conn).prefetch(files, _plan):
+		candidates += 1
 		try:
 			if not (f.custom_s3_key and f.custom_s3_bucket_name):
 				continue
@@ -825,22 +959,7 @@ def _backfill_content_hashes(dry_run=0):
 					f"[s3 hash-backfill dry-run] would compute+store content_hash for File {f.name}")
 				hashed += 1
 				continue
-			digest = None
-			# 1) local copy still on disk AND size-matches the S3 object — hash it without
-			#    downloading. The hash must describe the bytes the File actually SERVES (S3),
-			#    so a stale/replaced local leftover must never be trusted blindly: a wrong
-			#    content_hash would poison dedup + the shared-blob delete guards.
-			if f.file_name:
-				local_abs = _local_path(f.file_name, f.is_private)
-				if os.path.isfile(local_abs) and conn.verify_object(
-						f.custom_s3_bucket_name, f.custom_s3_key,
-						expected_size=os.path.getsize(local_abs)):
-					with open(local_abs, "rb") as fh:
-						digest = _md5_of_stream(fh.read)
-			# 2) else stream the S3 object itself — always correct.
-			if digest is None:
-				obj = conn.get_file_from_bucket(f.custom_s3_key, f.custom_s3_bucket_name)
-				digest = _md5_of_stream(obj["Body"].read)
+			digest = digest()
 			frappe.db.set_value("File", f.name, "content_hash", digest, update_modified=False)
 			frappe.db.commit()
 			hashed += 1
@@ -853,8 +972,9 @@ def _backfill_content_hashes(dry_run=0):
 			errors += 1
 			frappe.log_error(frappe.get_traceback(), f"S3 hash backfill failed for File {f.get('name')}")
 
+	_close_verifier(verifier, conn)
 	print(
-		f"[s3 hash-backfill] {'DRY-RUN ' if dry_run else ''}done: candidates={len(files)} "
+		f"[s3 hash-backfill] {'DRY-RUN ' if dry_run else ''}done: candidates={candidates} "
 		f"hashed={hashed} errors={errors}"
 	)
 
@@ -923,11 +1043,9 @@ def diagnose_attach_backfill_all(examples=6):
 	from collections import Counter, defaultdict
 
 	examples = cint(examples) or 6
-	rows = frappe.get_all(
-		"File", filters=ATTACH_BACKFILL_FILTERS,
-		fields=["name", "custom_s3_key", "file_url",
-		        "attached_to_doctype", "attached_to_name", "attached_to_field"],
-	)
+	rows = iter_files(ATTACH_BACKFILL_FILTERS, fields=[
+		"name", "custom_s3_key", "file_url", "attached_to_doctype", "attached_to_name", "attached_to_field",
+	])
 	counts = Counter()
 	samples = defaultdict(list)
 	field_targets = Counter()   # (doctype, field) tally for the field_not_on_doctype bucket
@@ -1079,8 +1197,7 @@ def _referenced_basenames():
 	"""Every on-disk basename that SOME File doc could legitimately own — anything not in
 	this set is an orphan (no File doc points at it)."""
 	refs = set()
-	for f in frappe.get_all("File", filters={"is_folder": 0},
-			fields=["file_name", "file_url", "custom_s3_key"]):
+	for f in iter_files({"is_folder": 0}, fields=["file_name", "file_url", "custom_s3_key"]):
 		if f.file_name:
 			refs.add(re.sub(r"[/\\%?#]", "_", f.file_name))
 		for v in (f.file_url, f.custom_s3_key):
@@ -1111,8 +1228,19 @@ def _iter_orphans(refs):
 				continue
 
 
-def orphan_report():
-	"""READ-ONLY: count + total size of orphan files (on disk, no File doc references them)."""
+def _iter_s3_orphans(conn, bucket):
+	"""Yield every object in `bucket` that no File's custom_s3_key points at. Uses the
+	bucket's S3 Inventory report when one is configured (S3Connection.iter_objects)."""
+	owned = {f.custom_s3_key for f in iter_files(
+		{"custom_s3_bucket_name": bucket, "custom_s3_key": ["is", "set"]}, fields=["custom_s3_key"])}
+	for obj in conn.iter_objects(bucket):
+		if obj["Key"] not in owned and not obj["Key"].endswith("/"):
+			yield obj
+
+
+def orphan_report(include_s3=0):
+	"""READ-ONLY: count + total size of orphan files (on disk, no File doc references them).
+	include_s3=1 also counts orphan S3 objects (in a bucket, no File doc points at them)."""
 	refs = _referenced_basenames()
 	priv_n = priv_b = pub_n = pub_b = 0
 	for _p, is_private, sz in _iter_orphans(refs):
@@ -1125,7 +1253,176 @@ def orphan_report():
 	print(f"[orphans] public/files : {pub_n} orphan file(s), {gb(pub_b):.2f} GB")
 	print(f"[orphans] TOTAL: {priv_n + pub_n} orphan file(s), {gb(priv_b + pub_b):.2f} GB reclaimable")
 	print("[orphans] (orphan = on disk but NO File doc references it — unreachable by the app)")
-	return {"private": priv_n, "public": pub_n, "bytes": priv_b + pub_b}
+	out = {"private": priv_n, "public": pub_n, "bytes": priv_b + pub_b}
+	if cint(include_s3) and "custom_s3_key" in frappe.db.get_table_columns("File"):
+		from frappe_s3_integration.s3_core import getS3Connection
+
+		conn = getS3Connection()
+		out["s3"] = {}
+		for bucket in dict.fromkeys(b for b in (conn.private_bucket, conn.public_bucket) if b):
+			n = size = 0
+			for obj in _iter_s3_orphans(conn, bucket):
+				n += 1
+				size += obj.get("Size") or 0
+			print(f"[orphans] s3://{bucket}: {n} orphan object(s), {gb(size):.2f} GB")
+			out["s3"][bucket] = {"objects": n, "bytes": size}
+	return out
+
+
+# ---------------------------------------------------------------------------------------
+# S3 orphan purge — delete bucket objects no File doc points at (what orphan_report
+# include_s3=1 counts). Defaults to a DRY RUN; to delete:
+#   bench --site <site> execute frappe_s3_integration.s3_normalize.enqueue_s3_orphan_purge --kwargs "{'dry_run': 0}"
+# SAFE: only keys under files/ and private/files/ (backups and foreign data are never
+# touched), only objects older than S3_ORPHAN_MIN_AGE_DAYS (an upload whose File isn't
+# committed yet is still young). The listing can be an inventory report days old, so each
+# batch is re-checked right before its DeleteObjects (a thousand keys per request): a HEAD
+# per object (still there, same ETag, still old enough), then File re-queried.
+# ---------------------------------------------------------------------------------------
+
+S3_ORPHAN_MIN_AGE_DAYS = 7
+
+
+def _age_days(obj, now):
+	"""Days since the object's LastModified (a datetime from a listing or an inventory
+	report, or an ISO string); None when unknown."""
+	from datetime import datetime, timezone
+
+	modified = obj.get("LastModified")
+	if isinstance(modified, str):
+		try:
+			modified = datetime.fromisoformat(modified.replace("Z", "+00:00"))
+		except ValueError:
+			return None
+	if not isinstance(modified, datetime):
+		return None
+	if modified.tzinfo is None:
+		modified = modified.replace(tzinfo=timezone.utc)
+	return (now - modified).total_seconds() / 86400
+
+
+def _unchanged(obj, head, now, min_age_days):
+	"""True if the HEAD shows the object the listing saw, and still older than the cutoff:
+	a key re-uploaded since the listing (or the inventory report) has a new ETag and age."""
+	listed = (obj.get("ETag") or "").strip('"')
+	if listed and listed != (head.get("ETag") or "").strip('"'):
+		return False
+	age = _age_days(head, now)
+	return age is not None and age >= min_age_days
+
+
+def _still_orphaned(bucket, objs):
+	"""The objects in `objs` that no File points at as of now (the owned-key set used by
+	_iter_s3_orphans was read before the listing started)."""
+	owned = set(frappe.get_all(
+		"File", filters={"custom_s3_bucket_name": bucket, "custom_s3_key": ["in", [o["Key"] for o in objs]]},
+		pluck="custom_s3_key"))
+	return [o for o in objs if o["Key"] not in owned]
+
+
+def enqueue_s3_orphan_purge(dry_run=1, min_age_days=S3_ORPHAN_MIN_AGE_DAYS):
+	"""Console entry point: enqueue the S3 orphan purge on the `long` queue. The orphan
+	count isn't known before the listing, so the job gets the timeout cap."""
+	dry_run = cint(dry_run)
+	timeout = cint(frappe.conf.get("s3_normalize_timeout_cap")) or TIMEOUT_CAP
+	frappe.enqueue(
+		"frappe_s3_integration.s3_normalize._purge_s3_orphans",
+		queue="long",
+		timeout=timeout,
+		job_name="s3_orphan_purge",
+		dry_run=dry_run,
+		min_age_days=min_age_days,
+	)
+	print(f"[s3 orphan-purge] queued on 'long' queue (timeout={timeout}s, dry_run={bool(dry_run)})")
+	return {"timeout": timeout, "dry_run": bool(dry_run)}
+
+
+def _purge_s3_orphans(dry_run=1, min_age_days=S3_ORPHAN_MIN_AGE_DAYS):
+	"""Background worker: delete orphan S3 objects under the Frappe prefixes, in batches."""
+	from datetime import datetime, timezone
+
+	dry_run = cint(dry_run)
+	min_age_days = flt(min_age_days)
+	if "custom_s3_key" not in frappe.db.get_table_columns("File"):
+		return
+
+	from botocore.exceptions import ClientError
+
+	from frappe_s3_integration.s3_core import DELETE_BATCH_SIZE, _s3_error_code, getS3Connection
+	from frappe_s3_integration.s3_core.bulk import BulkS3, DeleteBatch
+
+	if frappe.db.get_single_value("AWS S3 Settings", "disable_s3_operations"):
+		frappe.log_error("S3 disabled — orphan purge skipped", "S3 Orphan Purge")
+		return
+	try:
+		conn = getS3Connection()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "S3 Orphan Purge: connection failed — skipped")
+		return
+
+	try:
+		from rq.timeouts import JobTimeoutException
+	except Exception:  # pragma: no cover
+		class JobTimeoutException(Exception):
+			pass
+
+	now = datetime.now(timezone.utc)
+	engine = BulkS3(conn)
+	deletions = DeleteBatch(conn)
+	queued = queued_bytes = young = foreign = changed = 0
+
+	def _queue(bucket, objs):
+		nonlocal queued, queued_bytes, changed
+		if not objs:
+			return
+		# Right before the delete: HEAD every object, then ask File again.
+		heads = engine.run(partial(conn.connection.head_object, Bucket=bucket, Key=o["Key"]) for o in objs)
+		checked_at = datetime.now(timezone.utc)
+		current = []
+		for o, head in zip(objs, heads):
+			if isinstance(head, ClientError) and _s3_error_code(head) in ("404", "NoSuchKey", "NotFound"):
+				continue  # already gone
+			if isinstance(head, Exception) or not _unchanged(o, head, checked_at, min_age_days):
+				changed += 1
+				continue
+			current.append(o)
+		for o in _still_orphaned(bucket, current) if current else []:
+			queued += 1
+			queued_bytes += o.get("Size") or 0
+			if dry_run:
+				frappe.logger("s3").info(f"[s3 orphan-purge dry-run] would delete {bucket}/{o['Key']}")
+			else:
+				_log_delete_errors(deletions.add(bucket, o["Key"]), "S3 Orphan Purge")
+		_log_delete_errors(deletions.flush(), "S3 Orphan Purge")  # now, not after the next batch
+
+	try:
+		for bucket in dict.fromkeys(b for b in (conn.private_bucket, conn.public_bucket) if b):
+			batch = []
+			for obj in _iter_s3_orphans(conn, bucket):
+				if not obj["Key"].startswith(FRAPPE_PREFIXES):
+					foreign += 1
+					continue
+				age = _age_days(obj, now)
+				if age is None or age < min_age_days:
+					young += 1
+					continue
+				batch.append(obj)
+				if len(batch) >= DELETE_BATCH_SIZE:
+					_queue(bucket, batch)
+					batch = []
+			_queue(bucket, batch)
+	except JobTimeoutException:
+		_log_delete_errors(deletions.flush(), "S3 Orphan Purge")
+		frappe.log_error(
+			f"orphan purge: job timeout after {deletions.deleted} deleted — re-run to finish",
+			"S3 Orphan Purge")
+		raise
+	_log_delete_errors(deletions.flush(), "S3 Orphan Purge")
+	print(
+		f"[s3 orphan-purge] {'DRY-RUN ' if dry_run else ''}done: orphans={queued} "
+		f"({queued_bytes / (1024 ** 3):.2f} GB) deleted={deletions.deleted} failed={deletions.failed} "
+		f"too_young={young} outside_files={foreign} changed_or_unverified={changed}"
+	)
 
 
 # ---------------------------------------------------------------------------------------